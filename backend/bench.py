@@ -0,0 +1,586 @@
+"""Performance benchmarks for the backend. Not imported by the service.
+
+    python -m backend.bench health [--downloads 8] [--cases 150]
+    python -m backend.bench case-book [--cases 50 200 500]
+    python -m backend.bench msel [--days 3 30] [--per-day 60] [--mascal 30]
+    python -m backend.bench docx [--repeat 20]
+    python -m backend.bench schedule [--days 3 30] [--per-day 60] [--mascal 30]
+    python -m backend.bench census [--days 30] [--per-day 60] [--mascal 30]
+    python -m backend.bench simulate [--days 30] [--per-day 60] [--mascal 30]
+    python -m backend.bench what-if [--days 7] [--surgeons 0 1 2 3] [--per-day 20 40 60]
+
+Everything runs offline: exercises are built from the offline fallback cases
+and a local SQLite database, so no GEMINI_API_KEY or DATABASE_URL is needed.
+"""
+import argparse
+import os
+import random
+import re
+import socket
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import urllib.request
+import zipfile
+
+
+def _load_backend(tmp: str, database: bool = False):
+    """Import backend.main against a scratch data dir (and SQLite DB)."""
+    os.environ["ROLE2_DATA_DIR"] = tmp
+    os.environ["JOB_MAX_CONCURRENT"] = "0"
+    if database:
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+    from backend import main
+    if database:
+        main._init_schema()
+    return main
+
+
+def bench_config(m, days: int = 3, per_day: int = 60, mascal: int = 0, environment: str = "Desert"):
+    return m.ExerciseConfig(
+        exercise_name="Bench", duration=days, supported_unit="1st Marine Division", environment=environment,
+        threat_level="Peer", region="Bench", selected_mets=["HSS 001"], selected_footprint=["OR", "Ward"],
+        specialists={"General Surgery": 2, "ER Nurse": 4, "ICU Nurse": 2},
+        days=[m.DayConfig(day_number=d + 1, tactical_setting="Frontal Attack" if d % 2 else "Defense",
+                          total_patients=per_day, total_waves=4, mascal=bool(mascal),
+                          mascal_etiology="IED/Blast" if mascal else None, mascal_patients=mascal or None)
+              for d in range(days)])
+
+
+def synthetic_exercise(m, config) -> tuple:
+    """(schedule, cases) for `config`, built the way a job builds them but
+    from the offline fallback cases."""
+    pools = {}
+    for day, case_type, mechanism, is_trauma, is_mascal in m._build_case_tasks(config):
+        pools.setdefault((day, is_mascal), []).append(m.create_fallback_case(case_type, mechanism, is_trauma))
+    for p in pools.values():
+        random.shuffle(p)
+    return m.generate_schedule(config, pools)
+
+
+def _pct(xs, p: float) -> float:
+    xs = sorted(xs)
+    return xs[min(len(xs) - 1, int(round(p / 100 * (len(xs) - 1))))]
+
+
+def _ms(xs) -> str:
+    return (f"n={len(xs):4d}  p50={statistics.median(xs) * 1000:7.1f}ms  "
+            f"p95={_pct(xs, 95) * 1000:7.1f}ms  max={max(xs) * 1000:7.1f}ms")
+
+
+_PROBES = ("/health", "/exercises", "/jobs/{job}")
+
+
+def bench_health(args):
+    """/health, /exercises and job-poll latency at idle vs while N uncached
+    history packages render."""
+    import uvicorn
+
+    m = _load_backend(tempfile.mkdtemp(prefix="role2-bench-"), database=True)
+    per_day = min(60, args.cases)
+    config = bench_config(m, days=max(1, -(-args.cases // per_day)), per_day=per_day)
+    schedule, cases = synthetic_exercise(m, config)
+    db = m.SessionLocal()
+    try:
+        ids = []
+        for _ in range(args.downloads):
+            ex = m.Exercise(name=config.exercise_name, config=config.dict(), cases=cases, msel_data=schedule,
+                            warno_text="WARNO", annex_q_text="ANNEX Q", medroe_text="MEDROE",
+                            road_to_war_text="ROAD TO WAR", **m._exercise_summary(config.dict(), cases, schedule))
+            db.add(ex)
+            db.commit()
+            ids.append(ex.id)
+        # A finished job only the DB knows about: polling it takes the
+        # _job_get fallback, like a poll that lands on another instance.
+        job = m.Job(id="bench-job", status="complete", progress="Package ready!", completed=1, total=1)
+        db.add(job)
+        db.commit()
+    finally:
+        db.close()
+
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(m.app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    base = f"http://127.0.0.1:{port}"
+    while not server.started:
+        time.sleep(0.05)
+
+    def probe(path: str, stop: threading.Event, out: list):
+        while not stop.is_set():
+            t0 = time.perf_counter()
+            urllib.request.urlopen(f"{base}{path.format(job='bench-job')}").read()
+            out.append(time.perf_counter() - t0)
+            time.sleep(args.interval)
+
+    def probing(seconds: float = 0, during=None) -> dict:
+        """Probe every path until `seconds` pass or `during()` returns."""
+        stop, out = threading.Event(), {path: [] for path in _PROBES}
+        threads = [threading.Thread(target=probe, args=(path, stop, out[path])) for path in _PROBES]
+        for t in threads:
+            t.start()
+        if during:
+            during()
+        else:
+            time.sleep(seconds)
+        stop.set()
+        for t in threads:
+            t.join()
+        return out
+
+    sizes, elapsed = [], []
+
+    def download(exercise_id: int):
+        sizes.append(len(urllib.request.urlopen(f"{base}/exercises/{exercise_id}/download").read()))
+
+    def downloads():
+        t0 = time.perf_counter()
+        threads = [threading.Thread(target=download, args=(i,)) for i in ids]
+        for d in threads:
+            d.start()
+        for d in threads:
+            d.join()
+        elapsed.append(time.perf_counter() - t0)
+
+    idle = probing(seconds=2)
+    busy = probing(during=downloads)
+    server.should_exit = True
+
+    print(f"{args.downloads} concurrent package downloads, {len(cases)} cases each: "
+          f"{elapsed[0]:.1f}s, {sum(sizes) / 1e6:.1f} MB")
+    for path in _PROBES:
+        print(f"{path:<12} idle        {_ms(idle[path])}")
+        print(f"{path:<12} downloading {_ms(busy[path])}")
+
+
+def bench_case_book(args):
+    """python-docx case book renderer vs the template renderer."""
+    m = _load_backend(tempfile.mkdtemp(prefix="role2-bench-"))
+    print(f"{'cases':>6} {'python-docx':>12} {'template':>10} {'speedup':>8} {'size':>9}  same structure")
+    for n in args.cases:
+        per_day = 30
+        config = bench_config(m, days=-(-n // per_day), per_day=per_day)
+        _schedule, cases = synthetic_exercise(m, config)
+        cases = cases[:n]
+        timings = {}
+        for name, render in (("docx", m.create_case_book), ("template", m.create_case_book_fast)):
+            best = None
+            for _ in range(args.repeat):
+                t0 = time.perf_counter()
+                buf = render(cases, config)
+                best = min(best or 1e9, time.perf_counter() - t0)
+            timings[name] = (best, buf)
+        same = _document_xml(timings["docx"][1]) == _document_xml(timings["template"][1])
+        print(f"{n:>6} {timings['docx'][0]:>11.2f}s {timings['template'][0]:>9.3f}s "
+              f"{timings['docx'][0] / timings['template'][0]:>7.0f}x {len(timings['template'][1].getvalue()) / 1e3:>7.0f}kB  {same}")
+
+
+def _document_xml(buf) -> bytes:
+    """Canonical word/document.xml, minus the 'Generated:' / 'DTG:' timestamps."""
+    from lxml import etree
+    xml = zipfile.ZipFile(buf).read("word/document.xml")
+    return re.sub(rb"(Generated|DTG): [^<]*", b"", etree.tostring(etree.fromstring(xml), method="c14n"))
+
+
+def synthetic_order(paragraphs: int, seed: int = 0) -> str:
+    """LLM-shaped order text: numbered paragraphs, caps headings, lettered
+    subparagraphs and bullets, with blank lines between blocks."""
+    rng = random.Random(seed)
+    words = ("casualty evacuation role surgical blood LTOWB triage MEDEVAC ambulance exchange point "
+             "forward resuscitative team sustainment class VIII resupply convoy threat posture "
+             "commander intent phase line corridor holding area dwell time").split()
+    lines = []
+    for n in range(1, paragraphs + 1):
+        lines += [f"{n % 9 + 1}. {' '.join(rng.choices(words, k=3)).upper()}", ""]
+        for sub in "abcdef"[:rng.randint(3, 6)]:
+            lines.append(f"   {sub}. " + " ".join(rng.choices(words, k=rng.randint(12, 40))) + ".")
+            lines += [f"      - {' '.join(rng.choices(words, k=rng.randint(6, 18)))}" for _ in range(rng.randint(0, 4))]
+        lines.append("")
+    return "\n".join(lines)
+
+
+def bench_docx(args):
+    """python-docx orders documents vs the shared-template renderer for a
+    WARNO / Annex Q / MEDROE set: best-of-N time and peak Python heap."""
+    m = _load_backend(tempfile.mkdtemp(prefix="role2-bench-"))
+    docs = [("WARNO", "WARNING ORDER", synthetic_order(5, 1)),
+            ("Annex Q", "ANNEX Q (MEDICAL SERVICES)", synthetic_order(18, 2)),
+            ("MEDROE", "MEDICAL RULES OF ENGAGEMENT", synthetic_order(10, 3))]
+    m.create_docx_fast("warm", "up", "x")  # template parse happens once per process
+    print(f"{'document':>9} {'lines':>6} {'python-docx':>12} {'template':>9} {'docx heap':>10} "
+          f"{'template heap':>14}  same structure")
+    totals = [0.0, 0.0]
+    for label, title, text in docs:
+        row = []
+        for i, render in enumerate((m.create_docx, m.create_docx_fast)):
+            best = None
+            for _ in range(args.repeat):
+                t0 = time.perf_counter()
+                buf = render(title, "BENCH", text)
+                best = min(best or 1e9, time.perf_counter() - t0)
+            tracemalloc.start()
+            render(title, "BENCH", text)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            totals[i] += best
+            row.append((best, peak, buf))
+        same = _document_xml(row[0][2]) == _document_xml(row[1][2])
+        print(f"{label:>9} {text.count(chr(10)) + 1:>6} {row[0][0] * 1000:>10.1f}ms {row[1][0] * 1000:>7.1f}ms "
+              f"{row[0][1] / 1e6:>8.2f}MB {row[1][1] / 1e6:>12.2f}MB  {same}")
+    print(f"{'set':>9} {'':>6} {totals[0] * 1000:>10.1f}ms {totals[1] * 1000:>7.1f}ms")
+
+
+def bench_msel(args):
+    """pandas MSEL workbook vs the streaming write-only writer: time, peak
+    Python heap, and whether every sheet holds the same cells and widths."""
+    m = _load_backend(tempfile.mkdtemp(prefix="role2-bench-"))
+    print(f"{'days':>5} {'rows':>6} {'pandas':>9} {'stream':>9} {'pandas heap':>12} {'stream heap':>12}  same cells")
+    for days in args.days:
+        config = bench_config(m, days=days, per_day=args.per_day, mascal=args.mascal)
+        schedule, _cases = synthetic_exercise(m, config)
+        out = {}
+        for name, render in (("pandas", m.create_msel), ("stream", m.create_msel_stream)):
+            t0 = time.perf_counter()
+            buf = render(schedule, config)
+            secs = time.perf_counter() - t0
+            tracemalloc.start()
+            render(schedule, config)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            out[name] = (secs, peak, buf)
+        same = _workbook_cells(out["pandas"][2]) == _workbook_cells(out["stream"][2])
+        print(f"{days:>5} {len(schedule):>6} {out['pandas'][0]:>8.2f}s {out['stream'][0]:>8.2f}s "
+              f"{out['pandas'][1] / 1e6:>10.1f}MB {out['stream'][1] / 1e6:>10.1f}MB  {same}")
+
+
+def _workbook_cells(buf) -> list:
+    """Per sheet: title, column widths, and cell values ('' and None alike)."""
+    import openpyxl
+    wb = openpyxl.load_workbook(buf)
+    return [(ws.title, {k: d.width for k, d in ws.column_dimensions.items()},
+             [tuple("" if v is None else v for v in row) for row in ws.iter_rows(values_only=True)])
+            for ws in wb.worksheets]
+
+
+def _case_teo(m, case, is_mascal_wave=False) -> dict:
+    """Per-row T&EO flattening generate_schedule_loop used — the array engine
+    builds the same fields as columns (_case_columns)."""
+    phases = case.get("phases", {}) or {}
+    def _collect(field):
+        out = []
+        for pk in ("dcr", "dcs", "pcc"):
+            ph = phases.get(pk)
+            if isinstance(ph, dict):
+                out += ph.get(field, []) or []
+        return out
+    care_level = "DCR" + ("+DCS" if phases.get("dcs") else "") + ("+PCC" if phases.get("pcc") else "")
+    contingencies = [c for c in _collect("contingencies") if isinstance(c, dict)]
+    evac = case.get("evacuation", {}) or {}
+    tier = m._blood_tier(case)
+    return {
+        "zap": case.get("zmist", {}).get("zap", ""),
+        "surgical": "Yes" if phases.get("dcs") else "No",
+        "care_level": care_level,
+        "disposition": case.get("disposition", ""),
+        "blood_units": m._BLOOD_WBE[tier],
+        "blood_tier": m._BLOOD_TIER_NAMES[tier],
+        "r2_dwell": m._dwell_min(case, is_mascal_wave),
+        "evac_precedence": evac.get("priority", ""),
+        "onward": evac.get("transport_type", ""),
+        "signs": case.get("zmist", {}).get("signs", ""),
+        "handover": evac.get("handover_notes", ""),
+        "expected": " • ".join(str(a) for a in _collect("expected_actions")),
+        "contingencies": " | ".join(
+            f"IF {c.get('condition','')} → {c.get('consequence','')} → {c.get('intervention','')}"
+            for c in contingencies
+        ),
+        "debrief": " • ".join(case.get("debrief_questions", []) or []),
+    }
+
+
+def generate_schedule_loop(m, config, case_pools) -> tuple:
+    """The row-at-a-time scheduler generate_schedule replaced, kept as the
+    reference for its identical-output check: slots walked one casualty at a
+    time, every time and ledger value computed per row."""
+    schedule = []
+    ordered_cases = []
+    assigned_counts = {}
+    blood_used = 0  # cumulative whole-blood-equivalent units drawn, exercise-wide
+
+    def _draw(day_number, is_mascal):
+        pool = case_pools.get((day_number, is_mascal))
+        if pool:
+            return pool.pop()
+        # Defensive: never drop a scheduled slot — borrow from any non-empty pool.
+        for p in case_pools.values():
+            if p:
+                return p.pop()
+        return None
+
+    for day in config.days:
+        if day.cbrn:
+            schedule.append({"day": day.day_number, "event": "DRILL", "coc_hit_time": "N/A", "time": "0900", "nine_line_time": "N/A", "route": "N/A", "triage_cat": "N/A", "mechanism": "CBRN DRILL", "brief_description": "1-hour CBRN exercise - All clinical ops paused", "evaluator": "All Hands", "case_num": "DRILL"})
+        if day.detainee_ops:
+            schedule.append({"day": day.day_number, "event": "INJECT", "coc_hit_time": "N/A", "time": "1300", "nine_line_time": "N/A", "route": "N/A", "triage_cat": "N/A", "mechanism": "DETAINEE / EPW", "brief_description": "Detainee/EPW presents for care — apply detainee handling + MEDROE", "evaluator": "All Hands", "case_num": "INJECT"})
+
+        # Night ops means SOME casualties arrive at night, not all care at night:
+        # carve a share of the routine load into a dedicated night wave.
+        night_pts = min(max(1, round(day.total_patients * 0.35)), day.total_patients) if day.night_ops else 0
+        day_pts = day.total_patients - night_pts
+
+        # Routine day waves carry the daytime load; a MASCAL adds one more wave
+        # on top with its own surge count (additive, not an override).
+        base_waves = max(day.total_waves, 1)
+        pts_per_wave = day_pts // base_waves
+        remainder = day_pts % base_waves
+        day_waves = [{"pts": pts_per_wave + (1 if w < remainder else 0), "mascal": False}
+                     for w in range(base_waves)]
+        if day.mascal and day.mascal_patients:
+            day_waves.append({"pts": day.mascal_patients, "mascal": True})
+        night_waves = [{"pts": night_pts, "mascal": False}] if night_pts else []
+
+        # Day window 0700-1900 (12h); night window 2000-0200 (6h).
+        for group, start_min, span_min in ((day_waves, 7 * 60, 12 * 60), (night_waves, 20 * 60, 6 * 60)):
+            interval = span_min / (len(group) + 1) if group else 0
+            for k, w in enumerate(group):
+                w["start_min"] = start_min + int(interval * (k + 1))
+
+        # Emit chronologically: day waves, then the night wave.
+        for w in day_waves + night_waves:
+            wave_pts = w["pts"]
+            is_mascal_wave = w["mascal"]
+            time_spread = 45 if is_mascal_wave else 60
+
+            for p in range(wave_pts):
+                case = _draw(day.day_number, is_mascal_wave)
+                if case is None:
+                    break
+
+                # MASCAL is a compressed spike then a tail (front-loaded); routine
+                # casualties spread evenly across the wave.
+                frac = p / max(wave_pts, 1)
+                offset = int((frac ** 2) * 40) if is_mascal_wave else int(frac * 60)
+                arr_total = w["start_min"] + offset
+
+                # Route + COC call are derived from the case, not rolled at random.
+                route, inbound = m._route_and_inbound(case, is_mascal_wave)
+                if inbound:
+                    coc_hit_time = m._clock(arr_total - 45)
+                    nine_time = m._clock(arr_total - 30)
+                else:
+                    coc_hit_time = "N/A"
+                    nine_time = "N/A"
+
+                if is_mascal_wave:
+                    event = f"MASCAL ({day.mascal_etiology})" if day.mascal_etiology else "MASCAL"
+                else:
+                    event = "Routine"
+
+                teo = _case_teo(m, case, is_mascal_wave)
+                # Timeline: point of injury (golden-hour anchor) back from arrival
+                # by the parameter-driven transit; Role 2 cleared = arrival + dwell.
+                transit = m._transit_min(teo["evac_precedence"], config)
+                poi_time = m._clock(arr_total - transit)
+                cleared_raw = arr_total + teo["r2_dwell"]
+                cleared = m._clock(cleared_raw)
+
+                # Running blood ledger: draw against LTOWB stock, then walking
+                # blood bank once the on-hand supply is spent.
+                units = teo["blood_units"]
+                blood_used += units
+                on_hand = max(0, m.STARTING_LTOWB_UNITS - blood_used)
+                if units == 0:
+                    blood_source = ""
+                elif blood_used <= m.STARTING_LTOWB_UNITS:
+                    blood_source = "LTOWB"
+                else:
+                    blood_source = "Walking Blood Bank"
+
+                schedule.append({
+                    "day": day.day_number,
+                    "event": event,
+                    "poi_time": poi_time,
+                    "cleared": cleared,
+                    "coc_hit_time": coc_hit_time,
+                    "time": m._clock(arr_total),
+                    "nine_line_time": nine_time,
+                    "route": route,
+                    "triage_cat": case.get("triage_category", "T2"),
+                    "mechanism": case.get("zmist", {}).get("mechanism", "Unknown")[:50],
+                    "brief_description": case.get("zmist", {}).get("injuries", "")[:80],
+                    "evaluator": m.assign_evaluator(case, config.specialists, assigned_counts),
+                    "case_num": f"Case {len(ordered_cases) + 1}",
+                    "blood_cum": blood_used,
+                    "blood_on_hand": on_hand,
+                    "blood_source": blood_source,
+                    "transit_min": transit,
+                    "arr_raw": arr_total,
+                    "cleared_raw": cleared_raw,
+                    **teo,
+                })
+                ordered_cases.append(case)
+
+    m.annotate_pace_states(schedule, config)
+    return schedule, ordered_cases
+
+
+def bench_schedule(args):
+    """Row-at-a-time generate_schedule_loop vs the array engine, on the same
+    case pools; checks the schedules match row for row."""
+    m = _load_backend(tempfile.mkdtemp(prefix="role2-bench-"))
+    print(f"{'days':>5} {'rows':>6} {'loop':>9} {'array':>9} {'speedup':>8}  identical")
+    for days in args.days:
+        config = bench_config(m, days=days, per_day=args.per_day, mascal=args.mascal)
+        pools = {}
+        for day, case_type, mechanism, is_trauma, is_mascal in m._build_case_tasks(config):
+            pools.setdefault((day, is_mascal), []).append(m.create_fallback_case(case_type, mechanism, is_trauma))
+        out = {}
+        for name, engine in (("loop", lambda c, p: generate_schedule_loop(m, c, p)), ("array", m.generate_schedule)):
+            best = None
+            for _ in range(args.repeat):
+                fresh = {k: list(v) for k, v in pools.items()}
+                t0 = time.perf_counter()
+                result = engine(config, fresh)
+                best = min(best or 1e9, time.perf_counter() - t0)
+            out[name] = (best, result)
+        same = out["loop"][1][0] == out["array"][1][0] and all(
+            a is b for a, b in zip(out["loop"][1][1], out["array"][1][1]))
+        print(f"{days:>5} {len(out['array'][1][0]):>6} {out['loop'][0] * 1000:>7.1f}ms "
+              f"{out['array'][0] * 1000:>7.1f}ms {out['loop'][0] / out['array'][0]:>7.1f}x  {same}")
+
+
+def _census_scan(schedule) -> list:
+    """The O(n^2)-per-day census annotate_pace_states used to compute: for each
+    casualty row, the same-day rows whose [arrival, cleared) spans its arrival."""
+    by_day = {}
+    for r in schedule:
+        if "arr_raw" in r:
+            by_day.setdefault(r["day"], []).append(r)
+    return [sum(1 for o in by_day[r["day"]] if o["arr_raw"] <= r["arr_raw"] < o["cleared_raw"])
+            for r in schedule if "arr_raw" in r]
+
+
+def bench_census(args):
+    """Per-row Role 2 census: the old per-row scan vs the sorted sweep in
+    annotate_pace_states, plus the Planner Analysis roll-up that shares it."""
+    m = _load_backend(tempfile.mkdtemp(prefix="role2-bench-"))
+    config = bench_config(m, days=args.days, per_day=args.per_day, mascal=args.mascal)
+    schedule, _cases = synthetic_exercise(m, config)
+    rows = [r for r in schedule if "arr_raw" in r]
+
+    def best(fn):
+        times = []
+        for _ in range(args.repeat):
+            t0 = time.perf_counter()
+            fn()
+            times.append(time.perf_counter() - t0)
+        return min(times)
+
+    scan = best(lambda: _census_scan(schedule))
+    sweep = best(lambda: m.annotate_pace_states(schedule, config))
+    capacity = best(lambda: m._capacity_rows(schedule, config))
+    same = _census_scan(schedule) == [r["r2_census"] for r in rows]
+    busiest = max(sum(1 for r in rows if r["day"] == d.day_number) for d in config.days)
+    print(f"{args.days} days x ({args.per_day} routine + {args.mascal} MASCAL): {len(rows)} casualty rows, "
+          f"busiest day {busiest}")
+    print(f"census, per-row scan          {scan * 1000:8.1f}ms")
+    print(f"annotate_pace_states (sweep)  {sweep * 1000:8.1f}ms   census identical: {same}")
+    print(f"_capacity_rows                {capacity * 1000:8.1f}ms")
+
+
+def bench_simulate(args):
+    """Discrete-event Role 2 simulation of a whole exercise: run time, and
+    the waits it finds against the schedule's treat-on-arrival timeline."""
+    m = _load_backend(tempfile.mkdtemp(prefix="role2-bench-"))
+    config = bench_config(m, days=args.days, per_day=args.per_day, mascal=args.mascal)
+    schedule, _cases = synthetic_exercise(m, config)
+    times = []
+    for _ in range(args.repeat):
+        t0 = time.perf_counter()
+        sim = m.simulate_role2(schedule, config)
+        times.append(time.perf_counter() - t0)
+    waits = [r["wait"] for r in sim["rows"]]
+    t1 = [r["wait"] for r in sim["rows"] if r["triage_cat"] == "T1"]
+    print(f"{args.days} days x ({args.per_day} routine + {args.mascal} MASCAL): {len(waits)} casualties, "
+          f"resources {sim['resources']}")
+    print(f"simulate_role2  {_ms(times)}")
+    print(f"waits: mean {statistics.mean(waits):.0f} min, p95 {_pct(waits, 95)} min, max {max(waits)} min; "
+          f"T1 mean {statistics.mean(t1) if t1 else 0:.0f} min; {len(sim['transitions'])} PACE transitions")
+
+
+def bench_what_if(args):
+    """What-if sweep: surgeons x routine load x threat level over one base
+    config, first run (render pool start-up included) and warm runs."""
+    m = _load_backend(tempfile.mkdtemp(prefix="role2-bench-"))
+    config = bench_config(m, days=args.days, mascal=args.mascal)
+    grid = {"specialists.General Surgery": args.surgeons, "days.total_patients": args.per_day,
+            "threat_level": ["Low", "Peer"]}
+    variants = m._what_if_configs(config, grid)
+    times = []
+    for _ in range(args.repeat + 1):
+        t0 = time.perf_counter()
+        table = m.what_if(variants, seed=1)
+        times.append(time.perf_counter() - t0)
+    print(f"{len(variants)} variants of {args.days} days, render workers: {m.RENDER_WORKERS}")
+    print(f"first run {times[0] * 1000:.0f}ms, warm {_ms(times[1:])}")
+    print(" | ".join(table["columns"]))
+    for row in table["rows"][:args.show]:
+        print(" | ".join(str(v) for v in row))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m backend.bench")
+    sub = parser.add_subparsers(dest="bench", required=True)
+    p = sub.add_parser("health", help=bench_health.__doc__)
+    p.add_argument("--downloads", type=int, default=8)
+    p.add_argument("--cases", type=int, default=150)
+    p.add_argument("--interval", type=float, default=0.02)
+    p.set_defaults(fn=bench_health)
+    p = sub.add_parser("case-book", help=bench_case_book.__doc__)
+    p.add_argument("--cases", type=int, nargs="+", default=[50, 200, 500])
+    p.add_argument("--repeat", type=int, default=1)
+    p.set_defaults(fn=bench_case_book)
+    p = sub.add_parser("msel", help=bench_msel.__doc__)
+    p.add_argument("--days", type=int, nargs="+", default=[3, 30])
+    p.add_argument("--per-day", type=int, default=60)
+    p.add_argument("--mascal", type=int, default=30)
+    p.set_defaults(fn=bench_msel)
+    p = sub.add_parser("docx", help=bench_docx.__doc__)
+    p.add_argument("--repeat", type=int, default=20)
+    p.set_defaults(fn=bench_docx)
+    p = sub.add_parser("schedule", help=bench_schedule.__doc__)
+    p.add_argument("--days", type=int, nargs="+", default=[3, 30])
+    p.add_argument("--per-day", type=int, default=60)
+    p.add_argument("--mascal", type=int, default=30)
+    p.add_argument("--repeat", type=int, default=5)
+    p.set_defaults(fn=bench_schedule)
+    p = sub.add_parser("census", help=bench_census.__doc__)
+    p.add_argument("--days", type=int, default=30)
+    p.add_argument("--per-day", type=int, default=60)
+    p.add_argument("--mascal", type=int, default=30)
+    p.add_argument("--repeat", type=int, default=5)
+    p.set_defaults(fn=bench_census)
+    p = sub.add_parser("simulate", help=bench_simulate.__doc__)
+    p.add_argument("--days", type=int, default=30)
+    p.add_argument("--per-day", type=int, default=60)
+    p.add_argument("--mascal", type=int, default=30)
+    p.add_argument("--repeat", type=int, default=5)
+    p.set_defaults(fn=bench_simulate)
+    p = sub.add_parser("what-if", help=bench_what_if.__doc__)
+    p.add_argument("--days", type=int, default=7)
+    p.add_argument("--mascal", type=int, default=30)
+    p.add_argument("--surgeons", type=int, nargs="+", default=[0, 1, 2, 3])
+    p.add_argument("--per-day", type=int, nargs="+", default=[20, 40, 60])
+    p.add_argument("--repeat", type=int, default=5)
+    p.add_argument("--show", type=int, default=6)
+    p.set_defaults(fn=bench_what_if)
+    args = parser.parse_args(argv)
+    args.fn(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
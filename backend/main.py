@@ -1,26 +1,46 @@
 import os
+import re
+import copy
+import time
+import hashlib
+import heapq
+import itertools
+import tempfile
+import asyncio
 import random
 import json
 import zipfile
 import threading
 import uuid
+import shutil
+import sqlite3
+import multiprocessing
+from contextlib import closing, contextmanager, suppress
+from collections import OrderedDict, deque
 from io import BytesIO
+from xml.sax.saxutils import escape as xml_escape
 from datetime import datetime, timedelta
 from typing import List, Dict, Any, Optional
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, Future, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
 
-from fastapi import FastAPI, Response, HTTPException
+from fastapi import FastAPI, Request, Response, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
-from starlette.responses import StreamingResponse
+from starlette.responses import FileResponse, StreamingResponse
 from pydantic import BaseModel, Field
 from sqlalchemy import create_engine, Column, Integer, String, JSON, DateTime, Text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from google import genai
+import numpy as np
 import pandas as pd
 from docx import Document
-from docx.shared import Pt
+from docx.shared import Pt, Emu
 from docx.enum.text import WD_ALIGN_PARAGRAPH
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Alignment, Border, Font, Side
+from openpyxl.utils import get_column_letter
 
 app = FastAPI(title="Role 2 Exercise Builder API")
 
@@ -29,8 +49,27 @@ DATABASE_URL = os.getenv("DATABASE_URL")
 if DATABASE_URL and DATABASE_URL.startswith("postgres://"):
     DATABASE_URL = DATABASE_URL.replace("postgres://", "postgresql://", 1)
 
-engine = create_engine(DATABASE_URL) if DATABASE_URL else None
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine) if engine else None
+class _LazySessionmaker:
+    """sessionmaker whose engine (and connection pool) is built on first use.
+    Spawned render workers import this module but never query, so they never
+    build one."""
+
+    def __init__(self, url: str):
+        self.url = url
+        self._factory = None
+        self._lock = threading.Lock()
+
+    def engine(self):
+        with self._lock:
+            if self._factory is None:
+                self._factory = sessionmaker(autocommit=False, autoflush=False, bind=create_engine(self.url))
+            return self._factory.kw["bind"]
+
+    def __call__(self):
+        self.engine()
+        return self._factory()
+
+SessionLocal = _LazySessionmaker(DATABASE_URL) if DATABASE_URL else None
 Base = declarative_base()
 
 class Exercise(Base):
@@ -45,6 +84,13 @@ class Exercise(Base):
     annex_q_text = Column(Text)
     medroe_text = Column(Text)
     road_to_war_text = Column(Text)
+    # Denormalized summary for the history list, written at save time so the
+    # list never loads the JSON columns (see _exercise_summary).
+    total_cases = Column(Integer)
+    duration = Column(Integer)
+    environment = Column(String)
+    peak_pace_state = Column(String)
+    blood_deficit = Column(Integer)
 
 class Job(Base):
     __tablename__ = "jobs"
@@ -58,20 +104,28 @@ class Job(Base):
     error = Column(Text, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
 
-if engine:
+@app.on_event("startup")
+def _init_schema():
+    """Create tables and add newer columns, once per API boot. Not at import:
+    every spawned render and queue worker re-imports this module, and on
+    Postgres each ALTER takes an ACCESS EXCLUSIVE lock even as a no-op.
+    Registered first, so it runs before the queue workers start."""
+    if not SessionLocal:
+        return
+    engine = SessionLocal.engine()
     try:
         Base.metadata.create_all(bind=engine)
-    except Exception as _e:
-        print(f"WARNING: DB table creation failed: {_e}")
+    except Exception as e:
+        print(f"WARNING: DB table creation failed: {e}")
     # create_all does not ALTER existing tables — add newer columns idempotently.
-    try:
-        from sqlalchemy import text as _sql_text
-        with engine.begin() as _conn:
-            _conn.execute(_sql_text(
-                "ALTER TABLE exercises ADD COLUMN IF NOT EXISTS road_to_war_text TEXT"
-            ))
-    except Exception as _e:
-        print(f"WARNING: DB column migration (road_to_war_text) failed: {_e}")
+    from sqlalchemy import text as sql_text
+    for col, type_ in (("road_to_war_text", "TEXT"), ("total_cases", "INTEGER"), ("duration", "INTEGER"),
+                       ("environment", "VARCHAR"), ("peak_pace_state", "VARCHAR"), ("blood_deficit", "INTEGER")):
+        try:
+            with engine.begin() as conn:
+                conn.execute(sql_text(f"ALTER TABLE exercises ADD COLUMN IF NOT EXISTS {col} {type_}"))
+        except Exception as e:
+            print(f"WARNING: DB column migration ({col}) failed: {e}")
 
 CORS_ORIGINS = os.getenv("CORS_ORIGINS", "*").split(",")
 
@@ -90,13 +144,27 @@ _client = None
 # on Railway rather than a code change + redeploy.
 GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-2.5-flash")
 
+# Shared call policy for every Gemini request (see gemini_generate below).
+# GEMINI_RPM sizes the token bucket to the key's quota; GEMINI_CALL_DEADLINE_S
+# bounds one logical call including its retries.
+GEMINI_RPM = float(os.getenv("GEMINI_RPM", "1000"))
+GEMINI_BURST = int(os.getenv("GEMINI_BURST", "10"))
+GEMINI_MAX_RETRIES = int(os.getenv("GEMINI_MAX_RETRIES", "4"))
+GEMINI_ATTEMPT_TIMEOUT_S = float(os.getenv("GEMINI_ATTEMPT_TIMEOUT_S", "120"))
+GEMINI_CALL_DEADLINE_S = float(os.getenv("GEMINI_CALL_DEADLINE_S", "240"))
+GEMINI_BREAKER_WINDOW = int(os.getenv("GEMINI_BREAKER_WINDOW", "20"))
+GEMINI_BREAKER_ERROR_RATE = float(os.getenv("GEMINI_BREAKER_ERROR_RATE", "0.5"))
+GEMINI_BREAKER_COOLDOWN_S = float(os.getenv("GEMINI_BREAKER_COOLDOWN_S", "60"))
+
 def get_client():
     global _client
     if _client is None:
         key = os.getenv("GEMINI_API_KEY")
         if not key:
             raise HTTPException(status_code=503, detail="GEMINI_API_KEY not set on server")
-        _client = genai.Client(api_key=key)
+        # Per-attempt HTTP timeout; the overall deadline across retries is
+        # enforced by gemini_generate / gemini_generate_async below.
+        _client = genai.Client(api_key=key, http_options={"timeout": GEMINI_ATTEMPT_TIMEOUT_S})
     return _client
 
 def _response_text(response) -> str:
@@ -123,6 +191,190 @@ def _response_text(response) -> str:
     except Exception:
         return ""
 
+# --- Gemini call wrapper ----------------------------------------------------
+# Every call site goes through gemini_generate / gemini_generate_async, which
+# layer (in order) a circuit breaker, a token-bucket rate limiter, jittered
+# exponential backoff on transient errors (429 / 5xx / timeouts / connection
+# drops) and an overall deadline. While the breaker is open calls fail fast
+# with GeminiUnavailable, so callers drop to their offline path immediately
+# instead of each waiting out its own retries against a degraded upstream.
+class GeminiUnavailable(Exception):
+    """Raised without calling Gemini while the circuit breaker is open."""
+
+class JobCancelled(Exception):
+    """A generation job was told to stop (a sibling stage failed, or its queue
+    lease was lost) before it finished."""
+
+class _TokenBucket:
+    """Thread-safe token bucket. reserve() books the next token and returns how
+    long the caller must wait for it, so sync and async callers can share it."""
+
+    def __init__(self, rate_per_s: float, capacity: int):
+        self.rate = max(rate_per_s, 1e-6)
+        self.capacity = max(1, capacity)
+        self._tokens = float(self.capacity)
+        self._stamp = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._stamp) * self.rate)
+            self._stamp = now
+            self._tokens -= 1
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+class _CircuitBreaker:
+    """Opens when the error rate over the last `window` calls reaches
+    `threshold`; after `cooldown` seconds lets one probe through (half-open)
+    and closes again on its success."""
+
+    def __init__(self, window: int, threshold: float, cooldown: float):
+        self.window = max(1, window)
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self._outcomes: deque = deque(maxlen=self.window)
+        self._opened_at: Optional[float] = None
+        self._probing = False
+        self._probe_owner = None
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if self._probing or time.monotonic() - self._opened_at < self.cooldown:
+                return False
+            self._probing = True
+            self._probe_owner = self._caller()
+            return True
+
+    @staticmethod
+    def _caller():
+        """The asyncio task (or, outside a loop, the thread) making the call."""
+        try:
+            return asyncio.current_task() or threading.get_ident()
+        except RuntimeError:
+            return threading.get_ident()
+
+    def abandon(self):
+        """The calling task ended its call without an outcome (cancelled): if
+        it held the half-open probe, hand the probe slot back so the next call
+        can probe instead of the breaker staying half-open forever."""
+        with self._lock:
+            if self._probing and self._probe_owner == self._caller():
+                self._probing = False
+                self._probe_owner = None
+
+    def record(self, ok: bool):
+        with self._lock:
+            if self._probing:
+                self._probing = False
+                self._probe_owner = None
+                if ok:
+                    self._opened_at = None
+                    self._outcomes.clear()
+                else:
+                    self._opened_at = time.monotonic()
+                return
+            self._outcomes.append(ok)
+            failures = self._outcomes.count(False)
+            if (self._opened_at is None and len(self._outcomes) >= min(self.window, 5)
+                    and failures / len(self._outcomes) >= self.threshold):
+                self._opened_at = time.monotonic()
+                print(f"WARNING: Gemini circuit breaker OPEN ({failures}/{len(self._outcomes)} recent calls failed)")
+
+_gemini_bucket = _TokenBucket(GEMINI_RPM / 60.0, GEMINI_BURST)
+_gemini_breaker = _CircuitBreaker(GEMINI_BREAKER_WINDOW, GEMINI_BREAKER_ERROR_RATE, GEMINI_BREAKER_COOLDOWN_S)
+
+def _is_rate_limited(exc: BaseException) -> bool:
+    """True for Gemini quota/throttle errors (HTTP 429 / RESOURCE_EXHAUSTED)."""
+    if getattr(exc, "code", None) == 429 or getattr(exc, "status_code", None) == 429:
+        return True
+    msg = str(exc)
+    return "429" in msg or "RESOURCE_EXHAUSTED" in msg
+
+def _is_transient(exc: BaseException) -> bool:
+    """Worth retrying: throttling, server-side errors, timeouts, dropped links."""
+    if _is_rate_limited(exc):
+        return True
+    code = getattr(exc, "code", None)
+    if isinstance(code, int) and code >= 500:
+        return True
+    if isinstance(exc, (TimeoutError, asyncio.TimeoutError, ConnectionError)):
+        return True
+    name = type(exc).__name__
+    return name in ("ServerError", "Timeout", "ReadTimeout", "ConnectTimeout", "ConnectionError")
+
+def _backoff_s(attempt: int) -> float:
+    """Full-jitter exponential backoff: uniform(0, min(30, 2**attempt))."""
+    return random.uniform(0, min(30.0, 2.0 ** attempt))
+
+def gemini_generate(contents, config=None, *, deadline: Optional[float] = None):
+    """Blocking generate_content under the shared call policy."""
+    client = get_client()  # a missing key surfaces as-is, never retried
+    stop = time.monotonic() + (deadline or GEMINI_CALL_DEADLINE_S)
+    for attempt in range(GEMINI_MAX_RETRIES + 1):
+        if not _gemini_breaker.allow():
+            raise GeminiUnavailable("AI service temporarily unavailable (too many recent Gemini errors) — try again shortly")
+        time.sleep(_gemini_bucket.reserve())
+        try:
+            response = client.models.generate_content(model=GEMINI_MODEL, contents=contents, config=config)
+        except Exception as e:
+            _gemini_breaker.record(False)
+            wait = _backoff_s(attempt)
+            if not _is_transient(e) or attempt == GEMINI_MAX_RETRIES or time.monotonic() + wait >= stop:
+                raise
+            time.sleep(wait)
+            continue
+        _gemini_breaker.record(True)
+        return response
+
+async def gemini_generate_async(contents, config=None, *, deadline: Optional[float] = None,
+                                limiter=None, weight: int = 1, on_attempt=None):
+    """Async generate_content under the shared call policy. With a limiter,
+    each attempt holds one of its slots and reports latency (per `weight`
+    cases) or throttling back to it. on_attempt() fires as each attempt is
+    actually sent."""
+    client = get_client()
+    stop = time.monotonic() + (deadline or GEMINI_CALL_DEADLINE_S)
+    for attempt in range(GEMINI_MAX_RETRIES + 1):
+        if not _gemini_breaker.allow():
+            raise GeminiUnavailable("AI service temporarily unavailable (too many recent Gemini errors) — try again shortly")
+        await asyncio.sleep(_gemini_bucket.reserve())
+        if limiter:
+            await limiter.acquire()
+        started = time.monotonic()
+        if on_attempt:
+            on_attempt()
+        try:
+            remaining = stop - started
+            if remaining <= 0:
+                raise asyncio.TimeoutError("Gemini call deadline exceeded")
+            response = await asyncio.wait_for(
+                client.aio.models.generate_content(model=GEMINI_MODEL, contents=contents, config=config),
+                timeout=remaining)
+        except asyncio.CancelledError:
+            # Lost a hedge race (or the job is shutting down): free the slot,
+            # and the breaker's probe slot if this was the half-open probe.
+            _gemini_breaker.abandon()
+            if limiter:
+                await limiter.release()
+            raise
+        except Exception as e:
+            _gemini_breaker.record(False)
+            if limiter:
+                await limiter.release(throttled=_is_rate_limited(e))
+            wait = _backoff_s(attempt)
+            if not _is_transient(e) or attempt == GEMINI_MAX_RETRIES or time.monotonic() + wait >= stop:
+                raise
+            await asyncio.sleep(wait)
+            continue
+        _gemini_breaker.record(True)
+        if limiter:
+            await limiter.release(latency=(time.monotonic() - started) / max(weight, 1))
+        return response
+
 # Curated pools mirror the /generate-name prompt so the offline fallback stays
 # on-brand. None of these appear in the prompt's banned-word list.
 _NAME_DESCRIPTORS = [
@@ -144,20 +396,213 @@ def _local_exercise_name(region: str = "") -> str:
         nouns = nouns + _NAME_NOUNS_MARITIME
     return f"Operation {random.choice(_NAME_DESCRIPTORS)} {random.choice(nouns)}"
 
+# Local working storage: the job queue database and finished packages. Point
+# ROLE2_DATA_DIR at a mounted volume for jobs to survive a container redeploy;
+# the default survives process restarts within the container.
+DATA_DIR = os.getenv("ROLE2_DATA_DIR", os.path.join(tempfile.gettempdir(), "role2-builder"))
+PACKAGE_DIR = os.path.join(DATA_DIR, "packages")
+
 # Short-lived store for completed zip packages keyed by download token.
-# Entries carry a timestamp so stale packages (never downloaded) get purged
-# instead of accumulating for the life of the process.
-_packages: Dict[str, Dict[str, Any]] = {}
-_PACKAGE_TTL = timedelta(hours=6)
+# Packages live only as files under PACKAGE_DIR — never in process memory — so
+# one built by a queue worker process can be downloaded from the API process.
+# The directory is the whole index: a file's mtime is when it was built (for
+# the TTL) and its atime is bumped on every download (for LRU eviction once
+# the store exceeds PACKAGE_STORE_MAX_BYTES). A background timer purges.
+PACKAGE_STORE_MAX_BYTES = int(os.getenv("PACKAGE_STORE_MAX_BYTES", str(1 << 30)))
+PACKAGE_TTL_S = int(os.getenv("PACKAGE_TTL_S", str(6 * 3600)))
+PACKAGE_PURGE_INTERVAL_S = int(os.getenv("PACKAGE_PURGE_INTERVAL_S", "300"))
 _JOB_TTL = timedelta(hours=24)
 
+def _package_path(token: str) -> Optional[str]:
+    try:
+        return os.path.join(PACKAGE_DIR, f"{uuid.UUID(token)}.zip")
+    except ValueError:  # not a token we issued — never touch the filesystem
+        return None
+
+@contextmanager
+def _package_writer(token: str):
+    """ZipFile writing straight into the package file for `token`. The package
+    only appears (atomically) if the block completes; on failure the partial
+    archive is discarded."""
+    os.makedirs(PACKAGE_DIR, exist_ok=True)
+    path = _package_path(token)
+    tmp = f"{path}.tmp"
+    zf = zipfile.ZipFile(tmp, "w", zipfile.ZIP_DEFLATED)
+    try:
+        yield zf
+        zf.close()
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            with suppress(Exception):
+                zf.close()
+            with suppress(OSError):
+                os.remove(tmp)
+    _package_evict(keep=path)
+
+def _package_get(token: str) -> Optional[str]:
+    """Path of a stored package, marked as recently used; None if unknown,
+    expired or evicted. Packages stay until TTL/eviction so an interrupted
+    download can resume with a Range request."""
+    path = _package_path(token)
+    if not path:
+        return None
+    try:
+        st = os.stat(path)
+        if time.time() - st.st_mtime > PACKAGE_TTL_S:
+            return None
+        os.utime(path, (time.time(), st.st_mtime))
+    except OSError:
+        return None
+    return path
+
+def _package_evict(keep: Optional[str] = None):
+    """Drop expired packages (and abandoned .tmp files), then least-recently
+    used ones until the store fits the byte budget. `keep` (the package just
+    written) is never evicted, even if it alone exceeds the budget."""
+    now = time.time()
+    live = []
+    try:
+        entries = list(os.scandir(PACKAGE_DIR))
+    except OSError:
+        return
+    for e in entries:
+        try:
+            st = e.stat()
+            if now - st.st_mtime > PACKAGE_TTL_S:
+                os.remove(e.path)
+            elif e.name.endswith(".zip"):
+                live.append((st.st_atime, st.st_size, e.path))
+        except OSError:  # removed concurrently by another process
+            pass
+    total = sum(size for _, size, _ in live)
+    for _, size, path in sorted(live):
+        if total <= PACKAGE_STORE_MAX_BYTES:
+            break
+        if path == keep:
+            continue
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        total -= size
+
 def _purge_stale_stores():
+    _package_evict()
+    _artifact_cache.evict()
     now = datetime.utcnow()
-    for tok in [t for t, p in _packages.items() if now - p["ts"] > _PACKAGE_TTL]:
-        _packages.pop(tok, None)
-    for jid in [j for j, v in _jobs.items()
+    for jid in [j for j, v in list(_jobs.items())
                 if v.get("ts") and now - v["ts"] > _JOB_TTL]:
         _jobs.pop(jid, None)
+        with _job_events_lock:
+            _job_events.pop(jid, None)
+
+def _purge_loop():
+    while True:
+        time.sleep(PACKAGE_PURGE_INTERVAL_S)
+        try:
+            _purge_stale_stores()
+        except Exception as e:
+            print(f"WARNING: store purge failed: {e}")
+
+_DOWNLOAD_CHUNK = 256 * 1024
+
+# Packages are assembled entry by entry as documents finish rendering: each
+# rendered buffer is deflated into the archive and released, so peak memory is
+# about one document rather than every document plus the archive plus a copy.
+def _zip_add(zf: zipfile.ZipFile, name: str, buf):
+    """Deflate a rendered document (bytes, a file path, or a BytesIO read
+    straight from its buffer with no getvalue() copy) into the archive, then
+    free the buffer."""
+    if isinstance(buf, str):
+        zf.write(buf, name)
+        return
+    if isinstance(buf, bytes):
+        zf.writestr(name, buf)
+        return
+    with buf.getbuffer() as view:
+        zf.writestr(name, view)
+    buf.close()
+
+class _ZipSink:
+    """Write-only, unseekable target for a streamed ZipFile; ZipFile falls
+    back to data descriptors, and drain() hands out what has been written."""
+    def __init__(self):
+        self._chunks: List[bytes] = []
+
+    def write(self, b) -> int:
+        self._chunks.append(bytes(b))
+        return len(b)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        out, self._chunks = b"".join(self._chunks), []
+        return out
+
+def _zip_stream(entries):
+    """Yield a ZIP archive chunk by chunk from (filename, render) pairs,
+    rendering each document only when its turn comes."""
+    sink = _ZipSink()
+    with zipfile.ZipFile(sink, "w", zipfile.ZIP_DEFLATED) as zf:
+        for name, render in entries:
+            _zip_add(zf, name, render())
+            yield sink.drain()
+    yield sink.drain()
+
+def _byte_range(header: str, size: int) -> Optional[tuple]:
+    """Parse a single-range `Range: bytes=...` header into inclusive (start, end).
+    Returns None to serve the whole file (absent, malformed or multi-range —
+    all allowed by RFC 9110) and raises 416 when the range is unsatisfiable."""
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None
+    first, _, last = header[6:].strip().partition("-")
+    unsatisfiable = HTTPException(status_code=416, headers={"Content-Range": f"bytes */{size}"})
+    try:
+        if first:
+            start, end = int(first), int(last) if last else size - 1
+            if last and end < start:
+                return None
+        elif last:  # suffix range: the final N bytes
+            if int(last) == 0:
+                raise unsatisfiable
+            start, end = max(size - int(last), 0), size - 1
+        else:
+            return None
+    except ValueError:
+        return None
+    if start >= size:
+        raise unsatisfiable
+    return start, min(end, size - 1)
+
+def _file_response(request: Request, path: str, media_type: str, filename: str,
+                   headers: Optional[Dict[str, str]] = None) -> Response:
+    """Serve a file from disk without loading it: FileResponse for the whole
+    file, a 206 partial stream for a single byte range."""
+    size = os.path.getsize(path)
+    headers = {"Content-Disposition": f"attachment; filename={filename}",
+               "Accept-Ranges": "bytes", **(headers or {})}
+    rng = _byte_range(request.headers.get("range", ""), size)
+    if rng is None:
+        return FileResponse(path, media_type=media_type, headers=headers)
+    start, end = rng
+    f = open(path, "rb")  # held open so eviction mid-download can't truncate it
+    f.seek(start)
+
+    def chunks():
+        with f:
+            left = end - start + 1
+            while left > 0:
+                block = f.read(min(_DOWNLOAD_CHUNK, left))
+                if not block:
+                    break
+                left -= len(block)
+                yield block
+
+    headers.update({"Content-Range": f"bytes {start}-{end}/{size}",
+                    "Content-Length": str(end - start + 1)})
+    return StreamingResponse(chunks(), status_code=206, media_type=media_type, headers=headers)
 
 # ZAP numbers key every sheet in the package (MSEL, T&EO, Blood Ledger, Case
 # Book) — independent random draws collide surprisingly often at exercise
@@ -165,6 +610,11 @@ def _purge_stale_stores():
 _zap_lock = threading.Lock()
 _used_zaps: set = set()
 
+def _reserve_zap(zap: str):
+    """Mark a ZAP restored from elsewhere (e.g. a job checkpoint) as taken."""
+    with _zap_lock:
+        _used_zaps.add(zap)
+
 def _new_zap() -> str:
     with _zap_lock:
         while True:
@@ -198,6 +648,21 @@ class ExerciseConfig(BaseModel):
     specialists: Dict[str, int]
     days: List[DayConfig]
 
+class MonteCarloParams(BaseModel):
+    replications: int = Field(default=2000, ge=1, le=20000)
+    arrival_jitter_min: float = Field(default=10.0, ge=0, le=240)  # SD of arrival jitter
+    dwell_cv: float = Field(default=0.3, ge=0, le=2)  # coefficient of variation of dwell
+    blood_spread: float = Field(default=1.0, ge=0, le=1)  # share of each tier's band drawn from
+    seed: Optional[int] = None
+
+class WhatIfRequest(BaseModel):
+    base: ExerciseConfig
+    # parameter -> values to try; every combination is one variant. Parameters
+    # are top-level config fields (see _WHAT_IF_FIELDS), "specialists.<name>"
+    # for one specialty's headcount, or "days.<field>" applied to every day.
+    grid: Dict[str, List[Any]]
+    seed: Optional[int] = None  # case-type draw shared by every variant
+
 # Case data
 DNBI_BY_ENVIRONMENT = {
     "Jungle": ["Dengue hemorrhagic fever", "Malaria", "Snake envenomation", "Cellulitis", "Heat exhaustion", "Leptospirosis"],
@@ -339,54 +804,182 @@ JSON STRUCTURE:
   "debrief_questions": ["String"]
 }"""
 
-def generate_case_sync(case_type: str, mechanism: str, environment: str, region: str, is_mascal: bool = False, mets: Optional[List[str]] = None) -> Dict:
+def _phase_instruction(case_type: str, mechanism: str, is_mascal: bool = False) -> str:
     phases = determine_case_phases(case_type, mechanism, is_mascal)
-    phase_instr = "This case does NOT require surgery. Only DCR and PCC. Set dcs to null." if phases == ["DCR", "PCC"] else "This case requires surgery. Include DCR, DCS, and PCC."
+    return "This case does NOT require surgery. Only DCR and PCC. Set dcs to null." if phases == ["DCR", "PCC"] else "This case requires surgery. Include DCR, DCS, and PCC."
 
-    zap = _new_zap()
-
-    mech_context = MECHANISM_CONTEXT.get(mechanism)
-    mets_line = (
+def _mets_line(mets: Optional[List[str]]) -> str:
+    return (
         f"Where clinically natural, tie learning objectives to these unit METL tasks: {', '.join(mets[:6])}.\n"
         if mets else ""
     )
 
+def _case_request(case_type: str, mechanism: str, environment: str, region: str, is_mascal: bool = False, mets: Optional[List[str]] = None,
+                  zap: Optional[str] = None) -> tuple:
+    """Build the (prompt, zap) pair for one case. Shared by the sync and async
+    generators so both send byte-identical prompts. Pass `zap` to reuse one
+    already allocated (a batch element retried on its own)."""
+    phase_instr = _phase_instruction(case_type, mechanism, is_mascal)
+
+    zap = zap or _new_zap()
+
+    mech_context = MECHANISM_CONTEXT.get(mechanism)
+
     prompt = (
         f"CONTEXT: Role 2 in {environment}, {region}.\n"
         f"CASE: {case_type}\n"
         f"MECHANISM: {mechanism}\n"
         + (f"{mech_context}\n" if mech_context else "")
-        + mets_line
+        + _mets_line(mets)
         + f"{phase_instr}\n"
         f"ZAP NUMBER: Use exactly '{zap}' as the zap field — do not change it.\n"
         f"Generate the case now."
     )
+    return prompt, zap
 
-    response = get_client().models.generate_content(
-        model=GEMINI_MODEL,
-        contents=prompt,
-        config={"system_instruction": CASE_SYSTEM_PROMPT, "response_mime_type": "application/json"}
-    )
+_CASE_GEN_CONFIG = {"system_instruction": CASE_SYSTEM_PROMPT, "response_mime_type": "application/json"}
 
+def _parse_case(text: str, zap: str) -> Dict:
+    """Parse the model's JSON case and pin the pre-assigned ZAP onto it."""
     def _enforce_zap(data: Dict) -> Dict:
         if "zmist" in data:
             data["zmist"]["zap"] = zap
         return data
 
     try:
-        return _enforce_zap(json.loads(response.text))
+        return _enforce_zap(json.loads(text))
     except json.JSONDecodeError:
-        text = response.text
         start, end = text.find('{'), text.rfind('}') + 1
         if start != -1 and end > start:
             return _enforce_zap(json.loads(text[start:end]))
         raise
 
-def create_fallback_case(case_type: str, mechanism: str, is_trauma: bool = True) -> Dict:
+def generate_case_sync(case_type: str, mechanism: str, environment: str, region: str, is_mascal: bool = False, mets: Optional[List[str]] = None) -> Dict:
+    prompt, zap = _case_request(case_type, mechanism, environment, region, is_mascal, mets)
+    response = gemini_generate(prompt, _CASE_GEN_CONFIG)
+    return _parse_case(response.text, zap)
+
+async def generate_case_async(case_type: str, mechanism: str, environment: str, region: str, is_mascal: bool = False, mets: Optional[List[str]] = None,
+                              limiter=None, on_attempt=None, request: Optional[tuple] = None) -> Dict:
+    """Async twin of generate_case_sync on the SDK's aio client. Pass a
+    prebuilt _case_request `request` to resend the same prompt and ZAP (a
+    hedge duplicate) instead of allocating a new one. The pinned
+    google-genai (0.4.0) aio client runs the blocking request through
+    asyncio.to_thread, so each call in flight holds a default-executor thread
+    (sized in _generate_cases_async); a cancelled call — a lost hedge — keeps
+    its thread until the request returns or hits GEMINI_ATTEMPT_TIMEOUT_S."""
+    prompt, zap = request or _case_request(case_type, mechanism, environment, region, is_mascal, mets)
+    response = await gemini_generate_async(prompt, _CASE_GEN_CONFIG, limiter=limiter, on_attempt=on_attempt)
+    return _parse_case(response.text, zap)
+
+# --- Batched generation -----------------------------------------------------
+# One request for N cases: the system prompt is sent once and the fixed
+# per-call latency is paid once. Each element carries its own pre-assigned ZAP
+# and phase instruction, is validated on its own, and the caller re-runs only
+# the elements that came back missing or malformed as single-case calls.
+CASE_BATCH_SIZE = int(os.getenv("CASE_BATCH_SIZE", "5"))
+_CASE_BATCH_MAX = 30
+
+CASE_BATCH_SYSTEM_PROMPT = CASE_SYSTEM_PROMPT + """
+
+BATCH MODE: the prompt lists several numbered cases. Return a JSON ARRAY with
+exactly one case object per listed case, in the listed order. Every element
+follows the JSON STRUCTURE above, uses the ZAP assigned to that case, and
+includes only the phases specified for that case. Treat each case as a
+different casualty — vary demographics and clinical course across the array."""
+
+_CASE_BATCH_GEN_CONFIG = {"system_instruction": CASE_BATCH_SYSTEM_PROMPT, "response_mime_type": "application/json"}
+
+def _case_batch_request(specs: List[tuple], environment: str, region: str, mets: Optional[List[str]] = None) -> tuple:
+    """specs: [(case_type, mechanism, is_mascal), ...] -> (prompt, [zap, ...])."""
+    zaps = [_new_zap() for _ in specs]
+    contexts = []
+    for _ct, mech, _m in specs:
+        ctx = MECHANISM_CONTEXT.get(mech)
+        if ctx and ctx not in contexts:
+            contexts.append(ctx)
+    lines = [f"CONTEXT: Role 2 in {environment}, {region}.\n"]
+    lines += [f"{c}\n" for c in contexts]
+    lines.append(_mets_line(mets))
+    lines.append(f"Generate {len(specs)} cases as a JSON array, in this order:\n")
+    for n, ((case_type, mech, is_mascal), zap) in enumerate(zip(specs, zaps), 1):
+        lines.append(
+            f"\nCASE {n}:\n"
+            f"CASE: {case_type}\n"
+            f"MECHANISM: {mech}\n"
+            f"{_phase_instruction(case_type, mech, is_mascal)}\n"
+            f"ZAP NUMBER: Use exactly '{zap}' as the zap field — do not change it.\n"
+        )
+    lines.append("\nGenerate the cases now.")
+    return "".join(lines), zaps
+
+def _parse_case_array(text: str) -> List[Any]:
+    """Elements of a JSON array response. A truncated or partly malformed array
+    still yields every element that decodes cleanly."""
+    try:
+        data = json.loads(text)
+        if isinstance(data, dict):
+            data = data.get("cases", [data])
+        return data if isinstance(data, list) else []
+    except json.JSONDecodeError:
+        pass
+    out = []
+    decoder = json.JSONDecoder()
+    pos = text.find("{")
+    while pos != -1:
+        try:
+            obj, end = decoder.raw_decode(text, pos)
+        except json.JSONDecodeError:
+            pos = text.find("{", pos + 1)
+            continue
+        out.append(obj)
+        pos = text.find("{", end)
+    return out
+
+def _valid_case(data: Any) -> bool:
+    """Minimum structure the schedule and case book rely on."""
+    if not isinstance(data, dict):
+        return False
+    phases = data.get("phases")
+    return (isinstance(data.get("zmist"), dict) and isinstance(data.get("meta"), dict)
+            and isinstance(phases, dict) and isinstance(phases.get("dcr"), dict)
+            and isinstance(data.get("triage_category"), str))
+
+def _match_batch(elements: List[Any], zaps: List[str]) -> Dict[int, Dict]:
+    """Map valid elements back to their slots — by ZAP when the model echoed it,
+    otherwise by position — and pin each slot's ZAP onto its case."""
+    by_zap = {z: i for i, z in enumerate(zaps)}
+    out: Dict[int, Dict] = {}
+    for pos, el in enumerate(elements):
+        if not _valid_case(el):
+            continue
+        slot = by_zap.get(str(el["zmist"].get("zap", "")))
+        if slot is None or slot in out:
+            slot = pos if pos < len(zaps) and pos not in out else None
+        if slot is None:
+            continue
+        el["zmist"]["zap"] = zaps[slot]
+        out[slot] = el
+    return out
+
+async def generate_cases_batch_async(specs: List[tuple], environment: str, region: str, mets: Optional[List[str]] = None,
+                                     limiter=None, on_attempt=None, request: Optional[tuple] = None) -> Dict[int, Dict]:
+    """Generate len(specs) cases in one call. Returns {spec_index: case} for the
+    elements that came back valid; absent indices need a single-case retry.
+    `request` is a prebuilt _case_batch_request, as for generate_case_async."""
+    prompt, zaps = request or _case_batch_request(specs, environment, region, mets)
+    # A batch emits N cases' worth of tokens — give it a longer deadline.
+    response = await gemini_generate_async(prompt, _CASE_BATCH_GEN_CONFIG, limiter=limiter, weight=len(specs),
+                                           deadline=2 * GEMINI_CALL_DEADLINE_S, on_attempt=on_attempt)
+    return _match_batch(_parse_case_array(_response_text(response)), zaps)
+
+def create_fallback_case(case_type: str, mechanism: str, is_trauma: bool = True, zap: Optional[str] = None) -> Dict:
+    """Offline stand-in case. Pass `zap` to skip allocating from the
+    process-wide ZAP set (throwaway cases, e.g. what-if planning runs)."""
     return {
         "meta": {"title": case_type, "estimated_duration": "30-45 min" if is_trauma else "20-30 min", "personnel": "Medical Team", "target_specialty": "Emergency Medicine" if is_trauma else "Family Physician"},
         "learning_objectives": ["Perform primary survey", "Initiate resuscitation", "Determine evacuation priority"],
-        "zmist": {"zap": _new_zap(), "mechanism": mechanism, "injuries": case_type, "signs": "HR 110, BP 100/70" if is_trauma else "HR 88, BP 120/80", "treatment": "IV, O2, monitoring"},
+        "zmist": {"zap": zap or _new_zap(), "mechanism": mechanism, "injuries": case_type, "signs": "HR 110, BP 100/70" if is_trauma else "HR 88, BP 120/80", "treatment": "IV, O2, monitoring"},
         "nine_line": {"line1_location": "Grid TBD", "line2_freq": "Pri: 123.45", "line3_patients_precedence": "1 Alpha" if is_trauma else "1 Charlie", "line4_equipment": "None", "line5_patients_type": "1 Litter" if is_trauma else "1 Ambulatory", "line6_security": "Secure", "line7_marking": "VS-17", "line8_nationality": "US Military", "line9_nbc_terrain": "None"},
         "patient_data": {"demographics": f"{random.randint(19, 35)} yo male Marine", "history": "No PMH", "allergies": "NKDA"},
         "triage_category": "T2" if is_trauma else "T3",
@@ -415,7 +1008,7 @@ Days: {'; '.join([f"Day {d.day_number}: {d.tactical_setting}, {_day_patients(d)}
 
 Include: 1.SITUATION 2.MISSION 3.EXECUTION 4.ADMIN/LOG 5.CMD/SIG"""
     
-    response = get_client().models.generate_content(model=GEMINI_MODEL, contents=prompt)
+    response = gemini_generate(prompt)
     return response.text
 
 def generate_annex_q(config: ExerciseConfig) -> str:
@@ -445,7 +1038,7 @@ Structure per JP 4-02 / MCWP conventions:
 7. COMBAT AND OPERATIONAL STRESS CONTROL
 8. MEDICAL REPORTING AND DOCUMENTATION"""
 
-    response = get_client().models.generate_content(model=GEMINI_MODEL, contents=prompt)
+    response = gemini_generate(prompt)
     return response.text
 
 def generate_medroe(config: ExerciseConfig) -> str:
@@ -465,7 +1058,7 @@ Include:
 - Documentation requirements
 - MASCAL declaration authority and procedures{chr(10) + '- CBRN casualty decontamination-before-treatment rules' if has_cbrn else ''}{chr(10) + '- Detainee care, custody, and medical documentation rules' if has_detainee else ''}"""
     
-    response = get_client().models.generate_content(model=GEMINI_MODEL, contents=prompt)
+    response = gemini_generate(prompt)
     return response.text
 
 def _road_to_war_fallback(config: "ExerciseConfig") -> str:
@@ -593,9 +1186,7 @@ ANNEX Q (MEDICAL CONCEPT OF SUPPORT) SUMMARY:
 
 Now write the Road to War video-generation prompt."""
     try:
-        response = get_client().models.generate_content(
-            model=GEMINI_MODEL, contents=prompt
-        )
+        response = gemini_generate(prompt)
         text = _response_text(response)
         if text:
             header = f"ROAD TO WAR — VIDEO GENERATION PROMPT\nExercise: {config.exercise_name}\n\nPaste the prompt below into Claude to generate the Road to War video.\n\n"
@@ -607,25 +1198,30 @@ Now write the Road to War video-generation prompt."""
     return _road_to_war_fallback(config)
 
 # Schedule generation
+# Evaluator priority by casualty kind: surgical, acute (T1/T2), minor.
+_EVALUATOR_PRIORITY = (
+    ["General Surgery", "Orthopaedic Surgery", "Anesthesiology", "Emergency Medicine"],
+    ["Emergency Medicine", "Family Physician", "ER Nurse", "ERC Nurse"],
+    ["ICU Nurse", "Med Surg Nurse", "ER Nurse", "Family Physician"],
+)
+_EVALUATOR_ABBREV = {"General Surgery": "Gen Surg", "Orthopaedic Surgery": "Ortho", "Emergency Medicine": "EM", "Family Physician": "FP", "Anesthesiology": "Anes", "ERC Nurse": "ERC", "ER Nurse": "ER RN", "ICU Nurse": "ICU RN", "Med Surg Nurse": "MS RN"}
+
+def _evaluator_kind(case: Dict) -> int:
+    """Index into _EVALUATOR_PRIORITY."""
+    if case.get("phases", {}).get("dcs") is not None:
+        return 0
+    return 1 if case.get("triage_category", "T2") in ["T1", "T2"] else 2
+
+def _evaluator_spec(kind: int, specialists: Dict[str, int]) -> Optional[str]:
+    return next((spec for spec in _EVALUATOR_PRIORITY[kind] if specialists.get(spec, 0) > 0), None)
+
 def assign_evaluator(case: Dict, specialists: Dict[str, int], assigned_counts: Dict[str, int]) -> str:
-    needs_surgery = case.get("phases", {}).get("dcs") is not None
-    triage = case.get("triage_category", "T2")
-    
-    if needs_surgery:
-        priority = ["General Surgery", "Orthopaedic Surgery", "Anesthesiology", "Emergency Medicine"]
-    elif triage in ["T1", "T2"]:
-        priority = ["Emergency Medicine", "Family Physician", "ER Nurse", "ERC Nurse"]
-    else:
-        priority = ["ICU Nurse", "Med Surg Nurse", "ER Nurse", "Family Physician"]
-    
-    abbrev = {"General Surgery": "Gen Surg", "Orthopaedic Surgery": "Ortho", "Emergency Medicine": "EM", "Family Physician": "FP", "Anesthesiology": "Anes", "ERC Nurse": "ERC", "ER Nurse": "ER RN", "ICU Nurse": "ICU RN", "Med Surg Nurse": "MS RN"}
-    
-    for spec in priority:
-        if specialists.get(spec, 0) > 0:
-            assigned_counts[spec] = assigned_counts.get(spec, 0) + 1
-            num = ((assigned_counts[spec] - 1) % specialists[spec]) + 1
-            return f"{abbrev.get(spec, spec)} {num}"
-    return "Unassigned"
+    spec = _evaluator_spec(_evaluator_kind(case), specialists)
+    if spec is None:
+        return "Unassigned"
+    assigned_counts[spec] = assigned_counts.get(spec, 0) + 1
+    num = ((assigned_counts[spec] - 1) % specialists[spec]) + 1
+    return f"{_EVALUATOR_ABBREV.get(spec, spec)} {num}"
 
 def _clock(total_minutes: int) -> str:
     """Minutes-from-midnight -> HHMM, wrapping across midnight."""
@@ -660,31 +1256,37 @@ _MT_KW = ("amputation", "junctional", "evisceration", "hemothorax", "haemothorax
           "vascular", "splenic", "hepatic", "aortic", "pelvic fracture",
           "exsanguination", "penetrating abdominal", "penetrating torso", "penetrating chest")
 
+# Substring alternations: one scan of the case text per keyword list.
+_HEMORRHAGE_RE, _UMT_RE, _MT_RE = (re.compile("|".join(map(re.escape, kw)))
+                                   for kw in (_HEMORRHAGE_KW, _UMT_KW, _MT_KW))
+
 def _case_text(case: Dict) -> str:
     z = case.get("zmist", {})
     return f"{z.get('injuries','')} {z.get('mechanism','')} {z.get('treatment','')}".lower()
 
-def _requires_blood(case: Dict) -> bool:
+def _requires_blood(case: Dict, text: Optional[str] = None) -> bool:
     """A casualty needs blood if it goes to surgery, is T1, or its injuries
     describe hemorrhage. Derived from the case, never rolled."""
     if case.get("phases", {}).get("dcs") is not None:
         return True
     if case.get("triage_category") == "T1":
         return True
-    return any(k in _case_text(case) for k in _HEMORRHAGE_KW)
+    return _HEMORRHAGE_RE.search(_case_text(case) if text is None else text) is not None
 
-def _blood_tier(case: Dict) -> str:
+def _blood_tier(case: Dict, text: Optional[str] = None) -> str:
     """Classify transfusion severity from case clinical facts."""
-    if not _requires_blood(case):
+    text = _case_text(case) if text is None else text
+    if not _requires_blood(case, text):
         return "none"
-    text = _case_text(case)
-    if any(k in text for k in _UMT_KW):
+    if _UMT_RE.search(text):
         return "ultramassive"
     surgical = case.get("phases", {}).get("dcs") is not None
-    if surgical or case.get("triage_category") == "T1" or any(k in text for k in _MT_KW):
+    if surgical or case.get("triage_category") == "T1" or _MT_RE.search(text):
         return "massive"
     return "submassive"
 
+_BLOOD_TIER_NAMES = {"none": "", "submassive": "Submassive", "massive": "Massive (MT)", "ultramassive": "Ultramassive (UMT)"}
+
 def _blood_units(case: Dict) -> int:
     return _BLOOD_WBE[_blood_tier(case)]
 
@@ -766,6 +1368,30 @@ def _blood_pace(source: str, blood_cum: int) -> int:
         return 2 if blood_cum > 2 * STARTING_LTOWB_UNITS else 1
     return 0
 
+class _Census:
+    """Concurrent Role 2 load over one day's [arrival, cleared) intervals.
+    Arrivals and clearances are each sorted once; the census at time t is
+    (arrivals <= t) - (clearances <= t), two binary searches, instead of a
+    scan of every interval."""
+
+    def __init__(self, intervals):
+        spans = np.array(list(intervals), dtype=np.int64).reshape(-1, 2)
+        self.starts = np.sort(spans[:, 0])
+        self.ends = np.sort(spans[:, 1])
+
+    def at(self, times) -> np.ndarray:
+        return (np.searchsorted(self.starts, times, side="right")
+                - np.searchsorted(self.ends, times, side="right"))
+
+    def peak(self) -> tuple:
+        """(peak census, earliest time it is reached). Load only rises at an
+        arrival, so the peak is the census at some arrival time."""
+        if not len(self.starts):
+            return 0, 0
+        census = self.at(self.starts)
+        i = int(np.argmax(census))
+        return (int(census[i]), int(self.starts[i])) if census[i] > 0 else (0, 0)
+
 def annotate_pace_states(schedule: List[Dict], config) -> None:
     """Second pass: assign each casualty row a recommended PACE state + the trigger
     that set it, using the whole timeline for concurrent Role 2 census."""
@@ -779,11 +1405,15 @@ def annotate_pace_states(schedule: List[Dict], config) -> None:
     for r in schedule:
         if "arr_raw" in r:
             by_day.setdefault(r["day"], []).append(r)
+    census_of: Dict[int, int] = {}
+    for rows in by_day.values():
+        arrs = [o["arr_raw"] for o in rows]
+        at = _Census(zip(arrs, (o["cleared_raw"] for o in rows))).at(arrs).tolist()
+        census_of.update(zip(map(id, rows), at))
     for r in schedule:
         if "arr_raw" not in r:  # CBRN/detainee inject rows carry no clinical load
             continue
-        census = sum(1 for o in by_day.get(r["day"], [])
-                     if o["arr_raw"] <= r["arr_raw"] < o["cleared_raw"])
+        census = census_of[id(r)]
         sigs = dict(base_sigs)
         sigs["blood/WBB"] = _blood_pace(r.get("blood_source", ""), r.get("blood_cum", 0))
         if census > capacity:  # MASCAL / patient load exceeds throughput
@@ -809,40 +1439,73 @@ def _route_and_inbound(case: Dict, is_mascal_wave: bool) -> tuple:
         return transport, True
     return ("Litter" if is_mascal_wave else "MEDEVAC"), True
 
-def _case_teo(case: Dict, is_mascal_wave: bool = False) -> Dict:
-    """Flatten the case's own clinical detail for the T&EO sheet. Pulls straight
-    from the generated case — nothing is invented here."""
-    phases = case.get("phases", {}) or {}
-    def _collect(field):
-        out = []
+# --- Array schedule engine --------------------------------------------------
+# generate_schedule computes the timeline as NumPy columns: the slot walk only
+# draws cases (pool draws are order-dependent) and reads each case's own facts;
+# arrival offsets, POI / COC / 9-line times, dwell, cleared times and the
+# exercise-wide blood ledger are then whole-array operations, and the row
+# dicts are assembled last. Output matches the row-at-a-time reference in
+# backend/bench.py (bench schedule) row for row.
+_CLOCK_STRS = [f"{m // 60:02d}{m % 60:02d}" for m in range(24 * 60)]
+
+_BLOOD_TIERS = list(_BLOOD_WBE)
+
+def _clocks(minutes: np.ndarray) -> List[str]:
+    """Vectorized _clock."""
+    return [_CLOCK_STRS[m] for m in (minutes % (24 * 60)).tolist()]
+
+def _case_columns(cases: List[Dict], mascal: List[bool]) -> Dict[str, list]:
+    """One pass over the cases for every per-case fact a schedule row carries
+    (T&EO detail, route, evaluator kind), as columns; the numeric ones (dwell,
+    blood units, evaluator numbers) are finished as arrays by the caller."""
+    cols: Dict[str, list] = {k: [] for k in (
+        "zap", "surgical", "care_level", "disposition", "tier", "has_dcs", "has_pcc", "evac_precedence", "onward",
+        "signs", "handover", "expected", "contingencies", "debrief", "route", "inbound", "kind")}
+    for case, is_mascal_wave in zip(cases, mascal):
+        phases = case.get("phases", {}) or {}
+        expected: List[Any] = []
+        contingencies: List[Any] = []
         for pk in ("dcr", "dcs", "pcc"):
             ph = phases.get(pk)
             if isinstance(ph, dict):
-                out += ph.get(field, []) or []
-        return out
-    care_level = "DCR" + ("+DCS" if phases.get("dcs") else "") + ("+PCC" if phases.get("pcc") else "")
-    contingencies = [c for c in _collect("contingencies") if isinstance(c, dict)]
-    evac = case.get("evacuation", {}) or {}
-    tier = _blood_tier(case)
-    return {
-        "zap": case.get("zmist", {}).get("zap", ""),
-        "surgical": "Yes" if phases.get("dcs") else "No",
-        "care_level": care_level,
-        "disposition": case.get("disposition", ""),
-        "blood_units": _BLOOD_WBE[tier],
-        "blood_tier": {"none": "", "submassive": "Submassive", "massive": "Massive (MT)", "ultramassive": "Ultramassive (UMT)"}[tier],
-        "r2_dwell": _dwell_min(case, is_mascal_wave),
-        "evac_precedence": evac.get("priority", ""),
-        "onward": evac.get("transport_type", ""),
-        "signs": case.get("zmist", {}).get("signs", ""),
-        "handover": evac.get("handover_notes", ""),
-        "expected": " • ".join(str(a) for a in _collect("expected_actions")),
-        "contingencies": " | ".join(
+                expected += ph.get("expected_actions", []) or []
+                contingencies += ph.get("contingencies", []) or []
+        z = case.get("zmist", {})
+        evac = case.get("evacuation", {}) or {}
+        dcs, pcc = bool(phases.get("dcs")), bool(phases.get("pcc"))
+        route, inbound = _route_and_inbound(case, is_mascal_wave)
+        cols["zap"].append(z.get("zap", ""))
+        cols["surgical"].append("Yes" if dcs else "No")
+        cols["care_level"].append("DCR" + ("+DCS" if dcs else "") + ("+PCC" if pcc else ""))
+        cols["disposition"].append(case.get("disposition", ""))
+        cols["tier"].append(_blood_tier(case, f"{z.get('injuries','')} {z.get('mechanism','')} {z.get('treatment','')}".lower()))
+        cols["has_dcs"].append(dcs)
+        cols["has_pcc"].append(pcc)
+        cols["evac_precedence"].append(evac.get("priority", ""))
+        cols["onward"].append(evac.get("transport_type", ""))
+        cols["signs"].append(z.get("signs", ""))
+        cols["handover"].append(evac.get("handover_notes", ""))
+        cols["expected"].append(" • ".join(str(a) for a in expected))
+        cols["contingencies"].append(" | ".join(
             f"IF {c.get('condition','')} → {c.get('consequence','')} → {c.get('intervention','')}"
-            for c in contingencies
-        ),
-        "debrief": " • ".join(case.get("debrief_questions", []) or []),
-    }
+            for c in contingencies if isinstance(c, dict)))
+        cols["debrief"].append(" • ".join(case.get("debrief_questions", []) or []))
+        cols["route"].append(route)
+        cols["inbound"].append(inbound)
+        cols["kind"].append(_evaluator_kind(case))
+    return cols
+
+def _evaluators(kinds: List[int], specialists: Dict[str, int]) -> List[str]:
+    """assign_evaluator over a whole schedule: each specialist's cases are
+    numbered round-robin 1..count in schedule order."""
+    kind_spec = [_evaluator_spec(k, specialists) for k in range(len(_EVALUATOR_PRIORITY))]
+    chosen = np.array([kind_spec[k] or "" for k in kinds], dtype=object)
+    out = np.full(len(kinds), "Unassigned", dtype=object)
+    for spec in {s for s in kind_spec if s}:
+        idx = np.flatnonzero(chosen == spec)
+        labels = np.array([f"{_EVALUATOR_ABBREV.get(spec, spec)} {k + 1}" for k in range(specialists[spec])], dtype=object)
+        out[idx] = labels[np.arange(len(idx)) % specialists[spec]]
+    return out.tolist()
 
 def generate_schedule(config: ExerciseConfig, case_pools: Dict[tuple, List[Dict]]) -> tuple:
     """Build the MSEL timeline, drawing each slot's case from the pool it was
@@ -853,11 +1516,6 @@ def generate_schedule(config: ExerciseConfig, case_pools: Dict[tuple, List[Dict]
 
     Returns (schedule, ordered_cases): ordered_cases lists cases in schedule
     order so 'Case N' serials in the MSEL match Case N in the case book."""
-    schedule = []
-    ordered_cases: List[Dict] = []
-    assigned_counts = {}
-    blood_used = 0  # cumulative whole-blood-equivalent units drawn, exercise-wide
-
     def _draw(day_number: int, is_mascal: bool) -> Optional[Dict]:
         pool = case_pools.get((day_number, is_mascal))
         if pool:
@@ -868,108 +1526,120 @@ def generate_schedule(config: ExerciseConfig, case_pools: Dict[tuple, List[Dict]
                 return p.pop()
         return None
 
+    # Timeline order: inject rows as dicts, casualty slots as indices into the
+    # per-slot columns below.
+    timeline: List[Any] = []
+    ordered_cases: List[Dict] = []
+    day_col, event_col, start_col, pos_col, size_col, mascal_col = [], [], [], [], [], []
     for day in config.days:
         if day.cbrn:
-            schedule.append({"day": day.day_number, "event": "DRILL", "coc_hit_time": "N/A", "time": "0900", "nine_line_time": "N/A", "route": "N/A", "triage_cat": "N/A", "mechanism": "CBRN DRILL", "brief_description": "1-hour CBRN exercise - All clinical ops paused", "evaluator": "All Hands", "case_num": "DRILL"})
+            timeline.append({"day": day.day_number, "event": "DRILL", "coc_hit_time": "N/A", "time": "0900", "nine_line_time": "N/A", "route": "N/A", "triage_cat": "N/A", "mechanism": "CBRN DRILL", "brief_description": "1-hour CBRN exercise - All clinical ops paused", "evaluator": "All Hands", "case_num": "DRILL"})
         if day.detainee_ops:
-            schedule.append({"day": day.day_number, "event": "INJECT", "coc_hit_time": "N/A", "time": "1300", "nine_line_time": "N/A", "route": "N/A", "triage_cat": "N/A", "mechanism": "DETAINEE / EPW", "brief_description": "Detainee/EPW presents for care — apply detainee handling + MEDROE", "evaluator": "All Hands", "case_num": "INJECT"})
+            timeline.append({"day": day.day_number, "event": "INJECT", "coc_hit_time": "N/A", "time": "1300", "nine_line_time": "N/A", "route": "N/A", "triage_cat": "N/A", "mechanism": "DETAINEE / EPW", "brief_description": "Detainee/EPW presents for care — apply detainee handling + MEDROE", "evaluator": "All Hands", "case_num": "INJECT"})
 
-        # Night ops means SOME casualties arrive at night, not all care at night:
-        # carve a share of the routine load into a dedicated night wave.
+        # Wave layout as in the row-at-a-time engine: night share carved out of
+        # the routine load, MASCAL as an extra day wave, waves spread evenly
+        # across the 0700-1900 day and 2000-0200 night windows.
         night_pts = min(max(1, round(day.total_patients * 0.35)), day.total_patients) if day.night_ops else 0
         day_pts = day.total_patients - night_pts
-
-        # Routine day waves carry the daytime load; a MASCAL adds one more wave
-        # on top with its own surge count (additive, not an override).
         base_waves = max(day.total_waves, 1)
-        pts_per_wave = day_pts // base_waves
-        remainder = day_pts % base_waves
-        day_waves = [{"pts": pts_per_wave + (1 if w < remainder else 0), "mascal": False}
-                     for w in range(base_waves)]
+        day_waves = [(day_pts // base_waves + (1 if w < day_pts % base_waves else 0), False) for w in range(base_waves)]
         if day.mascal and day.mascal_patients:
-            day_waves.append({"pts": day.mascal_patients, "mascal": True})
-        night_waves = [{"pts": night_pts, "mascal": False}] if night_pts else []
-
-        # Day window 0700-1900 (12h); night window 2000-0200 (6h).
+            day_waves.append((day.mascal_patients, True))
+        night_waves = [(night_pts, False)] if night_pts else []
+        event = f"MASCAL ({day.mascal_etiology})" if day.mascal_etiology else "MASCAL"
         for group, start_min, span_min in ((day_waves, 7 * 60, 12 * 60), (night_waves, 20 * 60, 6 * 60)):
             interval = span_min / (len(group) + 1) if group else 0
-            for k, w in enumerate(group):
-                w["start_min"] = start_min + int(interval * (k + 1))
-
-        # Emit chronologically: day waves, then the night wave.
-        for w in day_waves + night_waves:
-            wave_pts = w["pts"]
-            is_mascal_wave = w["mascal"]
-            time_spread = 45 if is_mascal_wave else 60
-
-            for p in range(wave_pts):
-                case = _draw(day.day_number, is_mascal_wave)
-                if case is None:
-                    break
+            for k, (wave_pts, is_mascal_wave) in enumerate(group):
+                for p in range(wave_pts):
+                    case = _draw(day.day_number, is_mascal_wave)
+                    if case is None:
+                        break
+                    timeline.append(len(ordered_cases))
+                    ordered_cases.append(case)
+                    day_col.append(day.day_number)
+                    event_col.append(event if is_mascal_wave else "Routine")
+                    start_col.append(start_min + int(interval * (k + 1)))
+                    pos_col.append(p)
+                    size_col.append(wave_pts)
+                    mascal_col.append(is_mascal_wave)
+
+    # Per-case facts (route, T&EO detail) come from the case itself.
+    cols = _case_columns(ordered_cases, mascal_col)
+    transit_by_prec = {p: _transit_min(p, config) for p in set(cols["evac_precedence"])}
+    mascal = np.array(mascal_col, dtype=bool)
+
+    # MASCAL is a compressed spike then a tail (front-loaded); routine
+    # casualties spread evenly across the wave.
+    frac = np.array(pos_col, dtype=np.float64) / np.maximum(np.array(size_col, dtype=np.int64), 1)
+    offset = np.where(mascal, ((frac ** 2) * 40).astype(np.int64), (frac * 60).astype(np.int64))
+    arr = np.array(start_col, dtype=np.int64) + offset
+    transit = np.array([transit_by_prec[p] for p in cols["evac_precedence"]], dtype=np.int64)
+    # _dwell_min: OR / holding base by phase, MASCAL surge x1.5 (round half even, as round()).
+    dwell = np.rint(np.where(np.array(cols["has_dcs"], dtype=bool), 150,
+                             np.where(np.array(cols["has_pcc"], dtype=bool), 90, 45))
+                    * np.where(mascal, 1.5, 1.0)).astype(np.int64)
+    cleared_raw = arr + dwell
+    # Running blood ledger across the exercise: LTOWB stock first, then the
+    # walking blood bank once it is spent.
+    tier_units = np.array([_BLOOD_WBE[t] for t in _BLOOD_TIERS], dtype=np.int64)
+    units = tier_units[np.array([_BLOOD_TIERS.index(t) for t in cols["tier"]], dtype=np.int64)]
+    blood_cum = np.cumsum(units)
+    on_hand = np.maximum(0, STARTING_LTOWB_UNITS - blood_cum)
+    source = np.where(units == 0, "", np.where(blood_cum <= STARTING_LTOWB_UNITS, "LTOWB", "Walking Blood Bank"))
+
+    arr_l, transit_l, cleared_l = arr.tolist(), transit.tolist(), cleared_raw.tolist()
+    cum_l, on_hand_l, source_l = blood_cum.tolist(), on_hand.tolist(), source.tolist()
+    units_l, dwell_l = units.tolist(), dwell.tolist()
+    evaluators = _evaluators(cols["kind"], config.specialists)
+    c_route, c_inbound, c_tier = cols["route"], cols["inbound"], cols["tier"]
+    time_s, poi_s, cleared_s = _clocks(arr), _clocks(arr - transit), _clocks(cleared_raw)
+    coc_s, nine_s = _clocks(arr - 45), _clocks(arr - 30)
 
-                # MASCAL is a compressed spike then a tail (front-loaded); routine
-                # casualties spread evenly across the wave.
-                frac = p / max(wave_pts, 1)
-                offset = int((frac ** 2) * 40) if is_mascal_wave else int(frac * 60)
-                arr_total = w["start_min"] + offset
-
-                # Route + COC call are derived from the case, not rolled at random.
-                route, inbound = _route_and_inbound(case, is_mascal_wave)
-                if inbound:
-                    coc_hit_time = _clock(arr_total - 45)
-                    nine_time = _clock(arr_total - 30)
-                else:
-                    coc_hit_time = "N/A"
-                    nine_time = "N/A"
-
-                if is_mascal_wave:
-                    event = f"MASCAL ({day.mascal_etiology})" if day.mascal_etiology else "MASCAL"
-                else:
-                    event = "Routine"
-
-                teo = _case_teo(case, is_mascal_wave)
-                # Timeline: point of injury (golden-hour anchor) back from arrival
-                # by the parameter-driven transit; Role 2 cleared = arrival + dwell.
-                transit = _transit_min(teo["evac_precedence"], config)
-                poi_time = _clock(arr_total - transit)
-                cleared_raw = arr_total + teo["r2_dwell"]
-                cleared = _clock(cleared_raw)
-
-                # Running blood ledger: draw against LTOWB stock, then walking
-                # blood bank once the on-hand supply is spent.
-                units = teo["blood_units"]
-                blood_used += units
-                on_hand = max(0, STARTING_LTOWB_UNITS - blood_used)
-                if units == 0:
-                    blood_source = ""
-                elif blood_used <= STARTING_LTOWB_UNITS:
-                    blood_source = "LTOWB"
-                else:
-                    blood_source = "Walking Blood Bank"
-
-                schedule.append({
-                    "day": day.day_number,
-                    "event": event,
-                    "poi_time": poi_time,
-                    "cleared": cleared,
-                    "coc_hit_time": coc_hit_time,
-                    "time": _clock(arr_total),
-                    "nine_line_time": nine_time,
-                    "route": route,
-                    "triage_cat": case.get("triage_category", "T2"),
-                    "mechanism": case.get("zmist", {}).get("mechanism", "Unknown")[:50],
-                    "brief_description": case.get("zmist", {}).get("injuries", "")[:80],
-                    "evaluator": assign_evaluator(case, config.specialists, assigned_counts),
-                    "case_num": f"Case {len(ordered_cases) + 1}",
-                    "blood_cum": blood_used,
-                    "blood_on_hand": on_hand,
-                    "blood_source": blood_source,
-                    "transit_min": transit,
-                    "arr_raw": arr_total,
-                    "cleared_raw": cleared_raw,
-                    **teo,
-                })
-                ordered_cases.append(case)
+    schedule = []
+    for item in timeline:
+        if not isinstance(item, int):
+            schedule.append(item)
+            continue
+        i, case = item, ordered_cases[item]
+        inbound = c_inbound[i]
+        z = case.get("zmist", {})
+        schedule.append({
+            "day": day_col[i],
+            "event": event_col[i],
+            "poi_time": poi_s[i],
+            "cleared": cleared_s[i],
+            "coc_hit_time": coc_s[i] if inbound else "N/A",
+            "time": time_s[i],
+            "nine_line_time": nine_s[i] if inbound else "N/A",
+            "route": c_route[i],
+            "triage_cat": case.get("triage_category", "T2"),
+            "mechanism": z.get("mechanism", "Unknown")[:50],
+            "brief_description": z.get("injuries", "")[:80],
+            "evaluator": evaluators[i],
+            "case_num": f"Case {i + 1}",
+            "blood_cum": cum_l[i],
+            "blood_on_hand": on_hand_l[i],
+            "blood_source": source_l[i],
+            "transit_min": transit_l[i],
+            "arr_raw": arr_l[i],
+            "cleared_raw": cleared_l[i],
+            # T&EO detail, flattened from the case's own clinical content
+            "zap": cols["zap"][i],
+            "surgical": cols["surgical"][i],
+            "care_level": cols["care_level"][i],
+            "disposition": cols["disposition"][i],
+            "blood_units": units_l[i],
+            "blood_tier": _BLOOD_TIER_NAMES[c_tier[i]],
+            "r2_dwell": dwell_l[i],
+            "evac_precedence": cols["evac_precedence"][i],
+            "onward": cols["onward"][i],
+            "signs": cols["signs"][i],
+            "handover": cols["handover"][i],
+            "expected": cols["expected"][i],
+            "contingencies": cols["contingencies"][i],
+            "debrief": cols["debrief"][i],
+        })
 
     annotate_pace_states(schedule, config)
     return schedule, ordered_cases
@@ -988,7 +1658,7 @@ def create_docx(title: str, subtitle: str, content: str) -> BytesIO:
     for line in content.split('\n'):
         if line.strip():
             p = doc.add_paragraph(line)
-            if any(line.strip().startswith(f'{i}.') for i in range(1, 10)) or line.strip().isupper():
+            if _orders_bold(line):
                 if p.runs:
                     p.runs[0].bold = True
     output = BytesIO()
@@ -1136,11 +1806,239 @@ def create_case_book(cases: List[Dict], config: ExerciseConfig) -> BytesIO:
     output.seek(0)
     return output
 
+# --- Template documents -----------------------------------------------------
+# create_case_book and create_docx go through python-docx's object model for
+# every paragraph and table cell, and each opens and parses the bundled default
+# template again. These renderers write the same WordprocessingML directly:
+# the package parts and the document head/tail come from a blank python-docx
+# document parsed once per process and shared by every document, and the body
+# is string fragments streamed into word/document.xml.
+_XML_INVALID = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]")
+_W_PAGE_BREAK = '<w:p><w:r><w:br w:type="page"/></w:r></w:p>'
+_W_TBL_PR = ('<w:tblPr><w:tblStyle w:val="TableGrid"/><w:tblW w:type="auto" w:w="0"/>'
+             '<w:tblLook w:firstColumn="1" w:firstRow="1" w:lastColumn="0" w:lastRow="0" '
+             'w:noHBand="0" w:noVBand="1" w:val="04A0"/></w:tblPr>')
+_docx_template_parts: Optional[tuple] = None
+_docx_template_lock = threading.Lock()
+
+def _docx_template() -> tuple:
+    """(document.xml head, tail, package bytes, body width in EMU). The
+    package holds every part but word/document.xml, already compressed — the
+    styles parts alone are ~800 kB of XML that would otherwise be deflated
+    again for every document."""
+    global _docx_template_parts
+    with _docx_template_lock:
+        if _docx_template_parts is None:
+            _docx_template_parts = _build_docx_template()
+    return _docx_template_parts
+
+def _build_docx_template() -> tuple:
+    doc, buf = Document(), BytesIO()
+    doc.save(buf)
+    package = BytesIO()
+    with zipfile.ZipFile(buf) as z, zipfile.ZipFile(package, "w", zipfile.ZIP_DEFLATED) as out:
+        for n in z.namelist():
+            if n == "word/document.xml":
+                xml = z.read(n).decode("utf-8")
+            else:
+                out.writestr(n, z.read(n))
+    head_end = xml.index("<w:body>") + len("<w:body>")
+    return xml[:head_end], xml[xml.index("<w:sectPr"):], package.getvalue(), doc._block_width
+
+def _write_docx(body) -> BytesIO:
+    """A .docx from the shared template with `body` (an iterable of
+    WordprocessingML strings) as the document body: the template package is
+    copied and word/document.xml appended to it."""
+    head, tail, package, _block_width = _docx_template()
+    output = BytesIO(package)
+    output.seek(0, 2)
+    with zipfile.ZipFile(output, "a", zipfile.ZIP_DEFLATED) as zf:
+        with zf.open("word/document.xml", "w") as f:
+            f.write(head.encode("utf-8"))
+            for chunk in body:
+                f.write(chunk.encode("utf-8"))
+            f.write(tail.encode("utf-8"))
+    output.seek(0)
+    return output
+
+def _w_run(text: str, rpr: str = "") -> str:
+    """A run as python-docx writes it: tabs and line breaks become w:tab /
+    w:br, and text with outer whitespace is marked space-preserving."""
+    content = []
+    for seg in re.split(r"([\t\r\n])", _XML_INVALID.sub("", text)):
+        if seg == "\t":
+            content.append("<w:tab/>")
+        elif seg in ("\r", "\n"):
+            content.append("<w:br/>")
+        elif seg:
+            space = ' xml:space="preserve"' if len(seg.strip()) < len(seg) else ""
+            content.append(f"<w:t{space}>{xml_escape(seg)}</w:t>")
+    if not content and not rpr:
+        return "<w:r/>"
+    return f"<w:r>{rpr}{''.join(content)}</w:r>"
+
+def _w_p(text: Any = "", style: str = "", center: bool = False, rpr: str = "") -> str:
+    ppr = (f'<w:pStyle w:val="{style}"/>' if style else "") + ('<w:jc w:val="center"/>' if center else "")
+    ppr = f"<w:pPr>{ppr}</w:pPr>" if ppr else ""
+    if not text:
+        return f"<w:p>{ppr}</w:p>" if ppr else "<w:p/>"
+    return f"<w:p>{ppr}{_w_run(str(text), rpr)}</w:p>"
+
+def _w_table(rows: List[List[Any]], block_width: int) -> str:
+    width = Emu(block_width // len(rows[0])).twips
+    cell = f'<w:tc><w:tcPr><w:tcW w:type="dxa" w:w="{width}"/></w:tcPr><w:p>{{}}</w:p></w:tc>'
+    grid = f'<w:gridCol w:w="{width}"/>' * len(rows[0])
+    body = "".join("<w:tr>" + "".join(cell.format(_w_run(str(v))) for v in row) + "</w:tr>" for row in rows)
+    return f"<w:tbl>{_W_TBL_PR}<w:tblGrid>{grid}</w:tblGrid>{body}</w:tbl>"
+
+def _case_heading(i: int, case: Dict) -> str:
+    return _w_p(f'CASE {i+1}: {case.get("meta", {}).get("title", "Untitled")}', "Heading1")
+
+def _case_body(case: Dict, block_width: int) -> str:
+    """WordprocessingML for one case below its "CASE N" heading. Independent
+    of the case's serial, so it can be rendered before the schedule exists."""
+    out = []
+    meta = case.get("meta", {})
+    out.append(_w_table([["Duration", meta.get("estimated_duration", "N/A"), "Personnel", meta.get("personnel", "N/A")],
+                         ["Specialty", meta.get("target_specialty", "N/A"), "Triage", case.get("triage_category", "N/A")]],
+                        block_width))
+    out.append(_w_p())
+
+    out.append(_w_p("Learning Objectives", "Heading2"))
+    out.extend(_w_p(f"• {obj}") for obj in case.get("learning_objectives", []))
+
+    out.append(_w_p("Z-MIST Report", "Heading2"))
+    zmist = case.get("zmist", {})
+    out.append(_w_table([[lbl, zmist.get(key, "")] for lbl, key in [
+        ('Z - Zap Number', 'zap'), ('M - Mechanism', 'mechanism'), ('I - Injuries', 'injuries'),
+        ('S - Signs', 'signs'), ('T - Treatment', 'treatment')]], block_width))
+    out.append(_w_p())
+
+    out.append(_w_p("9-Line MEDEVAC Request", "Heading2"))
+    nl = case.get("nine_line", {})
+    out.append(_w_table([[lbl, nl.get(key, "")] for lbl, key in [
+        ('Line 1 - Location', 'line1_location'), ('Line 2 - Frequency', 'line2_freq'),
+        ('Line 3 - Patients/Precedence', 'line3_patients_precedence'), ('Line 4 - Equipment', 'line4_equipment'),
+        ('Line 5 - Patient Type', 'line5_patients_type'), ('Line 6 - Security', 'line6_security'),
+        ('Line 7 - Marking', 'line7_marking'), ('Line 8 - Nationality', 'line8_nationality'),
+        ('Line 9 - NBC/Terrain', 'line9_nbc_terrain')]], block_width))
+    out.append(_w_p())
+
+    out.append(_w_p("Patient Information", "Heading2"))
+    pt = case.get("patient_data", {})
+    out.append(_w_p(f'Demographics: {pt.get("demographics", "N/A")}'))
+    out.append(_w_p(f'Medical History: {pt.get("history", "N/A")}'))
+    out.append(_w_p(f'Allergies: {pt.get("allergies", "NKDA")}'))
+
+    labs = case.get("labs", {})
+    if labs and any(labs.values()):
+        out.append(_w_p("Initial Labs", "Heading2"))
+        out.append(_w_table([['Hgb', 'pH', 'Lactate', 'Base Excess', 'INR'],
+                             [labs.get(k, "") for k in ['hgb', 'ph', 'lactate', 'base_excess', 'inr']]], block_width))
+    out.append(_w_p())
+
+    phases = case.get("phases", {})
+    for pk in ["dcr", "dcs", "pcc"]:
+        phase = phases.get(pk)
+        if not phase:
+            continue
+        out.append(_w_p(phase.get("title", pk.upper()), "Heading2"))
+        out.append(_w_p(phase.get("narrative", "")))
+        out.append(_w_p("Expected Actions:"))
+        out.extend(_w_p(f"☐ {act}") for act in phase.get("expected_actions", []))
+        vitals = phase.get("vitals_trend", [])
+        if vitals:
+            out.append(_w_p())
+            out.append(_w_p("Vitals Trend:"))
+            out.append(_w_table([['Time', 'HR', 'BP', 'RR', 'SpO2', 'GCS']] +
+                                [[v.get(k, "") for k in ['time', 'hr', 'bp', 'rr', 'spo2', 'gcs']] for v in vitals],
+                                block_width))
+        cont = phase.get("contingencies", [])
+        if cont:
+            out.append(_w_p())
+            out.append(_w_p("Contingencies (If/Then):"))
+            for c in cont:
+                out.append(_w_p(f'IF: {c.get("condition", "")}'))
+                out.append(_w_p(f'   → CONSEQUENCE: {c.get("consequence", "")}'))
+                out.append(_w_p(f'   → INTERVENTION: {c.get("intervention", "")}'))
+        out.append(_w_p())
+
+    out.append(_w_p("Evacuation / En Route Care", "Heading2"))
+    evac = case.get("evacuation", {})
+    out.append(_w_p(f'Transport: {evac.get("transport_type", "N/A")}'))
+    out.append(_w_p(f'Priority: {evac.get("priority", "N/A")}'))
+    out.append(_w_p(f'Considerations: {evac.get("considerations", "")}'))
+    out.append(_w_p(f'Handover: {evac.get("handover_notes", "")}'))
+
+    out.append(_w_p("Debrief Questions", "Heading2"))
+    out.extend(_w_p(f"• {q}") for q in case.get("debrief_questions", []))
+    return "".join(out)
+
+def _case_fragment(i: int, case: Dict, block_width: int) -> str:
+    """WordprocessingML for one case — the body create_case_book builds."""
+    return _case_heading(i, case) + _case_body(case, block_width)
+
+def create_case_book_fast(cases: List[Dict], config: ExerciseConfig,
+                          bodies: Optional[List[Optional[str]]] = None) -> BytesIO:
+    """create_case_book's document, written as WordprocessingML fragments
+    instead of through python-docx (see _case_fragment). `bodies` may carry
+    pre-rendered _case_body fragments in case order; None entries render here."""
+    block_width = _docx_template()[3]
+
+    def _body():
+        front = [
+            _w_p(config.exercise_name.upper(), "Title", center=True),
+            _w_p("SIMULATION CASE BOOK", center=True, rpr='<w:rPr><w:b/><w:sz w:val="36"/></w:rPr>'),
+            _w_p(),
+            _w_p(f'Environment: {config.environment} | Region: {config.region}', center=True),
+            _w_p(f'Duration: {config.duration} days | Total Cases: {len(cases)}', center=True),
+            _w_p(f'Generated: {datetime.now().strftime("%d %b %Y %H%M")}'),
+            _W_PAGE_BREAK,
+            _w_p("TABLE OF CONTENTS", "Heading1"),
+        ]
+        front += [_w_p(f'Case {i+1}: {case.get("meta", {}).get("title", "Untitled")} '
+                       f'(ZAP: {case.get("zmist", {}).get("zap", "00000")})') for i, case in enumerate(cases)]
+        front.append(_W_PAGE_BREAK)
+        yield "".join(front)
+        for i, case in enumerate(cases):
+            if bodies and bodies[i] is not None:
+                frag = _case_heading(i, case) + bodies[i]
+            else:
+                frag = _case_fragment(i, case, block_width)
+            if i < len(cases) - 1:
+                frag += _W_PAGE_BREAK
+            yield frag
+
+    return _write_docx(_body())
+
+# Orders lines create_docx bolds: numbered paragraphs ("1." - "9.") and
+# all-caps headings.
+_ORDERS_NUMBERED = re.compile(r"[1-9]\.")
+_W_BOLD = "<w:rPr><w:b/></w:rPr>"
+
+def _orders_bold(line: str) -> bool:
+    s = line.strip()
+    return bool(_ORDERS_NUMBERED.match(s)) or s.isupper()
+
+def create_docx_fast(title: str, subtitle: str, content: str) -> BytesIO:
+    """create_docx's document from the shared template; the order text goes in
+    as one block of paragraphs rather than an add_paragraph call per line."""
+    front = [
+        _w_p(title, "Title", center=True),
+        _w_p(subtitle, center=True, rpr=_W_BOLD),
+        _w_p(f'DTG: {datetime.now().strftime("%d%H%MZ %b %Y").upper()}'),
+        _w_p('CLASSIFICATION: UNCLASSIFIED // FOR TRAINING ONLY'),
+        _w_p(),
+    ]
+    body = "".join(_w_p(line, rpr=_W_BOLD if _orders_bold(line) else "")
+                   for line in content.split('\n') if line.strip())
+    return _write_docx(("".join(front), body))
+
 def _autosize(ws, df):
     for idx, col in enumerate(df.columns):
         body = df[col].astype(str).map(len).max() if len(df) else 0
         max_len = max(int(body or 0), len(str(col))) + 2
-        ws.column_dimensions[chr(65 + idx)].width = min(max_len, 60)
+        ws.column_dimensions[get_column_letter(idx + 1)].width = min(max_len, 60)
 
 def _sheet(df: pd.DataFrame, source_cols, labels) -> pd.DataFrame:
     """Select/relabel columns, filling any missing ones (older stored exercises
@@ -1166,13 +2064,9 @@ def _parse_hhmm(s) -> Optional[int]:
         pass
     return None
 
-def _capacity_analysis(schedule: List[Dict], config: ExerciseConfig) -> pd.DataFrame:
-    """Planner-facing capacity vs demand roll-up, computed purely from the
-    arrival/dwell times already on the schedule — it reports on the timeline,
-    it never changes it."""
-    specialists = config.specialists or {}
-    surgeons = specialists.get("General Surgery", 0) + specialists.get("Orthopaedic Surgery", 0)
-
+def _capacity_intervals(schedule: List[Dict]) -> tuple:
+    """Casualty rows as ({day: [(arrival, cleared, surgical)]}, {day:
+    {evaluator: cases}}), from the HHMM arrival and the R2 dwell."""
     by_day: Dict[Any, List[tuple]] = {}
     eval_load: Dict[Any, Dict[str, int]] = {}
     for r in schedule:
@@ -1193,6 +2087,15 @@ def _capacity_analysis(schedule: List[Dict], config: ExerciseConfig) -> pd.DataF
         ev = r.get("evaluator") or ""
         if ev and ev not in ("All Hands", "Unassigned"):
             eval_load.setdefault(r.get("day"), {})[ev] = eval_load.setdefault(r.get("day"), {}).get(ev, 0) + 1
+    return by_day, eval_load
+
+def _capacity_rows(schedule: List[Dict], config: ExerciseConfig) -> List[Dict[str, Any]]:
+    """Planner-facing capacity vs demand roll-up, computed purely from the
+    arrival/dwell times already on the schedule — it reports on the timeline,
+    it never changes it. One {Day, Metric, Value, Flag} dict per row."""
+    specialists = config.specialists or {}
+    surgeons = specialists.get("General Surgery", 0) + specialists.get("Orthopaedic Surgery", 0)
+    by_day, eval_load = _capacity_intervals(schedule)
 
     # Peak (worst) recommended PACE state per day, with the trigger that set it.
     day_pace: Dict[Any, tuple] = {}
@@ -1207,19 +2110,8 @@ def _capacity_analysis(schedule: List[Dict], config: ExerciseConfig) -> pd.DataF
     rows = []
     for day in sorted(by_day):
         intervals = by_day[day]
-        # Sweep-line over arrival/cleared events for peak concurrent load.
-        events = sorted([(a, 1, s) for a, c, s in intervals] + [(c, -1, s) for a, c, s in intervals],
-                        key=lambda e: (e[0], e[1]))
-        cur = peak = cur_s = peak_s = 0
-        peak_t = peak_s_t = 0
-        for t, d, s in events:
-            cur += d
-            if s:
-                cur_s += d
-            if cur > peak:
-                peak, peak_t = cur, t
-            if cur_s > peak_s:
-                peak_s, peak_s_t = cur_s, t
+        peak, peak_t = _Census((a, c) for a, c, _s in intervals).peak()
+        peak_s, peak_s_t = _Census((a, c) for a, c, s in intervals if s).peak()
         if day in day_pace:
             idx, drv = day_pace[day]
             rows.append({"Day": day, "Metric": "Recommended PACE state (peak)",
@@ -1245,44 +2137,43 @@ def _capacity_analysis(schedule: List[Dict], config: ExerciseConfig) -> pd.DataF
     rows.append({"Day": "All", "Metric": "Blood demand vs LTOWB stock",
                  "Value": f"{total_blood} WBE units vs {STARTING_LTOWB_UNITS} on hand",
                  "Flag": f"WALKING BLOOD BANK — {deficit} u shortfall" if deficit else ""})
-    return pd.DataFrame(rows) if rows else pd.DataFrame({"Day": [], "Metric": [], "Value": [], "Flag": []})
-
-def create_msel(schedule: List[Dict], config: ExerciseConfig) -> BytesIO:
-    raw = pd.DataFrame(schedule)
-
-    # Inject rows lack the numeric blood/dwell keys -> NaN floats the column and
-    # casualty counts render like "24.0". Show clean ints, blank for injects.
-    for col in ("blood_units", "blood_cum", "blood_on_hand", "r2_dwell", "r2_census"):
-        if col in raw.columns:
-            raw[col] = raw[col].map(lambda v: "" if (v is None or (isinstance(v, float) and pd.isna(v)) or v == "") else int(float(v)))
-
-    # Sheet 1 — MSEL timeline (what EXCON runs the exercise from). The PACE column
-    # is the recommended Role 2 CSC state at that point on the timeline.
-    msel = _sheet(
-        raw,
-        ['day', 'event', 'pace_state', 'poi_time', 'coc_hit_time', 'nine_line_time', 'time', 'route', 'evac_precedence', 'triage_cat', 'surgical', 'disposition', 'zap', 'mechanism', 'brief_description', 'evaluator', 'case_num'],
-        ['Day', 'Event', 'PACE', 'POI Time', 'COC Hit Time', '9-Line Time', 'Arrival', 'Route', 'Precedence', 'Triage', 'Surgical', 'Disposition', 'ZAP #', 'Mechanism', 'Description', 'Evaluator', 'Serial'],
-    )
+    return rows
 
-    # Sheet 2 — T&EO / Controller detail (per-casualty, straight from the case).
-    teo = _sheet(
-        raw,
-        ['day', 'time', 'cleared', 'pace_state', 'pace_driver', 'r2_census', 'zap', 'triage_cat', 'care_level', 'surgical', 'blood_units', 'blood_tier', 'r2_dwell', 'disposition', 'signs', 'onward', 'handover', 'expected', 'contingencies', 'debrief', 'evaluator'],
-        ['Day', 'Arrival', 'R2 Cleared', 'PACE', 'PACE Trigger', 'R2 Census', 'ZAP #', 'Triage', 'Care Level', 'Surgical', 'Blood (WBE u)', 'Blood Tier', 'R2 Dwell (min)', 'Disposition', 'Initial Signs', 'Onward Tpt', 'Handover', 'Expected Key Actions', 'Contingencies (If/Then)', 'Debrief Prompts', 'Evaluator'],
-    )
-
-    # Sheet 3 — Blood Ledger (chronological running consumption vs LTOWB stock).
-    if "blood_units" in raw.columns:
-        drew = raw[pd.to_numeric(raw["blood_units"], errors="coerce").fillna(0) > 0].copy()
-    else:
-        drew = raw.iloc[0:0].copy()
-    ledger = _sheet(
-        drew,
-        ['day', 'time', 'zap', 'triage_cat', 'blood_tier', 'blood_units', 'blood_cum', 'blood_on_hand', 'blood_source'],
-        ['Day', 'Arrival', 'ZAP #', 'Triage', 'Tier', 'Units', 'Cum Used', 'On Hand', 'Source'],
-    )
+def _capacity_analysis(schedule: List[Dict], config: ExerciseConfig) -> pd.DataFrame:
+    return pd.DataFrame(_capacity_rows(schedule, config), columns=["Day", "Metric", "Value", "Flag"])
+
+# MSEL workbook column specs: (schedule key, header label) per sheet.
+# Sheet 1 — MSEL timeline (what EXCON runs the exercise from). The PACE column
+# is the recommended Role 2 CSC state at that point on the timeline.
+_MSEL_COLUMNS = (
+    ('day', 'Day'), ('event', 'Event'), ('pace_state', 'PACE'), ('poi_time', 'POI Time'),
+    ('coc_hit_time', 'COC Hit Time'), ('nine_line_time', '9-Line Time'), ('time', 'Arrival'), ('route', 'Route'),
+    ('evac_precedence', 'Precedence'), ('triage_cat', 'Triage'), ('surgical', 'Surgical'),
+    ('disposition', 'Disposition'), ('zap', 'ZAP #'), ('mechanism', 'Mechanism'),
+    ('brief_description', 'Description'), ('evaluator', 'Evaluator'), ('case_num', 'Serial'),
+)
+# Sheet 2 — T&EO / Controller detail (per-casualty, straight from the case).
+_TEO_COLUMNS = (
+    ('day', 'Day'), ('time', 'Arrival'), ('cleared', 'R2 Cleared'), ('pace_state', 'PACE'),
+    ('pace_driver', 'PACE Trigger'), ('r2_census', 'R2 Census'), ('zap', 'ZAP #'), ('triage_cat', 'Triage'),
+    ('care_level', 'Care Level'), ('surgical', 'Surgical'), ('blood_units', 'Blood (WBE u)'),
+    ('blood_tier', 'Blood Tier'), ('r2_dwell', 'R2 Dwell (min)'), ('disposition', 'Disposition'),
+    ('signs', 'Initial Signs'), ('onward', 'Onward Tpt'), ('handover', 'Handover'),
+    ('expected', 'Expected Key Actions'), ('contingencies', 'Contingencies (If/Then)'),
+    ('debrief', 'Debrief Prompts'), ('evaluator', 'Evaluator'),
+)
+# Sheet 3 — Blood Ledger (chronological running consumption vs LTOWB stock).
+_LEDGER_COLUMNS = (
+    ('day', 'Day'), ('time', 'Arrival'), ('zap', 'ZAP #'), ('triage_cat', 'Triage'), ('blood_tier', 'Tier'),
+    ('blood_units', 'Units'), ('blood_cum', 'Cum Used'), ('blood_on_hand', 'On Hand'), ('blood_source', 'Source'),
+)
+# Inject rows lack the numeric blood/dwell keys -> shown blank, not "24.0".
+_MSEL_INT_COLS = ("blood_units", "blood_cum", "blood_on_hand", "r2_dwell", "r2_census")
 
-    # Sheet 4 — Objectives (exercise METL / footprint / personnel + blood summary).
+def _objective_rows(config: ExerciseConfig, blood: Optional[tuple]) -> List[Dict[str, str]]:
+    """Sheet 4 — Objectives (exercise METL / footprint / personnel + blood
+    summary). `blood` is (total units, transfused, MT, UMT), or None when the
+    schedule carries no blood columns."""
     obj_data = []
     for m in config.selected_mets:
         obj_data.append({"Category": "METL Task", "Item": m})
@@ -1291,29 +2182,21 @@ def create_msel(schedule: List[Dict], config: ExerciseConfig) -> BytesIO:
     for k, v in (config.specialists or {}).items():
         if v:
             obj_data.append({"Category": "Personnel", "Item": f"{k}: {v}"})
-    if "blood_units" in raw.columns:
-        bu = pd.to_numeric(raw["blood_units"], errors="coerce").fillna(0)
-        total_blood = int(bu.sum())
-        transfused = int((bu > 0).sum())
-        tiers = raw.get("blood_tier")
-        mt = int((tiers == "Massive (MT)").sum()) if tiers is not None else 0
-        umt = int((tiers == "Ultramassive (UMT)").sum()) if tiers is not None else 0
+    if blood is not None:
+        total_blood, transfused, mt, umt = blood
         deficit = max(0, total_blood - STARTING_LTOWB_UNITS)
         obj_data.append({"Category": "Blood Supply", "Item": f"On hand at start: {STARTING_LTOWB_UNITS} u LTOWB"})
         obj_data.append({"Category": "Blood Demand", "Item": f"{total_blood} WBE units — {transfused} transfused ({mt} MT, {umt} UMT)"})
         obj_data.append({"Category": "Blood Status", "Item": (
             f"Walking Blood Bank REQUIRED — {deficit} u shortfall beyond stock" if deficit > 0
             else f"Within stock — {STARTING_LTOWB_UNITS - total_blood} u remaining")})
-    objectives = pd.DataFrame(obj_data) if obj_data else pd.DataFrame({"Category": [], "Item": []})
-
-    # Sheet 5 — Planner Analysis (capacity vs demand, derived from the timeline).
-    analysis = _capacity_analysis(schedule, config)
+    return obj_data
 
-    # Sheet 6 — PACE Posture reference: the pre-briefed actions per CSC state
-    # (from docs/csc-pace). Static; links a timeline PACE state to what each
-    # actor does. Marked with which states the exercise actually reached.
-    reached = {r.get("pace_state") for r in schedule if r.get("pace_state")}
-    posture = pd.DataFrame([
+def _posture_rows(reached) -> List[Dict[str, str]]:
+    """Sheet 6 — PACE Posture reference: the pre-briefed actions per CSC state
+    (from docs/csc-pace). Static; links a timeline PACE state to what each
+    actor does. Marked with which states the exercise actually reached."""
+    return [
         {"PACE State": "PRIMARY", "JTS Tier": "Best", "Reached": "◀ reached" if "PRIMARY" in reached else "",
          "Command": "Green on COP; standard authorities; no deviation from CPG",
          "Provider": "Standard care per JTS CPG; full surgical capability; component blood per MTP",
@@ -1330,16 +2213,835 @@ def create_msel(schedule: List[Dict], config: ExerciseConfig) -> BytesIO:
          "Command": "Black on COP; CO/CMO pre-brief in full effect; recovery triggers monitored",
          "Provider": "Survivability care only; pre-briefed boundaries; document for recovery",
          "Logistics": "No outbound request possible; operating autonomously; recovery cued to first restored channel"},
-    ])
+    ]
+
+_SIM_COLUMNS = (
+    ('day', 'Day'), ('time', 'Arrival'), ('case_num', 'Serial'), ('triage_cat', 'Triage'), ('surgical', 'Surgical'),
+    ('bed_wait', 'Bed Wait (min)'), ('provider_wait', 'Provider Wait (min)'), ('or_wait', 'OR Wait (min)'),
+    ('wait', 'Total Wait (min)'), ('cleared', 'Sim Cleared'), ('planned_cleared', 'Planned Cleared'),
+    ('los', 'Sim Stay (min)'), ('pace_state', 'Sim PACE'), ('pace_driver', 'Sim PACE Trigger'),
+)
+_SIM_TRANSITION_COLUMNS = (
+    ('day', 'Day'), ('time', 'Time'), ('pace_state', 'PACE'), ('pace_driver', 'Trigger'), ('case_num', 'At Serial'),
+)
+
+def _simulation_sheets(schedule: List[Dict], config: ExerciseConfig) -> List[tuple]:
+    """Sheets 7-8 — Role 2 Simulation (per-casualty waits and cleared times
+    under finite beds / OR tables / providers) and the simulated PACE
+    transitions; (title, labels, rows keyed by label) for each."""
+    sim = simulate_role2(schedule, config)
+    return [(title, [label for _, label in spec], [{label: r.get(k) for k, label in spec} for r in rows])
+            for title, spec, rows in (("Role 2 Simulation", _SIM_COLUMNS, sim["rows"]),
+                                      ("Sim PACE Transitions", _SIM_TRANSITION_COLUMNS, sim["transitions"]))]
+
+def _columns(spec):
+    return [k for k, _ in spec], [label for _, label in spec]
+
+def create_msel(schedule: List[Dict], config: ExerciseConfig) -> BytesIO:
+    """pandas/openpyxl reference MSEL workbook (MSEL_RENDERER=pandas); the
+    render pool uses create_msel_stream."""
+    raw = pd.DataFrame(schedule)
+
+    # Inject rows lack the numeric blood/dwell keys -> NaN floats the column and
+    # casualty counts render like "24.0". Show clean ints, blank for injects.
+    for col in _MSEL_INT_COLS:
+        if col in raw.columns:
+            raw[col] = raw[col].map(lambda v: "" if (v is None or (isinstance(v, float) and pd.isna(v)) or v == "") else int(float(v)))
+
+    msel = _sheet(raw, *_columns(_MSEL_COLUMNS))
+    teo = _sheet(raw, *_columns(_TEO_COLUMNS))
+    if "blood_units" in raw.columns:
+        drew = raw[pd.to_numeric(raw["blood_units"], errors="coerce").fillna(0) > 0].copy()
+    else:
+        drew = raw.iloc[0:0].copy()
+    ledger = _sheet(drew, *_columns(_LEDGER_COLUMNS))
+
+    blood = None
+    if "blood_units" in raw.columns:
+        bu = pd.to_numeric(raw["blood_units"], errors="coerce").fillna(0)
+        tiers = raw.get("blood_tier")
+        blood = (int(bu.sum()), int((bu > 0).sum()),
+                 int((tiers == "Massive (MT)").sum()) if tiers is not None else 0,
+                 int((tiers == "Ultramassive (UMT)").sum()) if tiers is not None else 0)
+    obj_data = _objective_rows(config, blood)
+    objectives = pd.DataFrame(obj_data) if obj_data else pd.DataFrame({"Category": [], "Item": []})
+
+    # Sheet 5 — Planner Analysis (capacity vs demand, derived from the timeline).
+    analysis = _capacity_analysis(schedule, config)
+    posture = pd.DataFrame(_posture_rows({r.get("pace_state") for r in schedule if r.get("pace_state")}))
+    sims = [(title, pd.DataFrame(rows, columns=labels)) for title, labels, rows in _simulation_sheets(schedule, config)]
 
     output = BytesIO()
     with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        for name, d in (('MSEL', msel), ('T&EO', teo), ('Blood Ledger', ledger), ('Objectives', objectives), ('Planner Analysis', analysis), ('PACE Posture', posture)):
+        for name, d in [('MSEL', msel), ('T&EO', teo), ('Blood Ledger', ledger), ('Objectives', objectives), ('Planner Analysis', analysis), ('PACE Posture', posture)] + sims:
             d.to_excel(writer, index=False, sheet_name=name)
             _autosize(writer.sheets[name], d)
     output.seek(0)
     return output
 
+# --- Streaming MSEL workbook ------------------------------------------------
+# create_msel_stream writes the same sheets as create_msel through
+# openpyxl's write-only mode: no DataFrames and no Cell objects kept per value.
+# One pass over the schedule formats the MSEL, T&EO and Blood Ledger rows as
+# plain tuples (sharing the schedule's own strings) while tracking each
+# column's widest value and the blood / PACE roll-ups. Write-only sheets must
+# have their column widths set before the first row, which is why the rows
+# are kept until the pass is over rather than appended as they are formatted.
+_thin = Side(style="thin")
+_HEADER_FONT = Font(bold=True)
+_HEADER_BORDER = Border(left=_thin, right=_thin, top=_thin, bottom=_thin)
+_HEADER_ALIGN = Alignment(horizontal="center", vertical="top")
+
+def _msel_value(v):
+    """Blank for None/NaN (what _sheet's fillna does), else unchanged."""
+    return "" if v is None or (isinstance(v, float) and v != v) else v
+
+def _msel_int(v):
+    return "" if (v is None or (isinstance(v, float) and v != v) or v == "") else int(float(v))
+
+def _write_sheet(wb, title: str, labels, rows, widths):
+    """Append a write-only sheet: widths first, pandas-style header, rows."""
+    ws = wb.create_sheet(title)
+    for idx, w in enumerate(widths, 1):
+        ws.column_dimensions[get_column_letter(idx)].width = min(w + 2, 60)
+    header = []
+    for label in labels:
+        c = WriteOnlyCell(ws, value=label)
+        c.font, c.border, c.alignment = _HEADER_FONT, _HEADER_BORDER, _HEADER_ALIGN
+        header.append(c)
+    ws.append(header)
+    for row in rows:
+        ws.append([None if v == "" else v for v in row])
+
+def _dict_sheet(rows: List[Dict], labels) -> tuple:
+    """(labels, row tuples, widths) for a small list-of-dicts sheet."""
+    values = [tuple(_msel_value(r.get(k)) for k in labels) for r in rows]
+    widths = [max([len(str(label))] + [len(str(row[i])) for row in values]) for i, label in enumerate(labels)]
+    return labels, values, widths
+
+def create_msel_stream(schedule: List[Dict], config: ExerciseConfig) -> BytesIO:
+    """Same workbook as create_msel, streamed in openpyxl write-only mode."""
+    keys = set()
+    for r in schedule:
+        keys.update(r)
+    ints = [c for c in _MSEL_INT_COLS if c in keys]
+    specs = {"MSEL": _MSEL_COLUMNS, "T&EO": _TEO_COLUMNS, "Blood Ledger": _LEDGER_COLUMNS}
+    rows = {name: [] for name in specs}
+    widths = {name: [len(label) for _, label in spec] for name, spec in specs.items()}
+    has_blood = "blood_units" in keys
+    total_blood = transfused = mt = umt = 0
+    reached = set()
+
+    for r in schedule:
+        if ints:
+            r = dict(r)
+            for c in ints:
+                r[c] = _msel_int(r.get(c))
+        units = r.get("blood_units", "")
+        drew = has_blood and units != "" and units > 0
+        if has_blood:
+            total_blood += units or 0
+            transfused += drew
+            tier = r.get("blood_tier")
+            mt += tier == "Massive (MT)"
+            umt += tier == "Ultramassive (UMT)"
+        if r.get("pace_state"):
+            reached.add(r["pace_state"])
+        for name, spec in specs.items():
+            if name == "Blood Ledger" and not drew:
+                continue
+            row = tuple(_msel_value(r.get(k)) for k, _ in spec)
+            w = widths[name]
+            for i, v in enumerate(row):
+                n = len(v) if isinstance(v, str) else len(str(v))
+                if n > w[i]:
+                    w[i] = n
+            rows[name].append(row)
+
+    wb = Workbook(write_only=True)
+    for name, spec in specs.items():
+        _write_sheet(wb, name, [label for _, label in spec], rows[name], widths[name])
+        rows[name] = None
+    blood = (total_blood, transfused, mt, umt) if has_blood else None
+    for name, (labels, values, w) in (
+            ("Objectives", _dict_sheet(_objective_rows(config, blood), ["Category", "Item"])),
+            ("Planner Analysis", _dict_sheet(_capacity_rows(schedule, config), ["Day", "Metric", "Value", "Flag"])),
+            ("PACE Posture", _dict_sheet(_posture_rows(reached),
+                                         ["PACE State", "JTS Tier", "Reached", "Command", "Provider", "Logistics"])),
+            *((title, _dict_sheet(rows, labels)) for title, labels, rows in _simulation_sheets(schedule, config))):
+        _write_sheet(wb, name, labels, values, w)
+    output = BytesIO()
+    wb.save(output)
+    output.seek(0)
+    return output
+
+# --- Monte Carlo replication ------------------------------------------------
+# The schedule is one deterministic draw: arrival offsets, _dwell_min and the
+# _blood_tier units are point estimates. monte_carlo replays a schedule many
+# times with arrival jitter (normal, minutes), dwell noise (lognormal, mean 1)
+# and transfusion units drawn across each tier's evidence band (triangular,
+# mode at the planning point), and reports the spread of the planner metrics:
+# peak census, peak surgical concurrency, LTOWB exhaustion time and the peak
+# PACE state per day. Replications are vectorized in chunks and the chunks run
+# in the render pool.
+MC_CHUNK = int(os.getenv("MC_CHUNK", "500"))  # replications per pool task
+
+# WBE units per tier: submassive below the MT threshold (<10), MT 10-20, UMT
+# >20 (see _BLOOD_WBE). The UMT ceiling is a planning bound, not a threshold.
+_BLOOD_BANDS = {"submassive": (1, 9), "massive": (10, 20), "ultramassive": (21, 40)}
+_BLOOD_TIER_LABELS = {"Submassive": "submassive", "Massive (MT)": "massive", "Ultramassive (UMT)": "ultramassive"}
+
+def _mc_inputs(schedule: List[Dict]) -> Dict[str, np.ndarray]:
+    """Casualty rows as columns: day, arrival and dwell minutes, surgical flag
+    and blood tier. Stored schedules without arr_raw fall back to the HHMM
+    times the same way _capacity_rows does."""
+    cols = {"day": [], "arr": [], "dwell": [], "surgical": [], "tier": []}
+    for r in schedule:
+        if str(r.get("case_num", "")).upper() in ("DRILL", "INJECT"):
+            continue
+        arr = r.get("arr_raw", _parse_hhmm(r.get("time")))
+        if arr is None:
+            continue
+        try:
+            dwell = int(float(r.get("r2_dwell") or 0))
+        except (TypeError, ValueError):
+            dwell = 0
+        if not dwell:
+            clr = _parse_hhmm(r.get("cleared"))
+            dwell = (clr - arr) if (clr is not None and clr > arr) else 60
+        cols["day"].append(int(r.get("day") or 0))
+        cols["arr"].append(arr)
+        cols["dwell"].append(dwell)
+        cols["surgical"].append(str(r.get("surgical", "")).strip().lower() == "yes")
+        cols["tier"].append(_BLOOD_TIER_LABELS.get(r.get("blood_tier") or "", "none"))
+    return {k: np.array(v, dtype=object if k == "tier" else None) for k, v in cols.items()}
+
+def _mc_replicate(inputs: Dict[str, np.ndarray], params: Dict[str, Any], pace_floor: int,
+                  capacity: int, seed: int, reps: int) -> Dict[str, np.ndarray]:
+    """One chunk of replications, all at once as (reps, rows) arrays. Returns
+    per-replication, per-day peak census / surgical concurrency / PACE index,
+    and the exercise minute LTOWB stock was exhausted (-1 if never)."""
+    rng = np.random.default_rng(seed)
+    day, arr, dwell = inputs["day"].astype(np.int64), inputs["arr"].astype(np.int64), inputs["dwell"].astype(np.float64)
+    surgical, tier = inputs["surgical"].astype(bool), inputs["tier"]
+    n = len(arr)
+    days = np.unique(day)
+
+    a = np.tile(arr, (reps, 1))
+    if params["arrival_jitter_min"]:
+        a += np.rint(rng.normal(0.0, params["arrival_jitter_min"], (reps, n))).astype(np.int64)
+    if params["dwell_cv"]:
+        sigma = np.sqrt(np.log1p(params["dwell_cv"] ** 2))
+        d = np.maximum(1, np.rint(dwell * rng.lognormal(-sigma * sigma / 2, sigma, (reps, n))).astype(np.int64))
+    else:
+        d = np.broadcast_to(np.maximum(1, dwell.astype(np.int64)), (reps, n))
+    c = a + d
+
+    units = np.zeros((reps, n), dtype=np.int64)
+    for name, (lo, hi) in _BLOOD_BANDS.items():
+        idx = np.flatnonzero(tier == name)
+        if not len(idx):
+            continue
+        mode = _BLOOD_WBE[name]
+        left = mode - params["blood_spread"] * (mode - lo)
+        right = mode + params["blood_spread"] * (hi - mode)
+        units[:, idx] = (np.rint(rng.triangular(left, mode, right, (reps, len(idx)))).astype(np.int64)
+                         if right > left else mode)
+
+    # Exercise-wide blood ledger in (jittered) arrival order.
+    t_ex = (day - 1) * 24 * 60 + a
+    order = np.argsort(t_ex, axis=1, kind="stable")
+    cum_sorted = np.cumsum(np.take_along_axis(units, order, axis=1), axis=1)
+    over = cum_sorted > STARTING_LTOWB_UNITS
+    first = np.argmax(over, axis=1)
+    exhausted = np.where(over.any(axis=1), np.take_along_axis(t_ex, order, axis=1)[np.arange(reps), first], -1)
+    cum = np.empty_like(cum_sorted)
+    np.put_along_axis(cum, order, cum_sorted, axis=1)
+    blood_pace = np.where((units > 0) & (cum > STARTING_LTOWB_UNITS), 1 + (cum > 2 * STARTING_LTOWB_UNITS), 0)
+
+    peak = np.zeros((reps, len(days)), dtype=np.int64)
+    peak_s = np.zeros_like(peak)
+    pace = np.zeros_like(peak)
+    for j, dn in enumerate(days):
+        idx = np.flatnonzero(day == dn)
+        # Sweep over the day's events, clearances before arrivals at the same
+        # minute ([arrival, cleared) intervals, as in _Census).
+        keys = np.concatenate([c[:, idx] * 2, a[:, idx] * 2 + 1], axis=1)
+        ev = np.argsort(keys, axis=1, kind="stable")
+        m = len(idx)
+        step = np.concatenate([-np.ones(m, np.int64), np.ones(m, np.int64)])
+        step_s = step * np.concatenate([surgical[idx], surgical[idx]])
+        peak[:, j] = np.cumsum(step[ev], axis=1).max(axis=1)
+        peak_s[:, j] = np.cumsum(step_s[ev], axis=1).max(axis=1)
+        pace[:, j] = np.maximum(np.maximum(pace_floor, blood_pace[:, idx].max(axis=1)),
+                                np.where(peak[:, j] > capacity, 2, 0))
+    return {"days": days, "peak": peak, "peak_surgical": peak_s, "pace": pace, "exhausted": exhausted}
+
+def _pcts(x: np.ndarray) -> Dict[str, int]:
+    return {f"p{q}": int(np.percentile(x, q, method="inverted_cdf")) for q in (50, 90, 99)}
+
+def monte_carlo(schedule: List[Dict], config: ExerciseConfig, params: "MonteCarloParams") -> Dict[str, Any]:
+    """Replay `schedule` params.replications times (see _mc_replicate) across
+    the render pool; P50/P90/P99 and PACE-state probabilities per day."""
+    inputs = _mc_inputs(schedule)
+    capacity = _r2_capacity(config)
+    surgeons = (config.specialists or {}).get("General Surgery", 0) + (config.specialists or {}).get("Orthopaedic Surgery", 0)
+    result: Dict[str, Any] = {"replications": params.replications, "params": params.model_dump(),
+                              "capacity": capacity, "surgeons": surgeons, "days": [],
+                              "ltowb": {"stock": STARTING_LTOWB_UNITS}}
+    if not len(inputs["arr"]):
+        return result
+    pace_floor = max(_logistics_pace(config), _evac_corridor_pace(config), _staff_pace_floor(config))
+    chunks = [min(MC_CHUNK, params.replications - i) for i in range(0, params.replications, MC_CHUNK)]
+    seeds = np.random.SeedSequence(params.seed).generate_state(len(chunks)).tolist()
+    futures = [_pool_submit(_mc_replicate, inputs, params.model_dump(), pace_floor, capacity, seed, n)
+               for seed, n in zip(seeds, chunks)]
+    parts = [f.result() for f in futures]
+    peak, peak_s, pace = (np.concatenate([p[k] for p in parts]) for k in ("peak", "peak_surgical", "pace"))
+    exhausted = np.concatenate([p["exhausted"] for p in parts])
+
+    for j, dn in enumerate(parts[0]["days"].tolist()):
+        counts = np.bincount(pace[:, j], minlength=len(_PACE_STATES))
+        result["days"].append({
+            "day": dn,
+            "peak_census": _pcts(peak[:, j]),
+            "p_census_over_capacity": round(float((peak[:, j] > capacity).mean()), 4),
+            "peak_surgical": _pcts(peak_s[:, j]),
+            "p_surgical_over_surgeons": round(float((peak_s[:, j] > surgeons).mean()), 4) if surgeons else None,
+            "pace": {s: round(float(counts[i] / params.replications), 4) for i, s in enumerate(_PACE_STATES)},
+        })
+    # Never-exhausted replications sort last, so a percentile that lands on
+    # them reads as "not exhausted" (None).
+    t = np.where(exhausted < 0, np.iinfo(np.int64).max, exhausted)
+    result["ltowb"]["p_exhausted"] = round(float((exhausted >= 0).mean()), 4)
+    result["ltowb"]["exhaustion"] = {
+        k: None if v == np.iinfo(np.int64).max else {"day": v // (24 * 60) + 1, "time": _clock(v % (24 * 60))}
+        for k, v in _pcts(t).items()}
+    return result
+
+# --- Discrete-event Role 2 simulation ---------------------------------------
+# The schedule's cleared times assume every casualty is treated on arrival.
+# simulate_role2 replays the arrivals against finite resources derived from
+# the config: beds and OR tables (splitting the _r2_capacity planning estimate)
+# and providers per specialty (config.specialists). A casualty takes a bed,
+# then its assigned provider's specialty for damage-control resuscitation,
+# then an OR table for surgery (surgical cases) or the rest of its dwell in
+# the bed; every queue is served by triage priority, first come first served
+# within a category. Event-driven on a heap in exercise minutes — no clocks.
+# With no contention the simulated cleared times equal the schedule's.
+_TRIAGE_RANK = {"T1": 0, "T2": 1, "T3": 2, "T4": 3, "Expectant": 3}
+_EVALUATOR_SPECIALTY = {"Gen Surg": "General Surgery", "Ortho": "Orthopaedic Surgery", "EM": "Emergency Medicine",
+                        "FP": "Family Physician", "Anes": "Anesthesiology", "ERC": "ERC Nurse", "ER RN": "ER Nurse",
+                        "ICU RN": "ICU Nurse", "MS RN": "Med Surg Nurse"}
+_DCR_BASE_MIN = 45  # the resuscitation share of _dwell_min's bases (150 / 90 / 45)
+
+def _des_resources(config) -> Dict[str, int]:
+    spec = getattr(config, "specialists", {}) or {}
+    or_tables = max(1, spec.get("General Surgery", 0))
+    return {"or": or_tables, "bed": max(1, _r2_capacity(config) - or_tables),
+            **{s: n for s, n in spec.items() if n > 0}}
+
+def simulate_role2(schedule: List[Dict], config) -> Dict[str, Any]:
+    """Run the schedule's casualties through the Role 2. Returns "rows" (one
+    dict per casualty row, in schedule order: waits by resource, simulated
+    cleared time and PACE state) and "transitions" (PACE state changes along
+    the simulated timeline)."""
+    capacity = _r2_capacity(config)
+    free = _des_resources(config)
+    pts = []
+    for r in schedule:
+        if str(r.get("case_num", "")).upper() in ("DRILL", "INJECT"):
+            continue
+        arr = r.get("arr_raw", _parse_hhmm(r.get("time")))
+        if arr is None:
+            continue
+        try:
+            dwell = int(float(r.get("r2_dwell") or 0)) or 60
+        except (TypeError, ValueError):
+            dwell = 60
+        surgical = str(r.get("surgical", "")).strip().lower() == "yes"
+        care = str(r.get("care_level", ""))
+        base = 150 if surgical else 90 if "PCC" in care else 45
+        dcr = min(dwell, int(round(dwell * _DCR_BASE_MIN / base)))
+        ev = str(r.get("evaluator") or "").rsplit(" ", 1)[0]
+        pts.append({"row": r, "t": (int(r.get("day") or 1) - 1) * 24 * 60 + arr, "arr": arr,
+                    "rank": _TRIAGE_RANK.get(r.get("triage_cat"), 1), "dcr": dcr, "rest": dwell - dcr,
+                    "surgical": surgical, "provider": _EVALUATOR_SPECIALTY.get(ev) if ev else None,
+                    "wait": {"bed": 0, "provider": 0, "or": 0}})
+
+    # Event heap entries: (minute, order, seq, kind, patient index). Releases
+    # sort before arrivals at the same minute ([arrival, cleared) occupancy).
+    events = [(p["t"], 1, i, "arrive", i) for i, p in enumerate(pts)]
+    heapq.heapify(events)
+    seq = len(pts)
+    queues: Dict[str, list] = {}
+    asked: Dict[tuple, int] = {}
+
+    def _schedule(t: int, kind: str, i: int):
+        nonlocal seq
+        seq += 1
+        heapq.heappush(events, (t, 0, seq, kind, i))
+
+    def _request(res: Optional[str], i: int, t: int, then):
+        if res is None or res not in free:  # no such resource on hand: not a constraint
+            return then(i, t)
+        if free[res] > 0:
+            free[res] -= 1
+            return then(i, t)
+        asked[(res, i)] = t
+        heapq.heappush(queues.setdefault(res, []), (pts[i]["rank"], pts[i]["t"], i, then))
+
+    def _release(res: Optional[str], t: int):
+        if res is None or res not in free:
+            return
+        q = queues.get(res)
+        if q:
+            _rank, _t, i, then = heapq.heappop(q)
+            pts[i]["wait"][res if res in ("bed", "or") else "provider"] += t - asked.pop((res, i))
+            then(i, t)
+        else:
+            free[res] += 1
+
+    def _bedded(i, t):
+        _request(pts[i]["provider"], i, t, _resuscitate)
+
+    def _resuscitate(i, t):
+        _schedule(t + pts[i]["dcr"], "dcr_done", i)
+
+    def _operate(i, t):
+        _schedule(t + pts[i]["rest"], "or_done", i)
+
+    while events:
+        t, _order, _seq, kind, i = heapq.heappop(events)
+        p = pts[i]
+        if kind == "arrive":
+            _request("bed", i, t, _bedded)
+        elif kind == "dcr_done":
+            _release(p["provider"], t)
+            if p["surgical"]:
+                _request("or", i, t, _operate)
+            else:
+                _schedule(t + p["rest"], "clear", i)
+        elif kind == "or_done":
+            _release("or", t)
+            _schedule(t, "clear", i)
+        else:  # clear
+            p["cleared"] = t
+            _release("bed", t)
+
+    # PACE on the simulated timeline: annotate_pace_states' triggers with the
+    # census from simulated occupancy, plus queueing — any wait is ALTERNATE,
+    # a T1 kept waiting is CONTINGENCY (load beyond throughput).
+    floor = {"contested logistics": _logistics_pace(config), "evac corridor": _evac_corridor_pace(config),
+             "staff (single surgical team)": _staff_pace_floor(config)}
+    by_day: Dict[Any, List[dict]] = {}
+    for p in pts:
+        by_day.setdefault(p["row"].get("day"), []).append(p)
+    for day_pts in by_day.values():
+        census = _Census((p["t"], p["cleared"]) for p in day_pts).at([p["t"] for p in day_pts]).tolist()
+        for p, n in zip(day_pts, census):
+            r = p["row"]
+            wait = sum(p["wait"].values())
+            sigs = dict(floor)
+            sigs["blood/WBB"] = _blood_pace(r.get("blood_source", ""), r.get("blood_cum", 0) or 0)
+            if n > capacity:
+                sigs[f"saturation {n}/{capacity}"] = 2
+            if wait:
+                sigs[f"queued {wait} min"] = 2 if p["rank"] == 0 else 1
+            score = max(sigs.values())
+            p["pace"] = (_PACE_STATES[score], ", ".join(k for k, v in sigs.items() if v == score and v > 0) or "nominal")
+
+    rows = [{"day": p["row"].get("day"), "time": p["row"].get("time"), "case_num": p["row"].get("case_num"),
+             "triage_cat": p["row"].get("triage_cat"), "surgical": p["row"].get("surgical"),
+             "bed_wait": p["wait"]["bed"], "provider_wait": p["wait"]["provider"], "or_wait": p["wait"]["or"],
+             "wait": sum(p["wait"].values()), "cleared": _clock(p["cleared"]),
+             "planned_cleared": p["row"].get("cleared"), "los": p["cleared"] - p["t"],
+             "pace_state": p["pace"][0], "pace_driver": p["pace"][1]} for p in pts]
+    transitions, state = [], None
+    for p in sorted(pts, key=lambda p: p["t"]):
+        if p["pace"][0] != state:
+            state = p["pace"][0]
+            transitions.append({"day": p["row"].get("day"), "time": _clock(p["t"]), "pace_state": state,
+                                "pace_driver": p["pace"][1], "case_num": p["row"].get("case_num")})
+    return {"resources": _des_resources(config), "rows": rows, "transitions": transitions}
+
+# --- What-if sweep ----------------------------------------------------------
+# Compare planning variants of one config without generating anything: each
+# variant runs the LLM-free half of the pipeline — _build_case_tasks, offline
+# fallback cases given the phases determine_case_phases assigns, generate_schedule
+# (with annotate_pace_states) and the capacity roll-up — and reduces to one row of planner metrics. Every variant
+# draws its case types from the same seed, so rows differ by the parameters,
+# not the draw. Variants run in the render pool, one task each.
+WHAT_IF_MAX_VARIANTS = int(os.getenv("WHAT_IF_MAX_VARIANTS", "64"))
+_WHAT_IF_FIELDS = ("environment", "threat_level", "region", "supported_unit", "selected_mets",
+                   "selected_footprint", "specialists")
+_WHAT_IF_METRICS = ("casualties", "peak_pace", "degraded_days", "peak_census", "capacity", "saturated_days",
+                    "blood_units", "blood_deficit")
+
+def _what_if_configs(base: ExerciseConfig, grid: Dict[str, List[Any]]) -> List[tuple]:
+    """[(params, config dict)] for every combination of the grid's values.
+    Raises ValueError for an unknown parameter, an oversized grid or a
+    variant that isn't a valid ExerciseConfig."""
+    for k, values in grid.items():
+        top, _, sub = k.partition(".")
+        if not (k in _WHAT_IF_FIELDS or (top == "specialists" and sub)
+                or (top == "days" and sub in DayConfig.model_fields and sub != "day_number")):
+            raise ValueError(f"Unsupported what-if parameter: {k}")
+        if not values:
+            raise ValueError(f"No values for what-if parameter: {k}")
+    n = 1
+    for values in grid.values():
+        n *= len(values)
+    if n > WHAT_IF_MAX_VARIANTS:
+        raise ValueError(f"{n} variants requested, at most {WHAT_IF_MAX_VARIANTS} allowed")
+
+    variants = []
+    for combo in itertools.product(*grid.values()):
+        cfg = base.model_dump()
+        for k, v in zip(grid, combo):
+            top, _, sub = k.partition(".")
+            if top == "specialists" and sub:
+                cfg["specialists"][sub] = v
+            elif top == "days":
+                for d in cfg["days"]:
+                    d[sub] = v
+            else:
+                cfg[k] = v
+        variants.append((dict(zip(grid, combo)), ExerciseConfig(**cfg).model_dump()))
+    return variants
+
+_PHASE_TITLES = {"dcr": "Damage Control Resuscitation", "dcs": "Damage Control Surgery", "pcc": "Prolonged Casualty Care"}
+
+def _planning_case(task: tuple, zap: str) -> Dict:
+    """Offline fallback case for a task, with the phases a generated case
+    would carry — dwell, blood draw and surgical demand all key off them."""
+    _day, case_type, mech, is_trauma, is_mascal = task
+    case = create_fallback_case(case_type, mech, is_trauma, zap=zap)
+    phases = {p.lower() for p in determine_case_phases(case_type, mech, is_mascal)}
+    for k in ("dcr", "dcs", "pcc"):
+        if k not in phases:
+            case["phases"][k] = None
+        elif case["phases"].get(k) is None:
+            case["phases"][k] = {"title": _PHASE_TITLES[k], "narrative": "", "expected_actions": [],
+                                 "vitals_trend": [], "contingencies": []}
+    return case
+
+def _what_if_variant(cfg: Dict[str, Any], seed: int) -> Dict[str, Any]:
+    """Plan one variant (render-pool task) and reduce it to _WHAT_IF_METRICS."""
+    config = ExerciseConfig(**cfg)
+    rng = random.Random(seed)
+    case_pools: Dict[tuple, List[Dict]] = {}
+    for i, t in enumerate(_build_case_tasks(config, rng)):
+        case_pools.setdefault((t[0], t[4]), []).append(_planning_case(t, f"{i + 1:05d}"))
+    for p in case_pools.values():
+        rng.shuffle(p)
+    schedule, _cases = generate_schedule(config, case_pools)
+
+    by_day, _load = _capacity_intervals(schedule)
+    peaks = [_Census((a, c) for a, c, _s in iv).peak()[0] for iv in by_day.values()]
+    day_pace: Dict[Any, int] = {}
+    for r in schedule:
+        if r.get("pace_state") in _PACE_STATES:
+            day_pace[r.get("day")] = max(day_pace.get(r.get("day"), 0), _PACE_STATES.index(r["pace_state"]))
+    blood = sum(int(float(r.get("blood_units") or 0)) for r in schedule)
+    capacity = _r2_capacity(config)
+    return {
+        "casualties": sum(len(iv) for iv in by_day.values()),
+        "peak_pace": _PACE_STATES[max(day_pace.values())] if day_pace else None,
+        "degraded_days": sum(1 for idx in day_pace.values() if idx >= 2),
+        "peak_census": max(peaks, default=0),
+        "capacity": capacity,
+        "saturated_days": sum(1 for p in peaks if p > capacity),
+        "blood_units": blood,
+        "blood_deficit": max(0, blood - STARTING_LTOWB_UNITS),
+    }
+
+def what_if(variants: List[tuple], seed: int) -> Dict[str, Any]:
+    """Run _what_if_configs' variants across the render pool; one table row
+    per variant, the varied parameters first, then _WHAT_IF_METRICS."""
+    futures = [_pool_submit(_what_if_variant, cfg, seed) for _params, cfg in variants]
+    keys = list(variants[0][0]) if variants else []
+    rows = []
+    for (params, _cfg), f in zip(variants, futures):
+        m = f.result()
+        rows.append([params[k] for k in keys] + [m[c] for c in _WHAT_IF_METRICS])
+    return {"seed": seed, "columns": keys + list(_WHAT_IF_METRICS), "rows": rows}
+
+# --- Render pool ------------------------------------------------------------
+# python-docx/openpyxl rendering is pure-Python CPU work that holds the GIL, so
+# the artifacts of a package render in a process pool, all at once. Inputs are
+# plain JSON-serializable dicts (config as config.dict()) so they cross the
+# process boundary cheaply and the worker rebuilds what it needs.
+# RENDER_WORKERS=0 renders inline in the calling thread.
+RENDER_WORKERS = int(os.getenv("RENDER_WORKERS", str(min(6, os.cpu_count() or 1))))
+# "template" (create_case_book_fast) or "docx" (the python-docx reference).
+CASE_BOOK_RENDERER = os.getenv("CASE_BOOK_RENDERER", "template")
+# "template" (create_docx_fast) or "docx" for the orders documents.
+DOCX_RENDERER = os.getenv("DOCX_RENDERER", "template")
+# "stream" (create_msel_stream) or "pandas" (the DataFrame reference).
+MSEL_RENDERER = os.getenv("MSEL_RENDERER", "stream")
+
+_RENDERERS = {
+    "msel": lambda p: (create_msel_stream if MSEL_RENDERER == "stream" else create_msel)(
+        p["schedule"], ExerciseConfig(**p["config"])),
+    "case_book": lambda p: (create_case_book_fast if CASE_BOOK_RENDERER == "template" else create_case_book)(
+        p["cases"], ExerciseConfig(**p["config"])),
+    "docx": lambda p: (create_docx_fast if DOCX_RENDERER == "template" else create_docx)(
+        p["title"], p["subtitle"], p["content"]),
+}
+
+def render_artifact(kind: str, payload: Dict[str, Any]) -> tuple:
+    """Render one artifact; returns (file bytes, render seconds)."""
+    t0 = time.perf_counter()
+    buf = _RENDERERS[kind](payload)
+    return buf.getvalue(), time.perf_counter() - t0
+
+_render_pool: Optional[ProcessPoolExecutor] = None
+_render_pool_lock = threading.Lock()
+
+def _pool_submit(fn, *args) -> Future:
+    """Run fn(*args) in the render pool (inline when RENDER_WORKERS=0). fn
+    must be a module-level function; args cross the process boundary."""
+    global _render_pool
+    if RENDER_WORKERS <= 0:
+        f = Future()
+        try:
+            f.set_result(fn(*args))
+        except Exception as e:
+            f.set_exception(e)
+        return f
+    with _render_pool_lock:
+        for _ in range(2):
+            if _render_pool is None:
+                _render_pool = ProcessPoolExecutor(RENDER_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+            try:
+                return _render_pool.submit(fn, *args)
+            except BrokenProcessPool:  # a render worker died (e.g. OOM) — start a fresh pool
+                _render_pool.shutdown(wait=False, cancel_futures=True)
+                _render_pool = None
+        raise RuntimeError("render pool unavailable")
+
+def _render_submit(kind: str, payload: Dict[str, Any]) -> Future:
+    return _pool_submit(render_artifact, kind, payload)
+
+_DOCX_TYPE = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+_XLSX_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+# doc_type: (package filename suffix, media type, docx title, docx subtitle)
+_DOC_SPECS = {
+    "msel": ("MSEL.xlsx", _XLSX_TYPE, None, None),
+    "warno": ("WARNO.docx", _DOCX_TYPE, "WARNING ORDER", "{upper}"),
+    "annex_q": ("Annex_Q.docx", _DOCX_TYPE, "ANNEX Q (MEDICAL SERVICES)", "TO OPORD {upper}"),
+    "medroe": ("MEDROE.docx", _DOCX_TYPE, "MEDICAL RULES OF ENGAGEMENT", "{upper}"),
+    "case_book": ("Case_Book.docx", _DOCX_TYPE, None, None),
+    "road_to_war": ("Road_to_War_Prompt.docx", _DOCX_TYPE, "ROAD TO WAR — VIDEO PROMPT", "{upper}"),
+}
+
+# GET /exercises/{id}/document/{type} has always titled these two more tersely
+# than the package does. Those renders are cached in their own slot
+# (_document_slot) so neither download serves the other's.
+_DOCUMENT_TITLES = {"annex_q": "ANNEX Q", "medroe": "MEDROE"}
+
+def _document_slot(doc_type: str, standalone: bool = False) -> str:
+    """Artifact cache name for doc_type as a package entry or, with
+    `standalone`, as a single-document download."""
+    return f"{doc_type}-document" if standalone and doc_type in _DOCUMENT_TITLES else doc_type
+
+def _render_request(doc_type: str, cfg: Dict[str, Any], src: Dict[str, Any], standalone: bool = False) -> tuple:
+    """(kind, payload) rendering doc_type from an exercise's content; `src`
+    holds the schedule, cases and orders texts keyed like the doc types.
+    `standalone` uses the single-document download's title."""
+    if doc_type == "msel":
+        return "msel", {"schedule": src["schedule"], "config": cfg}
+    if doc_type == "case_book":
+        return "case_book", {"cases": src["cases"], "config": cfg}
+    _suffix, _mt, title, subtitle = _DOC_SPECS[doc_type]
+    if standalone:
+        title = _DOCUMENT_TITLES.get(doc_type, title)
+    return "docx", {"title": title, "subtitle": subtitle.format(upper=cfg["exercise_name"].upper()),
+                    "content": src[doc_type]}
+
+def _render_timings(timings: Dict[str, tuple]) -> str:
+    """'MSEL.xlsx 1.20s/1.41s, ...' — render time in the worker / wall time
+    including queueing and transfer."""
+    return ", ".join(f"{n} {render:.2f}s/{wall:.2f}s" for n, (render, wall) in sorted(timings.items()))
+
+# --- Artifact cache ---------------------------------------------------------
+# Stored exercises never change, so their rendered documents and full package
+# are cached on disk as {key}/{doc_type}.v{renderer version}.{etag}, the etag
+# being a content hash (a strong validator). The key is the exercise id plus
+# its row's created_at (_artifact_key), so a recreated database, a different
+# DATABASE_URL or a reused id never serves another exercise's renders; a
+# lookup costs one primary-key query. Jobs fill the cache as they finish;
+# history downloads fill it lazily on a miss. Like the package store, the
+# directory is the index and eviction is LRU by atime against
+# ARTIFACT_CACHE_MAX_BYTES. Bump _RENDERER_VERSION when renderer output changes.
+ARTIFACT_CACHE_DIR = os.path.join(DATA_DIR, "artifacts")
+ARTIFACT_CACHE_MAX_BYTES = int(os.getenv("ARTIFACT_CACHE_MAX_BYTES", str(512 << 20)))
+_RENDERER_VERSION = 5
+_ARTIFACT_PENDING_TTL_S = 3600
+# A render superseded by a newer one (another renderer version, or a re-render)
+# stays this long after it was last served, for responses about to open it.
+_ARTIFACT_SUPERSEDED_GRACE_S = 300
+
+def _artifact_key(exercise_id: int, created_at: Optional[datetime]) -> str:
+    stamp = created_at.strftime("%Y%m%dT%H%M%S%f") if created_at else "0"
+    return f"{int(exercise_id)}-{stamp}"
+
+class _ArtifactCache:
+    def __init__(self, root: str, max_bytes: int):
+        self.root = root
+        self.pending = os.path.join(root, "pending")
+        self.max_bytes = max_bytes
+
+    def _dir(self, key: str) -> str:
+        return os.path.join(self.root, key)
+
+    def get(self, key: str, doc_type: str) -> Optional[tuple]:
+        """(path, etag, exercise name) of the newest cached render, or None."""
+        d = self._dir(key)
+        prefix = f"{doc_type}.v{_RENDERER_VERSION}."
+        try:
+            hits = [(e.stat().st_mtime, e) for e in os.scandir(d) if e.name.startswith(prefix)]
+            if not hits:
+                return None
+            mtime, e = max(hits, key=lambda h: h[0])
+            os.utime(e.path, (time.time(), mtime))
+            with open(os.path.join(d, "meta.json")) as f:
+                name = json.load(f)["name"]
+            return e.path, f'"{e.name[len(prefix):]}"', name
+        except (OSError, ValueError, KeyError):
+            pass
+        return None
+
+    def pending_path(self) -> str:
+        """Scratch file for an artifact whose exercise id isn't known yet (or
+        that is still being written); hand it to put_file when done."""
+        os.makedirs(self.pending, exist_ok=True)
+        return os.path.join(self.pending, uuid.uuid4().hex)
+
+    def put(self, key: str, doc_type: str, data: bytes, name: str) -> tuple:
+        tmp = self.pending_path()
+        with open(tmp, "wb") as f:
+            f.write(data)
+        return self.put_file(key, doc_type, tmp, name, move=True)
+
+    def put_file(self, key: str, doc_type: str, src: str, name: str, move: bool = False) -> tuple:
+        """Cache the file at `src` (moved, or hard-linked/copied when
+        move=False) and return (path, etag, name). Older renders of the same
+        artifact are left to evict(): a response may be about to open one."""
+        h = hashlib.sha256()
+        with open(src, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                h.update(block)
+        etag = h.hexdigest()[:32]
+        d = self._dir(key)
+        os.makedirs(d, exist_ok=True)
+        meta = os.path.join(d, "meta.json")
+        if not os.path.exists(meta):
+            with open(f"{meta}.tmp", "w") as f:
+                json.dump({"name": name}, f)
+            os.replace(f"{meta}.tmp", meta)
+        prefix = f"{doc_type}.v{_RENDERER_VERSION}."
+        path = os.path.join(d, prefix + etag)
+        if move:
+            os.replace(src, path)
+        elif not os.path.exists(path):
+            try:
+                os.link(src, path)
+            except OSError:
+                shutil.copyfile(src, path)
+        self.evict(keep=path)
+        return path, f'"{etag}"', name
+
+    def evict(self, keep: Optional[str] = None):
+        now = time.time()
+        live = []
+        for dirpath, _dirs, files in os.walk(self.root):
+            newest: Dict[str, tuple] = {}  # doc_type -> (mtime, path) of the render get() serves
+            renders = []
+            for fn in files:
+                path = os.path.join(dirpath, fn)
+                try:
+                    st = os.stat(path)
+                    if dirpath == self.pending:
+                        if now - st.st_mtime > _ARTIFACT_PENDING_TTL_S:
+                            os.remove(path)
+                    elif fn != "meta.json":
+                        renders.append((fn, st, path))
+                        doc_type, _, version = fn.partition(".v")
+                        if version.startswith(f"{_RENDERER_VERSION}.") and st.st_mtime >= newest.get(doc_type, (0,))[0]:
+                            newest[doc_type] = (st.st_mtime, path)
+                except OSError:
+                    pass
+            for fn, st, path in renders:
+                superseded = path != newest.get(fn.partition(".v")[0], (0, None))[1] and path != keep
+                if superseded and now - st.st_atime > _ARTIFACT_SUPERSEDED_GRACE_S:
+                    with suppress(OSError):
+                        os.remove(path)
+                else:
+                    live.append((st.st_atime, st.st_size, path))
+        total = sum(size for _, size, _ in live)
+        for _, size, path in sorted(live):
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            with suppress(OSError):
+                os.remove(path)
+            total -= size
+
+_artifact_cache = _ArtifactCache(ARTIFACT_CACHE_DIR, ARTIFACT_CACHE_MAX_BYTES)
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    """If-None-Match check (weak comparison, as RFC 9110 specifies for it)."""
+    header = request.headers.get("if-none-match", "")
+    if header.strip() == "*":
+        return True
+    return any(t.strip().removeprefix("W/") == etag for t in header.split(","))
+
+def _cached_response(request: Request, hit: tuple, filename: str, media_type: str) -> Response:
+    path, etag, _name = hit
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if _etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    return _file_response(request, path, media_type, f'"{filename}"', headers)
+
+# --- Blocking work off the event loop ---------------------------------------
+# Endpoints stay async, but their synchronous DB queries, JSON parsing and
+# rendering run on a bounded thread pool, so one heavy download can't stall
+# /health or job polling for everyone else. The bound (kept under the DB
+# connection pool size) stops a burst of downloads from piling up threads.
+# Work that mostly waits — on the render pool or a Gemini call, for seconds
+# to minutes (package streams, uncached renders, Monte Carlo, what-if) — runs
+# on a separate pool, so a burst of downloads can't starve the short DB/IO
+# work (job creation and polling, history) of _blocking_pool's threads. Its
+# threads hold no DB connection; load from the DB with _offload first.
+BLOCKING_WORKERS = int(os.getenv("BLOCKING_WORKERS", "8"))
+WAIT_WORKERS = int(os.getenv("WAIT_WORKERS", "32"))
+_blocking_pool = ThreadPoolExecutor(max_workers=BLOCKING_WORKERS, thread_name_prefix="blocking")
+_wait_pool = ThreadPoolExecutor(max_workers=WAIT_WORKERS, thread_name_prefix="wait")
+
+async def _offload(fn, *args):
+    return await asyncio.get_running_loop().run_in_executor(_blocking_pool, lambda: fn(*args))
+
+async def _offload_wait(fn, *args):
+    return await asyncio.get_running_loop().run_in_executor(_wait_pool, lambda: fn(*args))
+
+async def _offload_iter(it):
+    """Async view of a blocking iterator (e.g. a streamed ZIP whose entries
+    wait on the render pool), every step run on the wait pool."""
+    done = object()
+    try:
+        while True:
+            chunk = await _offload_wait(next, it, done)
+            if chunk is done:
+                return
+            yield chunk
+    finally:
+        with suppress(ValueError):  # still running in its thread after a disconnect
+            await _offload_wait(it.close)
+
 # API Endpoints
 @app.get("/")
 async def root():
@@ -1387,14 +3089,13 @@ Return ONLY the operation name. Nothing else. Seed: {random.random()}"""
                     )
                 ],
             )
-            response = get_client().models.generate_content(
-                model=GEMINI_MODEL, contents=prompt, config=gen_config
-            )
+            # Interactive endpoint: keep the whole call (incl. retries) short.
+            response = await gemini_generate_async(prompt, gen_config, deadline=20)
+        except (HTTPException, GeminiUnavailable):
+            raise
         except Exception:
             # Older/newer SDKs may not accept the config shape above — retry plain.
-            response = get_client().models.generate_content(
-                model=GEMINI_MODEL, contents=prompt
-            )
+            response = await gemini_generate_async(prompt, deadline=20)
         name = _response_text(response).replace('"', '').replace("'", "")
         # Models sometimes return a short explanation before the name.
         name = name.splitlines()[0].strip() if name else ""
@@ -1409,10 +3110,11 @@ Return ONLY the operation name. Nothing else. Seed: {random.random()}"""
         name = f"Operation {name}"
     return {"name": name}
 
-def _build_case_tasks(config: ExerciseConfig) -> List[tuple]:
+def _build_case_tasks(config: ExerciseConfig, rng=random) -> List[tuple]:
     """Return a list of (day_number, case_type, mechanism, is_trauma, is_mascal)
     tuples — one per patient. Day-tagged so scheduling can keep each case in
-    the pool (day, routine/MASCAL) it was generated for."""
+    the pool (day, routine/MASCAL) it was generated for. Case types are drawn
+    with `rng` (a seeded random.Random for reproducible draws)."""
     tasks = []
     env_dnbi = DNBI_BY_ENVIRONMENT.get(config.environment, []) + DNBI_BY_ENVIRONMENT.get("General", [])
     for day in config.days:
@@ -1421,35 +3123,473 @@ def _build_case_tasks(config: ExerciseConfig) -> List[tuple]:
         num_trauma = int(day.total_patients * routine_ratio)
         num_dnbi = day.total_patients - num_trauma
         for _ in range(num_trauma):
-            tasks.append((day.day_number, random.choice(GENERAL_TRAUMA), day.tactical_setting, True, False))
+            tasks.append((day.day_number, rng.choice(GENERAL_TRAUMA), day.tactical_setting, True, False))
         for _ in range(num_dnbi):
-            tasks.append((day.day_number, random.choice(env_dnbi), f"DNBI - {config.environment}", False, False))
+            tasks.append((day.day_number, rng.choice(env_dnbi), f"DNBI - {config.environment}", False, False))
         # MASCAL surge — additive extra casualties, trauma-heavy, tagged is_mascal.
         if day.mascal and day.mascal_patients:
             inj_types = TRAUMA_BY_ETIOLOGY.get(day.mascal_etiology, GENERAL_TRAUMA) if day.mascal_etiology else GENERAL_TRAUMA
             m_trauma = int(day.mascal_patients * 0.85)
             for _ in range(m_trauma):
-                tasks.append((day.day_number, random.choice(inj_types), day.mascal_etiology or day.tactical_setting, True, True))
+                tasks.append((day.day_number, rng.choice(inj_types), day.mascal_etiology or day.tactical_setting, True, True))
             for _ in range(day.mascal_patients - m_trauma):
-                tasks.append((day.day_number, random.choice(env_dnbi), f"DNBI - {config.environment}", False, True))
+                tasks.append((day.day_number, rng.choice(env_dnbi), f"DNBI - {config.environment}", False, True))
     return tasks
 
-def _generate_one(task: tuple, environment: str, region: str, mets: Optional[List[str]] = None) -> Dict:
+# --- Case cache -------------------------------------------------------------
+# Case types come from small fixed pools, so the same generation inputs recur
+# within an exercise and across exercises. Cache generated cases by a hash of
+# everything that shapes the prompt (inputs + system prompt + model): an LRU in
+# memory in front of JSON files on disk. Each key collects up to
+# CASE_CACHE_VARIANTS distinct cases before it starts serving hits, and hits
+# rotate through them so repeats aren't identical. Within one exercise, a key's
+# repeats wait for the variants generated for it rather than each calling
+# Gemini. Every reuse gets a fresh ZAP. CASE_CACHE_VARIANTS=0 disables the cache.
+CASE_CACHE_DIR = os.getenv("CASE_CACHE_DIR", os.path.join(DATA_DIR, "case-cache"))
+CASE_CACHE_VARIANTS = int(os.getenv("CASE_CACHE_VARIANTS", "3"))
+CASE_CACHE_MEMORY_KEYS = int(os.getenv("CASE_CACHE_MEMORY_KEYS", "512"))
+CASE_CACHE_DISK_KEYS = int(os.getenv("CASE_CACHE_DISK_KEYS", "5000"))
+_CASE_CACHE_VERSION = 1
+
+def _case_cache_key(case_type: str, mechanism: str, environment: str, region: str,
+                    is_mascal: bool, mets: Optional[List[str]]) -> str:
+    payload = json.dumps([_CASE_CACHE_VERSION, GEMINI_MODEL, CASE_SYSTEM_PROMPT, case_type, mechanism,
+                          environment, region, bool(is_mascal), list(mets or [])[:6]])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class _CaseCache:
+    """Two-tier (memory LRU + disk) store of generated case variants."""
+
+    def __init__(self, directory: str, variants: int, memory_keys: int, disk_keys: int):
+        self.directory = directory
+        self.variants = variants
+        self.memory_keys = memory_keys
+        self.disk_keys = disk_keys
+        self._mem: "OrderedDict[str, List[Dict]]" = OrderedDict()
+        self._served: Dict[str, int] = {}
+        self._writes = 0
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.variants > 0
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def _load(self, key: str) -> List[Dict]:
+        """Variants for key, promoting disk entries into the memory tier."""
+        if key in self._mem:
+            self._mem.move_to_end(key)
+            return self._mem[key]
+        try:
+            with open(self._path(key), encoding="utf-8") as f:
+                variants = json.load(f)
+        except (OSError, ValueError):
+            variants = []
+        self._remember(key, variants)
+        return variants
+
+    def _remember(self, key: str, variants: List[Dict]):
+        self._mem[key] = variants
+        self._mem.move_to_end(key)
+        while len(self._mem) > self.memory_keys:
+            old, _ = self._mem.popitem(last=False)
+            self._served.pop(old, None)
+
+    def get(self, key: str, partial: bool = False) -> Optional[Dict]:
+        """A fresh copy of a cached variant (new ZAP), or None until the key
+        has collected its full set of variants — or any variant at all, with
+        `partial` (repeats within the exercise that generated them)."""
+        if not self.enabled:
+            return None
+        with self._lock:
+            variants = self._load(key)
+            if not variants or len(variants) < (1 if partial else self.variants):
+                return None
+            n = self._served.get(key, random.randrange(len(variants)))
+            self._served[key] = n + 1
+            case = copy.deepcopy(variants[n % len(variants)])
+        case.setdefault("zmist", {})["zap"] = _new_zap()
+        return case
+
+    def missing(self, key: str) -> int:
+        """Variants the key still needs before it serves full hits."""
+        if not self.enabled:
+            return 0
+        with self._lock:
+            return max(0, self.variants - len(self._load(key)))
+
+    def put(self, key: str, case: Dict):
+        if not self.enabled or case.get("_fallback"):
+            return
+        with self._lock:
+            variants = list(self._load(key))
+            if len(variants) >= self.variants:
+                return
+            variants.append(copy.deepcopy(case))
+            self._remember(key, variants)
+            try:
+                os.makedirs(self.directory, exist_ok=True)
+                tmp = f"{self._path(key)}.{uuid.uuid4().hex}.tmp"
+                with open(tmp, "w", encoding="utf-8") as f:
+                    json.dump(variants, f)
+                os.replace(tmp, self._path(key))
+            except OSError as e:
+                print(f"WARNING: case cache write failed (memory only): {e}")
+                return
+            self._writes += 1
+            if self._writes % 100 == 0:
+                self._prune_disk()
+
+    def _prune_disk(self):
+        """Drop the least recently written keys past the disk budget."""
+        try:
+            files = [e for e in os.scandir(self.directory) if e.name.endswith(".json")]
+        except OSError:
+            return
+        if len(files) <= self.disk_keys:
+            return
+        files.sort(key=lambda e: e.stat().st_mtime)
+        for e in files[:len(files) - self.disk_keys]:
+            try:
+                os.remove(e.path)
+            except OSError:
+                pass
+
+_case_cache = _CaseCache(CASE_CACHE_DIR, CASE_CACHE_VARIANTS, CASE_CACHE_MEMORY_KEYS, CASE_CACHE_DISK_KEYS)
+
+# --- Async case-generation engine ------------------------------------------
+# Cases fan out as coroutines on the SDK's aio client (which, in the pinned
+# SDK, still runs each request on a default-executor thread). How many are in
+# flight is set by an AIMD limiter, not the thread count; it reacts to
+# what Gemini is actually doing: it grows while calls come back fast and clean,
+# halves on a 429, and eases off when latency climbs well above the best seen
+# (requests queueing upstream). Big exercises fill the quota without a tuned
+# constant; a throttled key settles to what it can sustain.
+GEMINI_INITIAL_CONCURRENCY = int(os.getenv("GEMINI_INITIAL_CONCURRENCY", "5"))
+GEMINI_MAX_CONCURRENCY = int(os.getenv("GEMINI_MAX_CONCURRENCY", "32"))
+
+class _AdaptiveLimiter:
+    """AIMD concurrency limit. Slow-start (+1 per success) until the first
+    congestion signal, then +1 per full window of successes; x0.5 on a 429 and
+    x0.9 when the median of recent latencies exceeds twice the best observed.
+    The median keeps LLM latency's natural long tail from reading as
+    congestion."""
+
+    def __init__(self, initial: int, floor: int = 1, ceiling: int = 32):
+        self.floor = max(1, floor)
+        self.ceiling = max(self.floor, ceiling)
+        self.limit = float(min(max(initial, self.floor), self.ceiling))
+        self._in_flight = 0
+        self._slow_start = True
+        self._min_latency: Optional[float] = None
+        self._recent: deque = deque(maxlen=20)
+        self._cond = asyncio.Condition()
+
+    async def acquire(self):
+        async with self._cond:
+            while self._in_flight >= int(self.limit):
+                await self._cond.wait()
+            self._in_flight += 1
+
+    async def release(self, latency: Optional[float] = None, throttled: bool = False):
+        async with self._cond:
+            self._in_flight -= 1
+            if throttled:
+                self._slow_start = False
+                self.limit = max(self.floor, self.limit / 2)
+            elif latency is not None:
+                self._min_latency = latency if self._min_latency is None else min(self._min_latency, latency)
+                self._recent.append(latency)
+                if sorted(self._recent)[len(self._recent) // 2] > 2 * self._min_latency:
+                    self._slow_start = False
+                    self.limit = max(self.floor, self.limit * 0.9)
+                elif self._slow_start:
+                    self.limit = min(self.ceiling, self.limit + 1)
+                else:
+                    self.limit = min(self.ceiling, self.limit + 1 / self.limit)
+            self._cond.notify_all()
+
+# --- Hedged requests ---------------------------------------------------------
+# Job time is set by the slowest case, so optionally race a duplicate request
+# when a call outlives the job's own GEMINI_HEDGE_PERCENTILE latency: first
+# answer wins and the other is cancelled. Hedges are capped at
+# GEMINI_HEDGE_MAX_FRACTION of the job's cases and still pass through the
+# token bucket and limiter, so quota stays protected. 0 disables hedging.
+GEMINI_HEDGE_PERCENTILE = float(os.getenv("GEMINI_HEDGE_PERCENTILE", "0"))
+GEMINI_HEDGE_MAX_FRACTION = float(os.getenv("GEMINI_HEDGE_MAX_FRACTION", "0.1"))
+_HEDGE_MIN_SAMPLES = 8
+
+class _Hedger:
+    """Per-job latency samples (per call kind) and hedge budget."""
+
+    def __init__(self, percentile: float, max_fraction: float):
+        self.percentile = percentile
+        self.max_fraction = max_fraction
+        self._samples: Dict[str, List[float]] = {}
+        self.primary_cases = 0
+        self.hedged_cases = 0
+
+    def delay(self, kind: str) -> Optional[float]:
+        """Seconds to wait before hedging a call of this kind, or None."""
+        samples = self._samples.get(kind, [])
+        if not (0 < self.percentile < 100) or len(samples) < _HEDGE_MIN_SAMPLES:
+            return None
+        ordered = sorted(samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * self.percentile / 100))]
+
+    def observe(self, kind: str, latency: float):
+        self._samples.setdefault(kind, []).append(latency)
+
+    def take(self, weight: int) -> bool:
+        """Reserve hedge budget for `weight` cases if the cap allows it."""
+        if self.hedged_cases + weight > self.max_fraction * self.primary_cases:
+            return False
+        self.hedged_cases += weight
+        return True
+
+async def _hedged(make_call, hedger: Optional[_Hedger], kind: str, weight: int = 1):
+    """Await make_call(on_attempt), racing one duplicate if the primary stays
+    in flight past the hedge delay. The clock starts when the primary is
+    actually sent, so time spent queued behind the limiter never counts."""
+    if hedger is None:
+        return await make_call(None)
+    hedger.primary_cases += weight
+    sent = asyncio.Event()
+    tasks = [asyncio.ensure_future(make_call(sent.set))]
+    waiter = asyncio.ensure_future(sent.wait())
+    try:
+        await asyncio.wait([tasks[0], waiter], return_when=asyncio.FIRST_COMPLETED)
+        waiter.cancel()
+        started = time.monotonic()
+        delay = hedger.delay(kind)
+        if delay is not None and not tasks[0].done():
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if not done and hedger.take(weight):
+                tasks.append(asyncio.ensure_future(make_call(None)))
+        error: Optional[BaseException] = None
+        pending = set(tasks)
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for t in done:
+                if t.exception() is None:
+                    hedger.observe(kind, time.monotonic() - started)
+                    return t.result()
+                error = error or t.exception()
+        raise error
+    finally:
+        # Also on our own cancellation (job cancelled, lease lost): the calls
+        # must give back their limiter and breaker slots before we return.
+        leftover = [t for t in tasks + [waiter] if not t.done()]
+        for t in leftover:
+            t.cancel()
+        await asyncio.gather(*leftover, return_exceptions=True)
+
+async def _generate_one_async(task: tuple, environment: str, region: str, mets: Optional[List[str]],
+                              limiter: _AdaptiveLimiter, hedger: Optional[_Hedger] = None,
+                              zap: Optional[str] = None) -> Dict:
+    """One case, hedged. The request — and so its ZAP — is built once: a hedge
+    duplicate resends it and the offline fallback inherits the ZAP, so no
+    path allocates a ZAP that never reaches the package."""
     _day, case_type, mech, is_trauma, is_mascal = task
+    request = _case_request(case_type, mech, environment, region, is_mascal, mets, zap=zap)
     try:
-        return generate_case_sync(case_type, mech, environment, region, is_mascal, mets)
+        case = await _hedged(lambda on_attempt: generate_case_async(case_type, mech, environment, region, is_mascal, mets,
+                                                                   limiter=limiter, on_attempt=on_attempt, request=request),
+                             hedger, "single")
     except Exception as e:
         print(f"WARNING: case generation failed ({case_type}): {e} — using offline fallback")
-        case = create_fallback_case(case_type, mech, is_trauma)
+        case = create_fallback_case(case_type, mech, is_trauma, zap=request[1])
         case["_fallback"] = True
         return case
+    _case_cache.put(_case_cache_key(case_type, mech, environment, region, is_mascal, mets), case)
+    return case
+
+async def _generate_batch_async(batch: List[tuple], environment: str, region: str, mets: Optional[List[str]],
+                                limiter: _AdaptiveLimiter, hedger: Optional[_Hedger] = None) -> List[Dict]:
+    """One batched call for the tasks, then single-case calls for only the
+    elements that failed validation. As in _generate_one_async the ZAPs are
+    allocated once: a hedge resends the same request and each retried
+    element keeps the ZAP its batch slot was given."""
+    specs = [(t[1], t[2], t[4]) for t in batch]
+    request = _case_batch_request(specs, environment, region, mets)
+    try:
+        got = await _hedged(lambda on_attempt: generate_cases_batch_async(specs, environment, region, mets,
+                                                                          limiter=limiter, on_attempt=on_attempt,
+                                                                          request=request),
+                            hedger, f"batch{len(batch)}", weight=len(batch))
+    except Exception as e:
+        print(f"WARNING: batched case generation failed ({len(batch)} cases): {e} — retrying singly")
+        got = {}
+    for i, case in got.items():
+        _day, case_type, mech, _trauma, is_mascal = batch[i]
+        _case_cache.put(_case_cache_key(case_type, mech, environment, region, is_mascal, mets), case)
+    missing = [i for i in range(len(batch)) if i not in got]
+    if missing:
+        if got:
+            print(f"WARNING: {len(missing)}/{len(batch)} batched cases invalid — retrying singly")
+        singles = await asyncio.gather(*(_generate_one_async(batch[i], environment, region, mets, limiter, hedger,
+                                                             zap=request[1][i])
+                                         for i in missing))
+        got.update(zip(missing, singles))
+    return [got[i] for i in range(len(batch))]
+
+def _batch_tasks(indices: List[int], tasks: List[tuple], size: int) -> List[List[int]]:
+    """Group task indices into batches of near-identical casualties — same
+    day, wave type and mechanism — of at most size each."""
+    groups: "OrderedDict[tuple, List[int]]" = OrderedDict()
+    for i in indices:
+        t = tasks[i]
+        groups.setdefault((t[0], t[4], t[2]), []).append(i)
+    size = max(1, min(size, _CASE_BATCH_MAX))
+    return [g[k:k + size] for g in groups.values() for k in range(0, len(g), size)]
+
+async def _generate_cases_async(tasks: List[tuple], config: ExerciseConfig, on_done=None,
+                                done: Optional[Dict[int, Dict]] = None, on_case=None,
+                                cancel: Optional[threading.Event] = None) -> List[Dict]:
+    """Generate every task's case concurrently; results keep task order.
+    on_done(completed_count) fires as cases land and on_case(index, case) once
+    per generated case. Indices in `done` (restored from a checkpoint) are
+    reused as-is and never regenerated. Tasks sharing a cache key generate
+    only the variants the cache lacks; the rest are filled from those. Setting
+    `cancel` cancels every call still in flight and raises JobCancelled."""
+    env, region, mets = config.environment, config.region, config.selected_mets
+    # The SDK's aio client runs each request via asyncio.to_thread; size the
+    # loop's default executor so it never caps concurrency below the limiter.
+    # A cancelled call (lost hedge, deadline, cancelled job) frees its limiter
+    # slot but its thread runs on until the HTTP request returns or times out
+    # (GEMINI_ATTEMPT_TIMEOUT_S), so leave as much room again for those.
+    asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=2 * GEMINI_MAX_CONCURRENCY))
+    limiter = _AdaptiveLimiter(GEMINI_INITIAL_CONCURRENCY, ceiling=GEMINI_MAX_CONCURRENCY)
+    hedger = _Hedger(GEMINI_HEDGE_PERCENTILE, GEMINI_HEDGE_MAX_FRACTION) if GEMINI_HEDGE_PERCENTILE > 0 else None
+    results: List[Optional[Dict]] = [None] * len(tasks)
+
+    groups: "OrderedDict[str, List[int]]" = OrderedDict()
+    for i, (_day, case_type, mech, _trauma, is_mascal) in enumerate(tasks):
+        if done and i in done:
+            results[i] = done[i]
+            _reserve_zap(str(done[i].get("zmist", {}).get("zap", "")))
+            continue
+        key = _case_cache_key(case_type, mech, env, region, is_mascal, mets)
+        results[i] = _case_cache.get(key)
+        if results[i] is None:
+            groups.setdefault(key, []).append(i)
+        elif on_case:
+            on_case(i, results[i])
+    pending: List[int] = []
+    repeats: List[tuple] = []
+    for key, idx in groups.items():
+        n = max(1, _case_cache.missing(key)) if _case_cache.enabled else len(idx)
+        pending += idx[:n]
+        repeats += [(key, i) for i in idx[n:]]
+    pending.sort()
+    completed = len(tasks) - len(pending) - len(repeats)
+    if completed and on_done:
+        on_done(completed)
+
+    async def _run(idx: List[int]) -> int:
+        if len(idx) == 1:
+            results[idx[0]] = await _generate_one_async(tasks[idx[0]], env, region, mets, limiter, hedger)
+        else:
+            for i, case in zip(idx, await _generate_batch_async([tasks[i] for i in idx], env, region, mets, limiter, hedger)):
+                results[i] = case
+        if on_case:
+            for i in idx:
+                on_case(i, results[i])
+        return len(idx)
+
+    async def _until_cancelled():
+        while not cancel.is_set():
+            await asyncio.sleep(_CANCEL_POLL_S)
+
+    runs: set = set()
+    watcher = asyncio.ensure_future(_until_cancelled()) if cancel else None
+
+    async def _drain(indices: List[int]):
+        nonlocal completed
+        runs.update(asyncio.ensure_future(_run(b)) for b in _batch_tasks(indices, tasks, CASE_BATCH_SIZE))
+        while runs:
+            landed, _ = await asyncio.wait(runs | {watcher} if watcher else runs, return_when=asyncio.FIRST_COMPLETED)
+            if watcher in landed:
+                raise JobCancelled("Case generation cancelled")
+            for fut in landed:
+                runs.discard(fut)
+                completed += fut.result()
+                if on_done:
+                    on_done(completed)
+
+    try:
+        await _drain(pending)
+        # Repeats reuse this run's variants; a key whose every call fell back
+        # offline has none, so its repeats are generated after all.
+        retry = []
+        for key, i in repeats:
+            results[i] = _case_cache.get(key, partial=True)
+            if results[i] is None:
+                retry.append(i)
+            elif on_case:
+                on_case(i, results[i])
+        if len(retry) < len(repeats):
+            completed += len(repeats) - len(retry)
+            if on_done:
+                on_done(completed)
+        await _drain(retry)
+    finally:
+        for t in runs:
+            t.cancel()
+        if watcher:
+            watcher.cancel()
+        # Let cancelled calls unwind (free limiter and breaker slots) before
+        # the loop closes.
+        await asyncio.gather(*runs, return_exceptions=True)
+    return results
 
 # In-memory job store — always used as primary, DB synced as best-effort
 _jobs: Dict[str, Dict] = {}
 
+# Per-job event log behind GET /jobs/{id}/events. Every _job_create /
+# _job_update appends a numbered snapshot; SSE subscribers (on the event loop)
+# are woken thread-safely from the generation thread. The log is bounded, and a
+# resume from an id that has scrolled out gets the latest snapshot instead.
+_JOB_EVENT_BACKLOG = 1000
+_JOB_TERMINAL = ("complete", "error")
+_job_events: Dict[str, Dict[str, Any]] = {}
+_job_events_lock = threading.Lock()
+# Set in queue worker processes: mirrors every snapshot into the job queue so
+# the API process (and its SSE subscribers) can see progress.
+_job_status_sink = None
+
+def _job_snapshot(job: Dict) -> Dict:
+    return {k: job.get(k) for k in ("status", "progress", "completed", "total", "token", "filename", "error")}
+
+def _job_publish(job_id: str):
+    job = _jobs.get(job_id)
+    if job is None:
+        return
+    snap = _job_snapshot(job)
+    with _job_events_lock:
+        ch = _job_events.setdefault(job_id, {"seq": 0, "log": deque(maxlen=_JOB_EVENT_BACKLOG), "waiters": set()})
+        ch["seq"] += 1
+        ch["log"].append((ch["seq"], snap))
+        waiters = list(ch["waiters"])
+    for loop, ev in waiters:
+        loop.call_soon_threadsafe(ev.set)
+
+def _job_events_since(job_id: str, last_id: int) -> List[tuple]:
+    with _job_events_lock:
+        ch = _job_events.get(job_id)
+        if not ch or not ch["log"]:
+            return []
+        log = ch["log"]
+        if last_id < log[0][0] - 1:  # gap — the client missed events we no longer hold
+            return [log[-1]]
+        return [e for e in log if e[0] > last_id]
+
 def _job_create(job_id: str):
     _jobs[job_id] = {"status": "running", "progress": "Starting...", "completed": 0, "total": 0,
                      "ts": datetime.utcnow()}
+    _job_publish(job_id)
     if SessionLocal:
         try:
             db = SessionLocal()
@@ -1461,27 +3601,85 @@ def _job_create(job_id: str):
         except Exception as e:
             print(f"DB job create failed (using memory only): {e}")
 
-def _job_update(job_id: str, **kwargs):
-    if job_id in _jobs:
-        _jobs[job_id].update(kwargs)
-    if SessionLocal:
+# Job-row persistence is off the critical path: _job_update changes memory
+# (and SSE) immediately, while the DB row — and, in queue workers, the queue
+# snapshot — is written by a background flusher at most once per job per
+# JOB_PROGRESS_FLUSH_S, all pending jobs in one session. Terminal updates
+# (complete/error) flush synchronously so the final state is never lost.
+JOB_PROGRESS_FLUSH_S = float(os.getenv("JOB_PROGRESS_FLUSH_S", "1"))
+
+class _ProgressWriter:
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._pending: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()  # keeps flushes (timer vs final) in order
+        self._thread: Optional[threading.Thread] = None
+
+    def submit(self, job_id: str, fields: Dict[str, Any], final: bool = False):
+        with self._lock:
+            self._pending.setdefault(job_id, {}).update(fields)
+            if self._thread is None and not final:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+        if final:
+            self.flush()
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            self.flush()
+
+    def flush(self):
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, {}
+            if batch:
+                _job_persist(batch)
+
+def _job_persist(batch: Dict[str, Dict[str, Any]]):
+    """Write coalesced {job_id: fields} updates: one DB session for the lot,
+    plus the queue snapshot when running in a queue worker. A worker that has
+    lost a job's lease writes neither — its updates are stale."""
+    if _job_status_sink:
+        for job_id in list(batch):
+            if job_id not in _jobs:
+                continue
+            try:
+                if not _job_status_sink(job_id, _job_snapshot(_jobs[job_id])):
+                    del batch[job_id]
+            except Exception as e:
+                print(f"Job queue status update failed: {e}")
+    if SessionLocal and any(batch.values()):
         try:
             db = SessionLocal()
             try:
-                job = db.query(Job).filter(Job.id == job_id).first()
-                if job:
-                    for k, v in kwargs.items():
+                for job in db.query(Job).filter(Job.id.in_(list(batch))).all():
+                    for k, v in batch[job.id].items():
                         setattr(job, k, v)
-                    db.commit()
+                db.commit()
             finally:
                 db.close()
         except Exception as e:
             print(f"DB job update failed: {e}")
 
+_progress_writer = _ProgressWriter(JOB_PROGRESS_FLUSH_S)
+
+def _job_update(job_id: str, **kwargs):
+    if job_id in _jobs:
+        _jobs[job_id].update(kwargs)
+        _job_publish(job_id)
+    _progress_writer.submit(job_id, kwargs, final=kwargs.get("status") in _JOB_TERMINAL)
+
 def _job_get(job_id: str):
-    # Memory first (fast, same-instance), DB as cross-instance fallback
+    # Memory first (fast, same-instance), then the local job queue, DB as
+    # cross-instance fallback
     if job_id in _jobs:
         return _jobs[job_id]
+    if _job_queue:
+        snap = _job_queue.status(job_id)
+        if snap:
+            return snap
     if SessionLocal:
         try:
             db = SessionLocal()
@@ -1497,148 +3695,760 @@ def _job_get(job_id: str):
             print(f"DB job get failed: {e}")
     return None
 
-def _run_generation(config: ExerciseConfig, job_id: str):
+_CANCEL_POLL_S = 0.25
+
+def _run_stage_graph(stages: Dict[str, tuple], max_workers: int = 8, cancel: Optional[threading.Event] = None,
+                     on_error=None) -> Dict[str, Any]:
+    """Run {name: (deps, fn)} on a thread pool, starting each stage the moment
+    every stage it depends on has finished. fn(results) reads its inputs from
+    the shared results dict. The first failure sets `cancel` (stages watch it
+    to stop early), cancels whatever hasn't started and is reported through
+    on_error(exc) at once; the graph then waits for running stages to wind
+    down before propagating, so no stage outlives the job. Setting `cancel`
+    from outside aborts the graph the same way with JobCancelled."""
+    cancel = cancel or threading.Event()
+    results: Dict[str, Any] = {}
+    remaining = dict(stages)
+    running: Dict[Any, str] = {}
+    pool = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        while remaining or running:
+            if cancel.is_set():
+                raise JobCancelled("Job cancelled")
+            for name in [n for n, (deps, _fn) in remaining.items() if all(d in results for d in deps)]:
+                _deps, fn = remaining.pop(name)
+                running[pool.submit(fn, results)] = name
+            if not running:
+                raise RuntimeError(f"Unsatisfiable stage dependencies: {sorted(remaining)}")
+            done, _ = wait(running, timeout=_CANCEL_POLL_S, return_when=FIRST_COMPLETED)
+            for f in done:
+                results[running.pop(f)] = f.result()
+    except BaseException as e:
+        first = not cancel.is_set()
+        cancel.set()
+        if first and on_error:
+            on_error(e)
+        raise
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+    return results
+
+def _run_generation(config: ExerciseConfig, job_id: str, cancel: Optional[threading.Event] = None):
+    """Job runner as a stage graph. The orders documents depend only on the
+    config, so they start at t=0 alongside case generation; Road to War starts
+    as soon as Annex Q exists; each artifact renders as soon as its own inputs
+    are ready, and only the ZIP waits for everything.
+
+    Under the job queue every finished case and orders document is
+    checkpointed as it lands, so a retried job resumes instead of starting
+    over (offline-fallback cases are not checkpointed; a retry re-attempts
+    them). Setting `cancel` (e.g. the queue lease was lost) stops the job
+    without writing a final status — whoever holds the job now owns it."""
+    cancel = cancel or threading.Event()
+    status_lock = threading.Lock()
+
+    def _fail(e: BaseException):
+        with status_lock:
+            _job_update(job_id, status="error", progress=str(e), error=str(e))
+
     try:
-        tasks = _build_case_tasks(config)
+        ckpt = _job_queue.checkpoints(job_id) if _job_queue else {}
+
+        def _save_ckpt(key: str, value: Any):
+            if _job_queue:
+                try:
+                    _job_queue.checkpoint(job_id, key, value)
+                except sqlite3.Error as e:
+                    print(f"WARNING: checkpoint {key} failed: {e}")
+
+        def _resumable(key: str, fn):
+            def _stage(r):
+                if key in ckpt:
+                    return ckpt[key]
+                value = fn(r)
+                _save_ckpt(key, value)
+                return value
+            return _stage
+
+        # Case tasks are drawn at random, so a resumed job must reuse the
+        # original draw for its finished cases to line up.
+        if "tasks" in ckpt:
+            tasks = [tuple(t) for t in ckpt["tasks"]]
+        else:
+            tasks = _build_case_tasks(config)
+            _save_ckpt("tasks", tasks)
+        done_cases = {int(k[5:]): v for k, v in ckpt.items() if k.startswith("case:")}
         total = len(tasks)
+        name = config.exercise_name
         _job_update(job_id, progress="Generating cases...", completed=0, total=total)
 
-        cases_results: Dict[int, Dict] = {}
-        with ThreadPoolExecutor(max_workers=min(5, max(total, 1))) as pool:
-            futures = {pool.submit(_generate_one, t, config.environment, config.region, config.selected_mets): i
-                       for i, t in enumerate(tasks)}
-            completed = 0
-            for future in as_completed(futures):
-                cases_results[futures[future]] = future.result()
-                completed += 1
-                _job_update(job_id, progress=f"Generating cases: {completed} / {total}", completed=completed)
-
-        cases = [cases_results[i] for i in range(total)]
-        fallback_count = sum(1 for c in cases if c.pop("_fallback", False))
-        if fallback_count:
-            print(f"WARNING: {fallback_count}/{total} cases used the offline fallback")
-        _job_update(job_id, progress="Generating documents...", completed=total)
-
-        # Pool cases by (day, MASCAL) so each schedule slot draws a case that
-        # was generated for it; shuffle within pools to mix trauma/DNBI order.
-        case_pools: Dict[tuple, List[Dict]] = {}
-        for t, c in zip(tasks, cases):
-            case_pools.setdefault((t[0], t[4]), []).append(c)
-        for p in case_pools.values():
-            random.shuffle(p)
-
-        schedule, cases = generate_schedule(config, case_pools)
-        with ThreadPoolExecutor(max_workers=3) as pool:
-            f_warno = pool.submit(generate_warno, config)
-            f_annex = pool.submit(generate_annex_q, config)
-            f_medroe = pool.submit(generate_medroe, config)
-            warno = f_warno.result()
-            annex = f_annex.result()
-            medroe = f_medroe.result()
-
-        # Road to War video prompt is derived from the freshly generated Annex Q.
-        _job_update(job_id, progress="Writing Road to War prompt...")
-        road_to_war = generate_road_to_war_prompt(config, annex)
-
-        _job_update(job_id, progress="Assembling package...")
-
-        if SessionLocal:
+        def _progress(**kwargs):
+            # A failed stage ends the job while others wind down; their
+            # progress must not overwrite the error (in memory or in the Job
+            # row, which outlives the _jobs entry).
+            with status_lock:
+                if not cancel.is_set():
+                    _job_update(job_id, **kwargs)
+
+        # Milestones after case generation, in the order the UI expects
+        # (its progress bar keys on them). Stages reach them concurrently, so
+        # only the furthest one reached is shown, and none until the cases
+        # are done.
+        milestones = ("Generating documents...", "Writing Road to War prompt...", "Assembling package...")
+        reached: set = set()
+
+        def _milestone(n: int, **kwargs):
+            with status_lock:
+                reached.add(n)
+                if 0 not in reached or cancel.is_set():
+                    return
+                _job_update(job_id, progress=milestones[max(reached)], **kwargs)
+
+        # Case book sections are rendered as cases land, overlapping the LLM
+        # wait; only the TOC and "CASE N" headings wait for the schedule to fix
+        # the order. Keyed by id(case): the same dicts come back from
+        # generate_schedule. Checkpointed cases render at assembly instead.
+        fragments: Dict[int, Future] = {}
+        fragment_pool = ThreadPoolExecutor(1, thread_name_prefix="case-fragment")
+        case_ckpts = _CheckpointWriter(_job_queue, job_id) if _job_queue else None
+
+        def _on_case(i: int, c: Dict):
+            # Runs on the generation event loop: hand work off, never block.
+            if CASE_BOOK_RENDERER == "template":
+                fragments[id(c)] = fragment_pool.submit(_case_body, c, _docx_template()[3])
+            if case_ckpts and not c.get("_fallback"):
+                case_ckpts.submit(f"case:{i}", c)
+
+        def _cases(_r):
+            try:
+                cases = asyncio.run(_generate_cases_async(
+                    tasks, config,
+                    on_done=lambda n: _progress(progress=f"Generating cases: {n} / {total}", completed=n),
+                    done=done_cases,
+                    on_case=_on_case,
+                    cancel=cancel,
+                ))
+            finally:
+                if case_ckpts:
+                    case_ckpts.close()
+            fallback_count = sum(1 for c in cases if c.pop("_fallback", False))
+            if fallback_count:
+                print(f"WARNING: {fallback_count}/{total} cases used the offline fallback")
+            _milestone(0, completed=total)
+            return cases, fallback_count
+
+        def _schedule(r):
+            # Pool cases by (day, MASCAL) so each schedule slot draws a case that
+            # was generated for it; shuffle within pools to mix trauma/DNBI order.
+            case_pools: Dict[tuple, List[Dict]] = {}
+            for t, c in zip(tasks, r["cases"][0]):
+                case_pools.setdefault((t[0], t[4]), []).append(c)
+            for p in case_pools.values():
+                random.shuffle(p)
+            return generate_schedule(config, case_pools)
+
+        def _road_to_war(r):
+            _milestone(1)
+            return generate_road_to_war_prompt(config, r["annex"])
+
+        def _save(r):
+            _milestone(2)
+            if not SessionLocal:
+                return None
+            schedule, cases = r["schedule"]
             db = SessionLocal()
             try:
-                ex = Exercise(name=config.exercise_name, config=config.dict(), cases=cases,
-                              msel_data=schedule, warno_text=warno, annex_q_text=annex, medroe_text=medroe,
-                              road_to_war_text=road_to_war)
+                ex = Exercise(name=name, config=config.dict(), cases=cases,
+                              msel_data=schedule, warno_text=r["warno"], annex_q_text=r["annex"], medroe_text=r["medroe"],
+                              road_to_war_text=r["road_to_war"], **_exercise_summary(config.dict(), cases, schedule))
                 db.add(ex)
                 db.commit()
+                return _artifact_key(ex.id, ex.created_at)
             finally:
                 db.close()
 
-        zip_buf = BytesIO()
-        with zipfile.ZipFile(zip_buf, 'w', zipfile.ZIP_DEFLATED) as zf:
-            zf.writestr(f"{config.exercise_name}_MSEL.xlsx", create_msel(schedule, config).getvalue())
-            zf.writestr(f"{config.exercise_name}_WARNO.docx", create_docx("WARNING ORDER", config.exercise_name.upper(), warno).getvalue())
-            zf.writestr(f"{config.exercise_name}_Annex_Q.docx", create_docx("ANNEX Q (MEDICAL SERVICES)", f"TO OPORD {config.exercise_name.upper()}", annex).getvalue())
-            zf.writestr(f"{config.exercise_name}_MEDROE.docx", create_docx("MEDICAL RULES OF ENGAGEMENT", config.exercise_name.upper(), medroe).getvalue())
-            zf.writestr(f"{config.exercise_name}_Case_Book.docx", create_case_book(cases, config).getvalue())
-            zf.writestr(f"{config.exercise_name}_Road_to_War_Prompt.docx", create_docx("ROAD TO WAR — VIDEO PROMPT", config.exercise_name.upper(), road_to_war).getvalue())
-        zip_buf.seek(0)
-
         token = str(uuid.uuid4())
-        _packages[token] = {"data": zip_buf.getvalue(), "ts": datetime.utcnow()}
+        cfg = config.dict()
+        timings: Dict[str, tuple] = {}
+        with _package_writer(token) as zf:
+            zip_lock = threading.Lock()  # ZipFile takes one writer at a time
+
+            # Rendered documents are also kept for the artifact cache; they
+            # can only be filed under the exercise once it has been saved.
+            staged: Dict[str, str] = {}
+
+            def _store(doc_type: str, data: bytes):
+                with zip_lock:
+                    _zip_add(zf, f"{name}_{_DOC_SPECS[doc_type][0]}", data)
+                if SessionLocal:
+                    staged[doc_type] = _artifact_cache.pending_path()
+                    with open(staged[doc_type], "wb") as f:
+                        f.write(data)
+
+            def _doc(doc_type: str, src):
+                # Each document renders in the pool and goes into the package
+                # as soon as it is back.
+                def _stage(r):
+                    t0 = time.perf_counter()
+                    data, secs = _render_submit(*_render_request(doc_type, cfg, src(r))).result()
+                    timings[_DOC_SPECS[doc_type][0]] = (secs, time.perf_counter() - t0)
+                    _store(doc_type, data)
+                return _stage
+
+            def _case_book(r):
+                cases = r["schedule"][1]
+                if CASE_BOOK_RENDERER != "template":
+                    return _doc("case_book", lambda r: {"cases": cases})(r)
+                # Stitch the pre-rendered sections under the TOC and headings.
+                t0 = time.perf_counter()
+                bodies = [fragments[id(c)].result() if id(c) in fragments else None for c in cases]
+                t1 = time.perf_counter()
+                data = create_case_book_fast(cases, config, bodies).getvalue()
+                timings[_DOC_SPECS["case_book"][0]] = (time.perf_counter() - t1, time.perf_counter() - t0)
+                _store("case_book", data)
+
+            stages = {
+                "cases": ((), _cases),
+                "warno": ((), _resumable("warno", lambda r: generate_warno(config))),
+                "annex": ((), _resumable("annex", lambda r: generate_annex_q(config))),
+                "medroe": ((), _resumable("medroe", lambda r: generate_medroe(config))),
+                # Road to War video prompt is derived from the freshly generated Annex Q.
+                "road_to_war": (("annex",), _resumable("road_to_war", _road_to_war)),
+                "schedule": (("cases",), _schedule),
+                "save": (("schedule", "warno", "annex", "medroe", "road_to_war"), _save),
+                "doc_msel": (("schedule",), _doc("msel", lambda r: {"schedule": r["schedule"][0]})),
+                "doc_case_book": (("schedule",), _case_book),
+                "doc_warno": (("warno",), _doc("warno", lambda r: {"warno": r["warno"]})),
+                "doc_annex": (("annex",), _doc("annex_q", lambda r: {"annex_q": r["annex"]})),
+                "doc_medroe": (("medroe",), _doc("medroe", lambda r: {"medroe": r["medroe"]})),
+                "doc_road_to_war": (("road_to_war",), _doc("road_to_war", lambda r: {"road_to_war": r["road_to_war"]})),
+            }
+            try:
+                r = _run_stage_graph(stages, cancel=cancel, on_error=_fail)
+            finally:
+                fragment_pool.shutdown(wait=False, cancel_futures=True)
+                if case_ckpts:
+                    case_ckpts.close()
+        fallback_count = r["cases"][1]
+        print(f"Render timings for job {job_id} (render/wall): {_render_timings(timings)}")
+        if r["save"] is not None:
+            try:
+                for doc_type, path in staged.items():
+                    _artifact_cache.put_file(r["save"], doc_type, path, name, move=True)
+                _artifact_cache.put_file(r["save"], "package", _package_path(token), name)
+            except OSError as e:
+                print(f"WARNING: artifact cache fill failed: {e}")
+
         done_msg = "Package ready!" if not fallback_count else (
             f"Package ready — NOTE: {fallback_count} of {total} cases used the offline "
             f"fallback template (AI generation failed); review the case book before use.")
         _job_update(job_id, status="complete", progress=done_msg,
                     completed=total, total=total, token=token,
-                    filename=f"{config.exercise_name}_Package.zip")
+                    filename=f"{name}_Package.zip")
     except Exception as e:
-        import traceback
-        traceback.print_exc()
-        _job_update(job_id, status="error", progress=str(e), error=str(e))
-
+        if isinstance(e, JobCancelled):
+            print(f"WARNING: job {job_id} stopped: {e}")
+        else:
+            import traceback
+            traceback.print_exc()
+        # Failures inside the stage graph were reported (by _fail) when they
+        # set `cancel`; an outside cancel reports nothing.
+        if not cancel.is_set():
+            _fail(e)
+
+
+# --- Durable job queue + worker processes ----------------------------------
+# Generation jobs are rows in a local SQLite queue (DATABASE_URL can't be
+# assumed) and run in a pool of worker processes spawned at startup, so
+# document rendering never competes with request handling for the GIL and a
+# restart doesn't silently drop work. Workers claim jobs under a lease they
+# renew while running; a job whose worker died is re-claimed once its lease
+# lapses, up to JOB_MAX_ATTEMPTS, and a worker process that dies is replaced.
+# At most JOB_MAX_CONCURRENT jobs run at once: claim() counts live leases in
+# the queue DB, so the limit holds across every API process sharing DATA_DIR
+# (each uvicorn worker starts its own pool; the surplus workers just idle).
+# JOB_MAX_CONCURRENT=0 runs jobs on an in-process thread as before.
+JOB_MAX_CONCURRENT = int(os.getenv("JOB_MAX_CONCURRENT", "2"))
+JOB_LEASE_S = float(os.getenv("JOB_LEASE_S", "60"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+JOB_QUEUE_DB = os.path.join(DATA_DIR, "jobs.sqlite3")
+_QUEUE_POLL_S = 0.5
+
+class _JobQueue:
+    """SQLite-backed job queue with leased claims. Safe to share between
+    processes; each process opens its own connections."""
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with closing(self._conn()) as c:
+            c.execute("PRAGMA journal_mode=WAL")
+            c.execute("""CREATE TABLE IF NOT EXISTS job_queue (
+                id TEXT PRIMARY KEY,
+                config TEXT NOT NULL,
+                state TEXT NOT NULL DEFAULT 'queued',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                lease_owner TEXT,
+                lease_expires REAL,
+                status_json TEXT,
+                created REAL NOT NULL,
+                updated REAL NOT NULL)""")
+            c.execute("CREATE INDEX IF NOT EXISTS job_queue_state ON job_queue (state, created)")
+            c.execute("CREATE INDEX IF NOT EXISTS job_queue_updated ON job_queue (updated)")
+            c.execute("""CREATE TABLE IF NOT EXISTS job_checkpoints (
+                job_id TEXT NOT NULL,
+                name TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                PRIMARY KEY (job_id, name))""")
+
+    def _conn(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=30, isolation_level=None)
+
+    def enqueue(self, job_id: str, config_json: str, snap: Dict):
+        now = time.time()
+        with closing(self._conn()) as c:
+            c.execute("INSERT INTO job_queue (id, config, status_json, created, updated) VALUES (?, ?, ?, ?, ?)",
+                      (job_id, config_json, json.dumps(snap), now, now))
+
+    def claim(self, owner: str, limit: int) -> Optional[tuple]:
+        """Lease the oldest runnable job -> (id, config_json, attempt), or None
+        when the queue is empty or `limit` jobs already hold live leases."""
+        with closing(self._conn()) as c:
+            while True:
+                now = time.time()
+                c.execute("BEGIN IMMEDIATE")
+                try:
+                    live = c.execute("SELECT COUNT(*) FROM job_queue WHERE state = 'running' AND lease_expires > ?",
+                                     (now,)).fetchone()[0]
+                    row = None if live >= limit else c.execute(
+                        "SELECT id, config, attempts FROM job_queue WHERE state = 'queued' "
+                        "OR (state = 'running' AND lease_expires <= ?) ORDER BY created LIMIT 1", (now,)).fetchone()
+                    if row is None:
+                        c.execute("COMMIT")
+                        return None
+                    job_id, config_json, attempts = row
+                    if attempts >= JOB_MAX_ATTEMPTS:
+                        snap = {"status": "error", "progress": "Job failed: worker lost too many times",
+                                "error": "Job failed: worker lost too many times"}
+                        c.execute("UPDATE job_queue SET state = 'failed', status_json = ?, updated = ? WHERE id = ?",
+                                  (json.dumps(snap), now, job_id))
+                        c.execute("COMMIT")
+                        continue
+                    c.execute("UPDATE job_queue SET state = 'running', lease_owner = ?, lease_expires = ?, "
+                              "attempts = attempts + 1, updated = ? WHERE id = ?",
+                              (owner, now + JOB_LEASE_S, now, job_id))
+                    c.execute("COMMIT")
+                    return job_id, config_json, attempts + 1
+                except BaseException:
+                    c.execute("ROLLBACK")
+                    raise
+
+    def renew(self, job_id: str, owner: str) -> bool:
+        with closing(self._conn()) as c:
+            cur = c.execute("UPDATE job_queue SET lease_expires = ? WHERE id = ? AND lease_owner = ? AND state = 'running'",
+                            (time.time() + JOB_LEASE_S, job_id, owner))
+            return cur.rowcount == 1
+
+    def set_status(self, job_id: str, owner: str, snap: Dict) -> bool:
+        """Publish a snapshot for a job `owner` still holds the lease on. False
+        once the lease is gone — the job is someone else's now."""
+        with closing(self._conn()) as c:
+            cur = c.execute("UPDATE job_queue SET status_json = ?, updated = ? WHERE id = ? AND lease_owner = ?",
+                            (json.dumps(snap), time.time(), job_id, owner))
+            return cur.rowcount == 1
+
+    def finish(self, job_id: str, owner: str, ok: bool):
+        with closing(self._conn()) as c:
+            cur = c.execute("UPDATE job_queue SET state = ?, lease_owner = NULL, lease_expires = NULL, updated = ? "
+                            "WHERE id = ? AND lease_owner = ?", ("done" if ok else "failed", time.time(), job_id, owner))
+            if ok and cur.rowcount == 1:
+                c.execute("DELETE FROM job_checkpoints WHERE job_id = ?", (job_id,))
+
+    def checkpoint(self, job_id: str, name: str, value: Any):
+        self.checkpoint_many(job_id, {name: value})
+
+    def checkpoint_many(self, job_id: str, items: Dict[str, Any]):
+        """Write several checkpoints in one transaction."""
+        rows = [(job_id, name, json.dumps(value)) for name, value in items.items()]
+        with closing(self._conn()) as c:
+            with c:
+                c.execute("BEGIN IMMEDIATE")
+                c.executemany("INSERT OR REPLACE INTO job_checkpoints (job_id, name, payload) VALUES (?, ?, ?)", rows)
+
+    def checkpoints(self, job_id: str) -> Dict[str, Any]:
+        with closing(self._conn()) as c:
+            rows = c.execute("SELECT name, payload FROM job_checkpoints WHERE job_id = ?", (job_id,)).fetchall()
+        return {name: json.loads(payload) for name, payload in rows}
+
+    def status(self, job_id: str) -> Optional[Dict]:
+        with closing(self._conn()) as c:
+            row = c.execute("SELECT status_json FROM job_queue WHERE id = ?", (job_id,)).fetchone()
+        return json.loads(row[0]) if row and row[0] else None
+
+    def changed_since(self, stamp: float) -> List[tuple]:
+        with closing(self._conn()) as c:
+            return c.execute("SELECT id, status_json, updated FROM job_queue WHERE updated > ? ORDER BY updated",
+                             (stamp,)).fetchall()
+
+    def purge(self, older_than_s: float):
+        with closing(self._conn()) as c:
+            c.execute("DELETE FROM job_queue WHERE state IN ('done', 'failed') AND updated < ?",
+                      (time.time() - older_than_s,))
+            c.execute("DELETE FROM job_checkpoints WHERE job_id NOT IN (SELECT id FROM job_queue)")
+
+class _CheckpointWriter:
+    """Checkpoints for one job, written off the caller's thread: case
+    checkpoints land on the generation event loop, where a SQLite write (and
+    its lock wait) would stall every call in flight. One thread writes
+    whatever has queued up since its last write in a single transaction."""
+
+    def __init__(self, queue: _JobQueue, job_id: str):
+        self.queue = queue
+        self.job_id = job_id
+        self._pending: Dict[str, Any] = {}
+        self._cond = threading.Condition()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, name: str, value: Any):
+        with self._cond:
+            self._pending[name] = value
+            self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._closed:
+                    self._cond.wait()
+                batch, self._pending = self._pending, {}
+                if not batch:
+                    return
+            try:
+                self.queue.checkpoint_many(self.job_id, batch)
+            except (sqlite3.Error, TypeError, ValueError) as e:
+                print(f"WARNING: {len(batch)} checkpoints for job {self.job_id} failed: {e}")
+
+    def close(self):
+        """Write what is still queued, then stop."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._thread.join()
+
+_job_queue: Optional[_JobQueue] = None
+_queue_workers: List[Any] = []
+_queue_stopping = threading.Event()
+_WORKER_CHECK_S = 2.0
+
+def _worker_main(worker_id: str, parent_pid: Optional[int] = None):
+    """Queue worker process: claim a job, run it, repeat. Progress reaches the
+    API through the queue row (see _job_status_sink)."""
+    global _job_queue, _job_status_sink
+    _job_queue = _JobQueue(JOB_QUEUE_DB)
+    _job_status_sink = lambda job_id, snap: _job_queue.set_status(job_id, worker_id, snap)
+    while True:
+        if parent_pid and os.getppid() != parent_pid:
+            return
+        try:
+            claimed = _job_queue.claim(worker_id, JOB_MAX_CONCURRENT)
+        except sqlite3.Error as e:
+            print(f"WARNING: job queue claim failed: {e}")
+            claimed = None
+        if not claimed:
+            time.sleep(_QUEUE_POLL_S)
+            continue
+        job_id, config_json, attempt = claimed
+        done, cancel = threading.Event(), threading.Event()
+
+        def _renew():
+            # Heartbeat: a lost lease means another worker may already have
+            # re-claimed the job — stop running it here.
+            while not done.wait(JOB_LEASE_S / 3):
+                try:
+                    held = _job_queue.renew(job_id, worker_id)
+                except sqlite3.Error as e:
+                    print(f"WARNING: lease renewal for job {job_id} failed: {e}")
+                    continue
+                if not held:
+                    print(f"WARNING: lost lease on job {job_id} — abandoning it")
+                    cancel.set()
+                    return
+
+        threading.Thread(target=_renew, daemon=True).start()
+        _jobs[job_id] = {"status": "running", "completed": 0, "total": 0, "ts": datetime.utcnow()}
+        _job_update(job_id, progress="Starting..." if attempt == 1 else f"Restarting (attempt {attempt})...")
+        try:
+            _run_generation(ExerciseConfig.parse_raw(config_json), job_id, cancel)
+        finally:
+            done.set()
+            ok = _jobs.get(job_id, {}).get("status") == "complete"
+            _job_queue.finish(job_id, worker_id, ok)
+            _jobs.pop(job_id, None)
+            with _job_events_lock:
+                _job_events.pop(job_id, None)
+
+def _queue_watcher():
+    """API-side relay: apply worker status changes from the queue to the
+    in-memory job store so GET /jobs and SSE subscribers see them."""
+    stamp = time.time() - 1
+    last_purge = 0.0
+    while True:
+        try:
+            for job_id, status_json, updated in _job_queue.changed_since(stamp):
+                stamp = max(stamp, updated)
+                if job_id in _jobs and status_json:
+                    snap = json.loads(status_json)
+                    if snap != _job_snapshot(_jobs[job_id]):
+                        _jobs[job_id].update(snap)
+                        _job_publish(job_id)
+            if time.time() - last_purge > 3600:
+                last_purge = time.time()
+                _job_queue.purge(_JOB_TTL.total_seconds())
+        except sqlite3.Error as e:
+            print(f"WARNING: job queue watch failed: {e}")
+        time.sleep(_QUEUE_POLL_S)
+
+@app.on_event("startup")
+def _start_purger():
+    threading.Thread(target=_purge_loop, daemon=True).start()
+
+@app.on_event("startup")
+def _start_job_queue():
+    global _job_queue
+    if JOB_MAX_CONCURRENT <= 0:
+        return
+    _job_queue = _JobQueue(JOB_QUEUE_DB)
+    threading.Thread(target=_queue_watcher, daemon=True).start()
+    for n in range(JOB_MAX_CONCURRENT):
+        _queue_workers.append(_spawn_worker(n))
+    threading.Thread(target=_supervise_workers, daemon=True).start()
+
+def _spawn_worker(n: int):
+    # Not daemonic: workers run their own render pool, and daemonic
+    # processes may not have children. They exit with the API process
+    # (terminated on shutdown, or on noticing their parent is gone).
+    proc = multiprocessing.get_context("spawn").Process(
+        target=_worker_main, args=(f"{os.getpid()}-{n}-{uuid.uuid4().hex[:8]}", os.getpid()))
+    proc.start()
+    return proc
+
+def _supervise_workers():
+    """Replace worker processes that die (OOM kill, a crash in native code).
+    Their job's lease lapses and the replacement — or any worker — re-claims it."""
+    while not _queue_stopping.wait(_WORKER_CHECK_S):
+        for n, proc in enumerate(_queue_workers):
+            if proc.is_alive() or _queue_stopping.is_set():
+                continue
+            proc.join()
+            print(f"WARNING: job worker {n} (pid {proc.pid}) exited with code {proc.exitcode} — restarting it")
+            _queue_workers[n] = _spawn_worker(n)
+
+@app.on_event("shutdown")
+def _stop_job_queue():
+    # Running jobs keep their rows; their leases lapse and the next boot's
+    # workers pick them up again.
+    _queue_stopping.set()
+    for proc in _queue_workers:
+        proc.terminate()
+    for proc in _queue_workers:
+        proc.join(timeout=5)
 
 @app.post("/generate-exercise")
 async def generate_exercise(config: ExerciseConfig):
-    _purge_stale_stores()
     job_id = str(uuid.uuid4())
-    _job_create(job_id)
-    threading.Thread(target=_run_generation, args=(config, job_id), daemon=True).start()
+    await _offload(_job_create, job_id)
+    if _job_queue:
+        await _offload(_job_queue.enqueue, job_id, config.json(), _job_snapshot(_jobs[job_id]))
+    else:
+        threading.Thread(target=_run_generation, args=(config, job_id), daemon=True).start()
     return {"job_id": job_id}
 
 
 @app.get("/jobs/{job_id}")
 async def get_job_status(job_id: str):
-    job = _job_get(job_id)
+    job = _jobs.get(job_id) or await _offload(_job_get, job_id)
     if not job:
         raise HTTPException(status_code=404, detail="Job not found")
     return job
 
 
+_SSE_HEARTBEAT_S = 15
+_SSE_DB_POLL_S = 2
+
+def _sse(event_id: int, snap: Dict) -> str:
+    kind = snap.get("status") if snap.get("status") in _JOB_TERMINAL else "progress"
+    return f"id: {event_id}\nevent: {kind}\ndata: {json.dumps(snap)}\n\n"
+
+@app.get("/jobs/{job_id}/events")
+async def job_events(job_id: str, request: Request, last_event_id: Optional[int] = None):
+    """Server-sent events for a job's progress: one event per _job_update
+    ('progress', then a final 'complete' or 'error'), comment heartbeats while
+    idle, and resume from the Last-Event-ID header (or ?last_event_id=)."""
+    if job_id not in _jobs and not await _offload(_job_get, job_id):
+        raise HTTPException(status_code=404, detail="Job not found")
+    header_id = request.headers.get("last-event-id", "")
+    last = int(header_id) if header_id.isdigit() else (last_event_id or 0)
+
+    async def _local_stream():
+        nonlocal last
+        loop, wake = asyncio.get_running_loop(), asyncio.Event()
+        with _job_events_lock:
+            ch = _job_events.setdefault(job_id, {"seq": 0, "log": deque(maxlen=_JOB_EVENT_BACKLOG), "waiters": set()})
+            ch["waiters"].add((loop, wake))
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                wake.clear()
+                for seq, snap in _job_events_since(job_id, last):
+                    last = seq
+                    yield _sse(seq, snap)
+                    if snap.get("status") in _JOB_TERMINAL:
+                        return
+                # Resumed at or past the final event — nothing more will come.
+                if (_jobs.get(job_id) or {}).get("status") in _JOB_TERMINAL or await request.is_disconnected():
+                    return
+                try:
+                    await asyncio.wait_for(wake.wait(), timeout=_SSE_HEARTBEAT_S)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+        finally:
+            with _job_events_lock:
+                ch = _job_events.get(job_id)
+                if ch:
+                    ch["waiters"].discard((loop, wake))
+
+    async def _db_stream():
+        # Job is running on another instance: poll the shared DB row once per
+        # interval for every subscriber here, emitting only on change.
+        nonlocal last
+        yield "retry: 3000\n\n"
+        prev, idle = None, 0.0
+        while not await request.is_disconnected():
+            job = await _offload(_job_get, job_id)
+            snap = _job_snapshot(job) if job else {"status": "error", "error": "Job not found"}
+            if snap != prev:
+                prev, idle = snap, 0.0
+                last += 1
+                yield _sse(last, snap)
+                if snap.get("status") in _JOB_TERMINAL:
+                    return
+            elif idle >= _SSE_HEARTBEAT_S:
+                idle = 0.0
+                yield ": keep-alive\n\n"
+            await asyncio.sleep(_SSE_DB_POLL_S)
+            idle += _SSE_DB_POLL_S
+
+    return StreamingResponse(_local_stream() if job_id in _jobs else _db_stream(),
+                             media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
 @app.get("/download/{token}")
-async def download_package(token: str):
-    pkg = _packages.pop(token, None)
-    if not pkg:
-        raise HTTPException(status_code=404, detail="Package not found or already downloaded")
-    return Response(pkg["data"], media_type="application/zip",
-                    headers={"Content-Disposition": "attachment; filename=package.zip"})
+async def download_package(token: str, request: Request):
+    path = await _offload(_package_get, token)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Package not found or expired")
+    return _file_response(request, path, "application/zip", "package.zip")
+
+def _json_col(value):
+    """JSON columns may come back as strings depending on the backend."""
+    return json.loads(value) if isinstance(value, str) else value
+
+def _exercise_summary(config: Dict[str, Any], cases: List[Dict], schedule: List[Dict]) -> Dict[str, Any]:
+    """Summary columns for the history list."""
+    states = [r.get("pace_state") for r in schedule if r.get("pace_state") in _PACE_STATES]
+    total_blood = 0
+    for r in schedule:
+        try:
+            total_blood += int(float(r.get("blood_units") or 0))
+        except (TypeError, ValueError):
+            pass
+    return {
+        "total_cases": len(cases) if isinstance(cases, list) else 0,
+        "duration": config.get("duration"),
+        "environment": config.get("environment"),
+        "peak_pace_state": max(states, key=_PACE_STATES.index) if states else None,
+        "blood_deficit": max(0, total_blood - STARTING_LTOWB_UNITS),
+    }
+
+def _row_summary(e) -> Dict[str, Any]:
+    """_exercise_summary for a stored row (needs its config, cases and
+    msel_data columns)."""
+    try:
+        return _exercise_summary(_json_col(e.config) or {}, _json_col(e.cases) or [], _json_col(e.msel_data) or [])
+    except Exception:  # malformed row — mark it so it isn't retried every boot
+        return {"total_cases": 0}
+
+@app.on_event("startup")
+def _start_summary_backfill():
+    # In the background: the API takes traffic while older rows are filled
+    # in, and _list_exercises summarises any it reaches first.
+    if SessionLocal:
+        threading.Thread(target=_backfill_exercise_summaries, daemon=True).start()
+
+def _backfill_exercise_summaries():
+    """One-off migration: fill the summary columns of rows saved before they
+    existed, a batch at a time."""
+    last_id, filled = 0, 0
+    try:
+        while True:
+            db = SessionLocal()
+            try:
+                rows = (db.query(Exercise).filter(Exercise.total_cases.is_(None), Exercise.id > last_id)
+                        .order_by(Exercise.id).limit(50).all())
+                if not rows:
+                    break
+                for e in rows:
+                    last_id = e.id
+                    for k, v in _row_summary(e).items():
+                        setattr(e, k, v)
+                    filled += 1
+                db.commit()
+            finally:
+                db.close()
+    except Exception as e:
+        print(f"WARNING: exercise summary backfill failed: {e}")
+    if filled:
+        print(f"Backfilled summary columns for {filled} exercises")
 
 @app.get("/exercises")
-async def list_exercises():
+async def list_exercises(limit: int = Query(50, ge=1, le=200), before: Optional[int] = None):
+    """Newest first, one page at a time: pass the returned `next_before` as
+    `before` for the next page (keyset pagination on id)."""
     if not SessionLocal:
-        return {"exercises": []}
+        return {"exercises": [], "next_before": None}
+    return await _offload(_list_exercises, limit, before)
+
+def _list_exercises(limit: int, before: Optional[int]) -> Dict[str, Any]:
     db = SessionLocal()
     try:
-        exs = db.query(Exercise).order_by(Exercise.created_at.desc()).all()
-        exercises_list = []
-        for e in exs:
-            try:
-                # Parse JSON if stored as string
-                config = e.config or {}
-                if isinstance(config, str):
-                    config = json.loads(config)
-                cases = e.cases or []
-                if isinstance(cases, str):
-                    cases = json.loads(cases)
-
-                exercises_list.append({
-                    "id": e.id,
-                    "name": e.name,
-                    "created_at": e.created_at.isoformat() if e.created_at else None,
-                    "duration": config.get("duration") if isinstance(config, dict) else None,
-                    "environment": config.get("environment") if isinstance(config, dict) else None,
-                    "total_cases": len(cases) if isinstance(cases, list) else 0
-                })
-            except Exception as ex:
-                # Log but skip malformed exercises
-                exercises_list.append({
-                    "id": e.id,
-                    "name": e.name or "Unknown",
-                    "created_at": None,
-                    "duration": None,
-                    "environment": None,
-                    "total_cases": 0
-                })
-        return {"exercises": exercises_list}
+        q = db.query(Exercise.id, Exercise.name, Exercise.created_at, Exercise.duration, Exercise.environment,
+                     Exercise.total_cases, Exercise.peak_pace_state, Exercise.blood_deficit)
+        if before is not None:
+            q = q.filter(Exercise.id < before)
+        rows = q.order_by(Exercise.id.desc()).limit(limit + 1).all()
+        page = [e._asdict() for e in rows[:limit]]
+        # Rows the startup backfill hasn't reached yet: summarise them here.
+        stale = [e["id"] for e in page if e["total_cases"] is None]
+        if stale:
+            summaries = {e.id: _row_summary(e) for e in db.query(Exercise.id, Exercise.config, Exercise.cases,
+                                                                 Exercise.msel_data).filter(Exercise.id.in_(stale))}
+            for e in page:
+                e.update(summaries.get(e["id"], {}))
+        return {
+            "exercises": [{
+                "id": e["id"],
+                "name": e["name"] or "Unknown",
+                "created_at": e["created_at"].isoformat() if e["created_at"] else None,
+                "duration": e.get("duration"),
+                "environment": e.get("environment"),
+                "total_cases": e.get("total_cases") or 0,
+                "peak_pace_state": e.get("peak_pace_state"),
+                "blood_deficit": e.get("blood_deficit"),
+            } for e in page],
+            "next_before": page[-1]["id"] if len(rows) > limit else None,
+        }
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
     finally:
@@ -1648,19 +4458,24 @@ async def list_exercises():
 async def get_exercise(exercise_id: int):
     if not SessionLocal:
         raise HTTPException(status_code=404, detail="DB not configured")
+    return await _offload(_get_exercise, exercise_id)
+
+def _get_exercise(exercise_id: int) -> Response:
+    # Serialized here, on the blocking pool — the case/MSEL JSON is large.
     db = SessionLocal()
     try:
         ex = db.query(Exercise).filter(Exercise.id == exercise_id).first()
         if not ex:
             raise HTTPException(status_code=404, detail="Not found")
-        return {"id": ex.id, "name": ex.name, "created_at": ex.created_at.isoformat() if ex.created_at else None, "config": ex.config, "cases": ex.cases, "msel_data": ex.msel_data}
+        body = {"id": ex.id, "name": ex.name, "created_at": ex.created_at.isoformat() if ex.created_at else None,
+                "config": _json_col(ex.config), "cases": _json_col(ex.cases), "msel_data": _json_col(ex.msel_data)}
+        return Response(json.dumps(body), media_type="application/json")
     finally:
         db.close()
 
-@app.get("/exercises/{exercise_id}/download")
-async def download_exercise(exercise_id: int):
-    if not SessionLocal:
-        raise HTTPException(status_code=404, detail="DB not configured")
+def _load_exercise(exercise_id: int) -> tuple:
+    """(config, src) for a stored exercise, src holding the content each doc
+    type renders from (see _render_request)."""
     db = SessionLocal()
     try:
         ex = db.query(Exercise).filter(Exercise.id == exercise_id).first()
@@ -1681,61 +4496,118 @@ async def download_exercise(exercise_id: int):
         if isinstance(cases, str):
             cases = json.loads(cases)
 
-        zip_buf = BytesIO()
-        with zipfile.ZipFile(zip_buf, 'w', zipfile.ZIP_DEFLATED) as zf:
-            zf.writestr(f"{config.exercise_name}_MSEL.xlsx", create_msel(msel_data, config).getvalue())
-            zf.writestr(f"{config.exercise_name}_WARNO.docx", create_docx("WARNING ORDER", config.exercise_name.upper(), ex.warno_text).getvalue())
-            zf.writestr(f"{config.exercise_name}_Annex_Q.docx", create_docx("ANNEX Q (MEDICAL SERVICES)", f"TO OPORD {config.exercise_name.upper()}", ex.annex_q_text).getvalue())
-            zf.writestr(f"{config.exercise_name}_MEDROE.docx", create_docx("MEDICAL RULES OF ENGAGEMENT", config.exercise_name.upper(), ex.medroe_text).getvalue())
-            zf.writestr(f"{config.exercise_name}_Case_Book.docx", create_case_book(cases, config).getvalue())
-            road_to_war = getattr(ex, "road_to_war_text", None) or generate_road_to_war_prompt(config, ex.annex_q_text or "")
-            zf.writestr(f"{config.exercise_name}_Road_to_War_Prompt.docx", create_docx("ROAD TO WAR — VIDEO PROMPT", config.exercise_name.upper(), road_to_war).getvalue())
-        zip_buf.seek(0)
-        return Response(zip_buf.getvalue(), headers={'Content-Disposition': f'attachment; filename="{config.exercise_name}_Package.zip"'}, media_type='application/zip')
+        return config, {"schedule": msel_data, "cases": cases, "warno": ex.warno_text,
+                        "annex_q": ex.annex_q_text, "medroe": ex.medroe_text,
+                        "road_to_war": getattr(ex, "road_to_war_text", None)}
     finally:
         db.close()
 
-@app.get("/exercises/{exercise_id}/document/{doc_type}")
-async def download_document(exercise_id: int, doc_type: str):
-    if not SessionLocal:
-        raise HTTPException(status_code=404, detail="DB not configured")
-    if doc_type not in ["msel", "warno", "annex_q", "medroe", "case_book", "road_to_war"]:
-        raise HTTPException(status_code=400, detail="Invalid doc type")
-    
+def _cached_artifact(exercise_id: int, doc_type: str) -> tuple:
+    """(cache key, cache hit or None) for a stored exercise's artifact. The
+    row is looked up (created_at only) even on a hit, so a deleted or
+    replaced exercise is never served from the cache."""
     db = SessionLocal()
     try:
-        ex = db.query(Exercise).filter(Exercise.id == exercise_id).first()
-        if not ex:
-            raise HTTPException(status_code=404, detail="Not found")
-
-        # Parse JSON if stored as string
-        config_data = ex.config
-        if isinstance(config_data, str):
-            config_data = json.loads(config_data)
-        config = ExerciseConfig(**config_data)
+        row = db.query(Exercise.created_at).filter(Exercise.id == exercise_id).first()
+    finally:
+        db.close()
+    if row is None:
+        raise HTTPException(status_code=404, detail="Not found")
+    key = _artifact_key(exercise_id, row[0])
+    return key, _artifact_cache.get(key, doc_type)
+
+def _render_exercise_doc(key: str, doc_type: str, config: ExerciseConfig, src: Dict[str, Any],
+                         standalone: bool = False) -> tuple:
+    """Render one stored document into the artifact cache; returns the cache hit."""
+    if doc_type == "road_to_war" and not src["road_to_war"]:
+        src = {**src, "road_to_war": generate_road_to_war_prompt(config, src["annex_q"] or "")}
+    data, _secs = _render_submit(*_render_request(doc_type, config.dict(), src, standalone)).result()
+    return _artifact_cache.put(key, _document_slot(doc_type, standalone), data, config.exercise_name)
+
+def _tee_to_cache(chunks, key: str, doc_type: str, name: str):
+    """Pass a stream through while writing it to the artifact cache; the entry
+    is only kept if the stream runs to completion."""
+    tmp = _artifact_cache.pending_path()
+    complete = False
+    try:
+        with open(tmp, "wb") as f:
+            for chunk in chunks:
+                f.write(chunk)
+                yield chunk
+        complete = True
+    finally:
+        if complete:
+            _artifact_cache.put_file(key, doc_type, tmp, name, move=True)
+        else:
+            with suppress(OSError):
+                os.remove(tmp)
 
-        msel_data = ex.msel_data
-        if isinstance(msel_data, str):
-            msel_data = json.loads(msel_data)
+@app.get("/exercises/{exercise_id}/download")
+async def download_exercise(exercise_id: int, request: Request):
+    if not SessionLocal:
+        raise HTTPException(status_code=404, detail="DB not configured")
+    key, hit = await _offload(_cached_artifact, exercise_id, "package")
+    if hit:
+        return _cached_response(request, hit, f"{hit[2]}_Package.zip", "application/zip")
+    return await _offload(_stream_exercise_package, exercise_id, key)
+
+def _stream_exercise_package(exercise_id: int, key: str) -> StreamingResponse:
+    config, src = _load_exercise(exercise_id)
+    name, cfg = config.exercise_name, config.dict()
+    # Documents already cached go in straight from their files; the rest start
+    # rendering in the pool now, and the stream writes each entry in order as
+    # it completes (caching it on the way).
+    parts: Dict[str, Any] = {}
+    for doc_type in _DOC_SPECS:
+        hit = _artifact_cache.get(key, doc_type)
+        if hit:
+            parts[doc_type] = hit[0]
+        elif doc_type != "road_to_war" or src["road_to_war"]:
+            parts[doc_type] = _render_submit(*_render_request(doc_type, cfg, src))
+
+    def _part(doc_type: str):
+        part = parts.get(doc_type)
+        if part is None:  # Road to War never stored: generate it now
+            return _render_exercise_doc(key, doc_type, config, src)[0]
+        if isinstance(part, str):
+            return part
+        return _artifact_cache.put(key, doc_type, part.result()[0], name)[0]
+
+    entries = [(f"{name}_{spec[0]}", lambda d=doc_type: _part(d)) for doc_type, spec in _DOC_SPECS.items()]
+    return StreamingResponse(_offload_iter(_tee_to_cache(_zip_stream(entries), key, "package", name)),
+                             media_type='application/zip',
+                             headers={'Content-Disposition': f'attachment; filename="{name}_Package.zip"'})
+
+@app.post("/exercises/{exercise_id}/monte-carlo")
+async def exercise_monte_carlo(exercise_id: int, params: Optional[MonteCarloParams] = None):
+    """Replicate a stored exercise's timeline (see monte_carlo)."""
+    if not SessionLocal:
+        raise HTTPException(status_code=404, detail="DB not configured")
+    params = params or MonteCarloParams()
+    config, src = await _offload(_load_exercise, exercise_id)
+    return await _offload_wait(monte_carlo, src["schedule"] or [], config, params)
+
+@app.post("/what-if")
+async def what_if_sweep(req: WhatIfRequest):
+    """Planner metrics for every combination of req.grid over req.base (see
+    what_if). Nothing is generated or stored."""
+    try:
+        variants = _what_if_configs(req.base, req.grid)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    seed = req.seed if req.seed is not None else random.randrange(2 ** 32)
+    return await _offload_wait(what_if, variants, seed)
 
-        cases = ex.cases
-        if isinstance(cases, str):
-            cases = json.loads(cases)
+@app.get("/exercises/{exercise_id}/document/{doc_type}")
+async def download_document(exercise_id: int, doc_type: str, request: Request):
+    if not SessionLocal:
+        raise HTTPException(status_code=404, detail="DB not configured")
+    if doc_type not in _DOC_SPECS:
+        raise HTTPException(status_code=400, detail="Invalid doc type")
 
-        if doc_type == "msel":
-            buf, fn, mt = create_msel(msel_data, config), f"{config.exercise_name}_MSEL.xlsx", 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-        elif doc_type == "warno":
-            buf, fn, mt = create_docx("WARNING ORDER", config.exercise_name.upper(), ex.warno_text), f"{config.exercise_name}_WARNO.docx", 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'
-        elif doc_type == "annex_q":
-            buf, fn, mt = create_docx("ANNEX Q", f"TO OPORD {config.exercise_name.upper()}", ex.annex_q_text), f"{config.exercise_name}_Annex_Q.docx", 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'
-        elif doc_type == "medroe":
-            buf, fn, mt = create_docx("MEDROE", config.exercise_name.upper(), ex.medroe_text), f"{config.exercise_name}_MEDROE.docx", 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'
-        elif doc_type == "road_to_war":
-            rtw = getattr(ex, "road_to_war_text", None) or generate_road_to_war_prompt(config, ex.annex_q_text or "")
-            buf, fn, mt = create_docx("ROAD TO WAR — VIDEO PROMPT", config.exercise_name.upper(), rtw), f"{config.exercise_name}_Road_to_War_Prompt.docx", 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'
-        else:
-            buf, fn, mt = create_case_book(cases, config), f"{config.exercise_name}_Case_Book.docx", 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'
-        
-        return Response(buf.getvalue(), headers={'Content-Disposition': f'attachment; filename="{fn}"'}, media_type=mt)
-    finally:
-        db.close()
\ No newline at end of file
+    suffix, media_type = _DOC_SPECS[doc_type][:2]
+    key, hit = await _offload(_cached_artifact, exercise_id, _document_slot(doc_type, standalone=True))
+    if not hit:
+        config, src = await _offload(_load_exercise, exercise_id)
+        hit = await _offload_wait(_render_exercise_doc, key, doc_type, config, src, True)
+    return _cached_response(request, hit, f"{hit[2]}_{suffix}", media_type)
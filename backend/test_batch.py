@@ -0,0 +1,51 @@
+"""Batched case generation: parsing the array reply and matching it to slots.
+
+    python -m pytest backend/test_batch.py
+"""
+import json
+import os
+import tempfile
+
+os.environ.setdefault("ROLE2_DATA_DIR", tempfile.mkdtemp(prefix="role2-test-"))
+os.environ.setdefault("JOB_MAX_CONCURRENT", "0")
+
+from backend import main  # noqa: E402
+
+
+def _case(zap):
+    return main.create_fallback_case("GSW thigh", "Small arms", zap=zap)
+
+
+def test_parse_case_array_forms():
+    cases = [_case("11111"), _case("22222")]
+    assert main._parse_case_array(json.dumps(cases)) == cases
+    assert main._parse_case_array(json.dumps({"cases": cases})) == cases
+    assert main._parse_case_array(json.dumps(cases[0])) == [cases[0]]
+    assert main._parse_case_array("not json") == []
+
+
+def test_parse_case_array_keeps_the_clean_elements_of_a_truncated_reply():
+    text = json.dumps([_case("11111"), _case("22222"), _case("33333")])
+    got = main._parse_case_array(text[:-300])
+    # Fragments of the cut-off element come back too; validation drops them.
+    assert [c["zmist"]["zap"] for c in got if main._valid_case(c)] == ["11111", "22222"]
+    assert sorted(main._match_batch(got, ["11111", "22222", "33333"])) == [0, 1]
+
+
+def test_match_batch_by_zap_then_position():
+    zaps = ["11111", "22222", "33333"]
+    swapped = [_case("33333"), _case("99999"), _case("11111")]  # middle one lost its ZAP
+    got = main._match_batch(swapped, zaps)
+    assert sorted(got) == [0, 1, 2]
+    assert [got[i]["zmist"]["zap"] for i in range(3)] == zaps
+    assert got[0] is swapped[2] and got[2] is swapped[0]
+
+
+def test_match_batch_drops_invalid_and_duplicate_elements():
+    zaps = ["11111", "22222", "33333"]
+    bad = _case("22222")
+    del bad["phases"]
+    got = main._match_batch([_case("11111"), bad, _case("11111")], zaps)
+    # The duplicate falls back to its position (slot 2); slot 1 needs a retry.
+    assert sorted(got) == [0, 2]
+    assert got[2]["zmist"]["zap"] == "33333"
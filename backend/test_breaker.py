@@ -0,0 +1,89 @@
+"""Gemini circuit breaker and hedging: cancelled calls must hand back their slots.
+
+    python -m pytest backend/test_breaker.py
+"""
+import asyncio
+import os
+import tempfile
+import types
+
+os.environ.setdefault("ROLE2_DATA_DIR", tempfile.mkdtemp(prefix="role2-test-"))
+os.environ.setdefault("JOB_MAX_CONCURRENT", "0")
+
+from backend import main  # noqa: E402
+
+
+def _open_breaker():
+    breaker = main._CircuitBreaker(window=5, threshold=0.5, cooldown=0)
+    for _ in range(5):
+        breaker.record(False)
+    return breaker
+
+
+def _hanging_client(started: asyncio.Event):
+    async def generate_content(**_kwargs):
+        started.set()
+        await asyncio.sleep(3600)
+    return types.SimpleNamespace(aio=types.SimpleNamespace(models=types.SimpleNamespace(
+        generate_content=generate_content)))
+
+
+def test_cancelled_probe_releases_half_open_slot(monkeypatch):
+    breaker = _open_breaker()
+    monkeypatch.setattr(main, "_gemini_breaker", breaker)
+
+    async def run():
+        started = asyncio.Event()
+        monkeypatch.setattr(main, "get_client", lambda: _hanging_client(started))
+        probe = asyncio.create_task(main.gemini_generate_async("probe"))
+        await started.wait()
+        assert breaker._probing
+        probe.cancel()
+        try:
+            await probe
+        except asyncio.CancelledError:
+            pass
+
+    asyncio.run(run())
+    assert not breaker._probing
+    assert breaker.allow()  # the next call probes
+
+
+def test_cancelled_bystander_keeps_the_probe(monkeypatch):
+    breaker = _open_breaker()
+    assert breaker.allow()  # the probe, held by this thread
+
+    async def bystander():
+        breaker.abandon()  # a different caller's cancelled call
+
+    asyncio.run(bystander())
+    assert breaker._probing
+    assert not breaker.allow()
+    breaker.record(True)
+    assert breaker.allow()
+
+
+def test_cancelled_hedge_unwinds_its_calls():
+    hedger = main._Hedger(percentile=50, max_fraction=1.0)
+    started, finished = [], []
+
+    async def make_call(on_attempt):
+        started.append(1)
+        try:
+            await asyncio.sleep(3600)  # still queued: on_attempt never fires
+        finally:
+            finished.append(1)
+
+    async def run():
+        call = asyncio.create_task(main._hedged(make_call, hedger, "single"))
+        while not started:
+            await asyncio.sleep(0.01)
+        call.cancel()
+        try:
+            await call
+        except asyncio.CancelledError:
+            pass
+        assert finished  # the primary unwound before _hedged returned
+        assert all(t.done() for t in asyncio.all_tasks() if t is not asyncio.current_task())
+
+    asyncio.run(run())
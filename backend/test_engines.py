@@ -0,0 +1,60 @@
+"""The fast engines against the reference implementations kept in bench.py,
+on seeded synthetic exercises.
+
+    python -m pytest backend/test_engines.py
+"""
+import os
+import random
+import tempfile
+
+os.environ.setdefault("ROLE2_DATA_DIR", tempfile.mkdtemp(prefix="role2-test-"))
+os.environ.setdefault("JOB_MAX_CONCURRENT", "0")
+
+from backend import bench, main  # noqa: E402
+
+
+def _pools(config):
+    pools = {}
+    for day, case_type, mechanism, is_trauma, is_mascal in main._build_case_tasks(config):
+        pools.setdefault((day, is_mascal), []).append(main.create_fallback_case(case_type, mechanism, is_trauma))
+    return pools
+
+
+def _exercise(seed, **kw):
+    random.seed(seed)
+    config = bench.bench_config(main, **kw)
+    return config, bench.synthetic_exercise(main, config)
+
+
+def test_schedule_matches_the_row_loop():
+    random.seed(21)
+    config = bench.bench_config(main, days=4, per_day=30, mascal=12)
+    pools = _pools(config)
+    rows, cases = main.generate_schedule(config, {k: list(v) for k, v in pools.items()})
+    loop_rows, loop_cases = bench.generate_schedule_loop(main, config, {k: list(v) for k, v in pools.items()})
+    assert [list(r) for r in rows] == [list(r) for r in loop_rows]  # same columns, same order
+    assert rows == loop_rows
+    assert all(a is b for a, b in zip(cases, loop_cases))
+
+
+def test_census_matches_the_per_row_scan():
+    _config, (schedule, _cases) = _exercise(22, days=3, per_day=60, mascal=30)
+    assert [r["r2_census"] for r in schedule if "arr_raw" in r] == bench._census_scan(schedule)
+
+
+def test_case_book_template_matches_python_docx():
+    config, (_schedule, cases) = _exercise(17, days=1, per_day=12)
+    assert bench._document_xml(main.create_case_book_fast(cases, config)) == \
+        bench._document_xml(main.create_case_book(cases, config))
+
+
+def test_orders_template_matches_python_docx():
+    text = bench.synthetic_order(5, 1)
+    assert bench._document_xml(main.create_docx_fast("WARNING ORDER", "TEST", text)) == \
+        bench._document_xml(main.create_docx("WARNING ORDER", "TEST", text))
+
+
+def test_msel_stream_matches_pandas():
+    config, (schedule, _cases) = _exercise(20, days=2, per_day=30, mascal=10)
+    assert bench._workbook_cells(main.create_msel_stream(schedule, config)) == \
+        bench._workbook_cells(main.create_msel(schedule, config))
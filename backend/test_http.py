@@ -0,0 +1,99 @@
+"""HTTP helpers: download Range / If-None-Match, the exercise list's paging
+and SSE resume.
+
+    python -m pytest backend/test_http.py
+"""
+import asyncio
+import os
+import tempfile
+
+import pytest
+from fastapi import HTTPException
+from starlette.requests import Request
+
+os.environ.setdefault("ROLE2_DATA_DIR", tempfile.mkdtemp(prefix="role2-test-"))
+os.environ.setdefault("JOB_MAX_CONCURRENT", "0")
+
+from backend import main  # noqa: E402
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("bytes=0-99", (0, 99)),
+    ("bytes=900-", (900, 999)),
+    ("bytes=-100", (900, 999)),
+    ("bytes=990-2000", (990, 999)),
+    ("bytes=-5000", (0, 999)),
+    ("", None),
+    ("bytes=0-1,5-9", None),  # multi-range: whole file
+    ("bytes=9-1", None),
+    ("items=0-1", None),
+    ("bytes=a-b", None),
+])
+def test_byte_range(header, expected):
+    assert main._byte_range(header, 1000) == expected
+
+
+@pytest.mark.parametrize("header", ["bytes=1000-", "bytes=-0"])
+def test_unsatisfiable_range(header):
+    with pytest.raises(HTTPException) as e:
+        main._byte_range(header, 1000)
+    assert e.value.status_code == 416
+    assert e.value.headers["Content-Range"] == "bytes */1000"
+
+
+def _request(if_none_match="", last_event_id=""):
+    return Request({"type": "http", "headers": [(b"if-none-match", if_none_match.encode()),
+                                                (b"last-event-id", last_event_id.encode())]})
+
+
+@pytest.mark.parametrize("header, hit", [
+    ('"abc"', True),
+    ('W/"abc"', True),
+    ('"x", "abc"', True),
+    ("*", True),
+    ('"abd"', False),
+    ("", False),
+])
+def test_etag_matches(header, hit):
+    assert main._etag_matches(_request(header), '"abc"') is hit
+
+
+def test_exercise_list_pages_by_id(tmp_path, monkeypatch):
+    monkeypatch.setattr(main, "SessionLocal", main._LazySessionmaker(f"sqlite:///{tmp_path / 'x.db'}"))
+    main._init_schema()
+    db = main.SessionLocal()
+    for n in range(7):
+        db.add(main.Exercise(name=f"ex{n}", config={"duration": 1}, cases=[{}] * n, msel_data=[],
+                             **main._exercise_summary({"duration": 1}, [{}] * n, [])))
+    db.commit()
+    db.close()
+
+    seen, before = [], None
+    while True:
+        page = main._list_exercises(3, before)
+        seen += [(e["name"], e["total_cases"]) for e in page["exercises"]]
+        before = page["next_before"]
+        if before is None:
+            break
+    assert seen == [(f"ex{n}", n) for n in reversed(range(7))]
+
+
+def _events(job_id, last_event_id):
+    async def read():
+        response = await main.job_events(job_id, _request(last_event_id=last_event_id))
+        return [chunk async for chunk in response.body_iterator]
+    return [c.split("\n")[0] for c in asyncio.run(read()) if c.startswith("id:")]
+
+
+def test_job_events_resume_after_last_event_id():
+    main._job_create("sse")
+    for n in range(3):
+        main._job_update("sse", progress=f"step {n}", completed=n)
+    main._job_update("sse", status="complete")
+    try:
+        assert _events("sse", "") == ["id: 1", "id: 2", "id: 3", "id: 4", "id: 5"]
+        assert _events("sse", "3") == ["id: 4", "id: 5"]
+        assert _events("sse", "5") == []  # already saw the final event
+    finally:
+        main._jobs.pop("sse", None)
+        main._job_events.pop("sse", None)
@@ -0,0 +1,74 @@
+"""Job queue leases and checkpoints.
+
+    python -m pytest backend/test_queue.py
+"""
+import os
+import sqlite3
+import tempfile
+
+os.environ.setdefault("ROLE2_DATA_DIR", tempfile.mkdtemp(prefix="role2-test-"))
+os.environ.setdefault("JOB_MAX_CONCURRENT", "0")
+
+from backend import main  # noqa: E402
+
+
+def _queue(tmp_path, *jobs):
+    q = main._JobQueue(str(tmp_path / "jobs.sqlite3"))
+    for job_id in jobs:
+        q.enqueue(job_id, "{}", {"status": "running"})
+    return q
+
+
+def _expire(q, job_id):
+    with sqlite3.connect(q.path) as c:
+        c.execute("UPDATE job_queue SET lease_expires = 0 WHERE id = ?", (job_id,))
+
+
+def test_claim_honours_the_live_lease_limit(tmp_path):
+    q = _queue(tmp_path, "a", "b")
+    assert q.claim("w1", 1) == ("a", "{}", 1)
+    assert q.claim("w2", 1) is None  # "a" holds the only slot
+    assert q.claim("w2", 2)[0] == "b"
+
+
+def test_expired_lease_is_reclaimed_and_the_old_owner_is_locked_out(tmp_path):
+    q = _queue(tmp_path, "a")
+    q.claim("w1", 1)
+    _expire(q, "a")
+    assert q.claim("w2", 1) == ("a", "{}", 2)
+    q.checkpoint("a", "tasks", [])
+    assert not q.renew("a", "w1")
+    assert not q.set_status("a", "w1", {"status": "complete"})
+    q.finish("a", "w1", ok=True)  # a no-op: w1 no longer owns the job
+    assert q.status("a") == {"status": "running"}
+    assert "tasks" in q.checkpoints("a")  # w2 still resumes from them
+    assert q.renew("a", "w2")
+    assert q.set_status("a", "w2", {"status": "complete"})
+    q.finish("a", "w2", ok=True)
+    assert q.status("a") == {"status": "complete"}
+
+
+def test_job_fails_after_max_attempts(tmp_path):
+    q = _queue(tmp_path, "a")
+    for attempt in range(main.JOB_MAX_ATTEMPTS):
+        assert q.claim(f"w{attempt}", 1)[2] == attempt + 1
+        _expire(q, "a")
+    assert q.claim("w9", 1) is None
+    assert q.status("a")["status"] == "error"
+
+
+def test_checkpoints_survive_a_lost_worker_and_clear_on_success(tmp_path):
+    q = _queue(tmp_path, "a")
+    q.claim("w1", 1)
+    writer = main._CheckpointWriter(q, "a")
+    for i in range(20):
+        writer.submit(f"case:{i}", {"zmist": {"zap": str(i)}})
+    writer.close()
+    q.checkpoint("a", "tasks", [[1, "GSW", "Blast", True, False]])
+    _expire(q, "a")  # w1 died mid-job
+    assert q.claim("w2", 1)[2] == 2
+    saved = q.checkpoints("a")
+    assert saved["tasks"] == [[1, "GSW", "Blast", True, False]]
+    assert [saved[f"case:{i}"]["zmist"]["zap"] for i in range(20)] == [str(i) for i in range(20)]
+    q.finish("a", "w2", ok=True)
+    assert q.checkpoints("a") == {}
@@ -9,6 +9,8 @@ interface ExerciseSummary {
   duration: number | null;
   environment: string | null;
   total_cases: number;
+  peak_pace_state: string | null;
+  blood_deficit: number | null;
 }
 
 const API_BASE = process.env.NEXT_PUBLIC_API_URL || 'https://role2-builder-production.up.railway.app';
@@ -18,21 +20,27 @@ export default function HistoricExercisesPage() {
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState<string | null>(null);
   const [downloading, setDownloading] = useState<number | null>(null);
+  const [nextBefore, setNextBefore] = useState<number | null>(null);
+  const [loadingMore, setLoadingMore] = useState(false);
 
   useEffect(() => {
     fetchExercises();
   }, []);
 
-  const fetchExercises = async () => {
+  const fetchExercises = async (before: number | null = null) => {
+    if (before !== null) setLoadingMore(true);
     try {
-      const response = await fetch(`${API_BASE}/exercises`);
+      const query = before !== null ? `?before=${before}` : '';
+      const response = await fetch(`${API_BASE}/exercises${query}`);
       if (!response.ok) throw new Error('Failed to fetch exercises');
       const data = await response.json();
-      setExercises(data.exercises);
+      setExercises(prev => (before !== null ? [...prev, ...data.exercises] : data.exercises));
+      setNextBefore(data.next_before ?? null);
     } catch (err) {
       setError(err instanceof Error ? err.message : 'Failed to load exercises');
     } finally {
       setLoading(false);
+      setLoadingMore(false);
     }
   };
 
@@ -161,7 +169,7 @@ export default function HistoricExercisesPage() {
                 </button>
               </div>
 
-              <div className="grid grid-cols-3 gap-4 mb-4 text-sm">
+              <div className="grid grid-cols-3 md:grid-cols-5 gap-4 mb-4 text-sm">
                 <div>
                   <span className="text-xs uppercase tracking-caps text-ink-3">Duration</span>
                   <span className="ml-2 font-mono text-ink-1">{exercise.duration || 'N/A'} days</span>
@@ -174,6 +182,16 @@ export default function HistoricExercisesPage() {
                   <span className="text-xs uppercase tracking-caps text-ink-3">Cases</span>
                   <span className="ml-2 font-mono text-ink-1">{exercise.total_cases}</span>
                 </div>
+                <div>
+                  <span className="text-xs uppercase tracking-caps text-ink-3">Peak PACE</span>
+                  <span className="ml-2 font-mono text-ink-1">{exercise.peak_pace_state || 'N/A'}</span>
+                </div>
+                <div>
+                  <span className="text-xs uppercase tracking-caps text-ink-3">Blood shortfall</span>
+                  <span className="ml-2 font-mono text-ink-1">
+                    {exercise.blood_deficit == null ? 'N/A' : `${exercise.blood_deficit} u`}
+                  </span>
+                </div>
               </div>
 
               <div className="border-t border-border-1 pt-3">
@@ -200,6 +218,18 @@ export default function HistoricExercisesPage() {
             </div>
           ))}
         </div>
+
+        {nextBefore !== null && (
+          <div className="mt-6 text-center">
+            <button
+              onClick={() => fetchExercises(nextBefore)}
+              disabled={loadingMore}
+              className="px-4 py-2 bg-surface-2 hover:bg-surface-3 border border-border-1 text-ink-2 rounded text-xs uppercase tracking-caps transition-colors"
+            >
+              {loadingMore ? 'Loading...' : 'Load more'}
+            </button>
+          </div>
+        )}
       </div>
     </div>
   );
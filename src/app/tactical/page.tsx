@@ -28,6 +28,16 @@ interface ExerciseConfig {
   days: DayConfig[];
 }
 
+interface JobStatus {
+  status: 'running' | 'complete' | 'error';
+  progress: string;
+  completed: number;
+  total: number;
+  token?: string | null;
+  filename?: string | null;
+  error?: string | null;
+}
+
 const TACTICAL_SETTINGS = [
   'Frontal Attack',
   'Amphibious Assault',
@@ -135,20 +145,7 @@ export default function TacticalScenarioPage() {
       const job_id: string = data.job_id;
       if (!job_id) throw new Error('Server did not return a job ID');
 
-      while (true) {
-        await new Promise(r => setTimeout(r, 2000));
-
-        let statusResp: Response;
-        try {
-          statusResp = await fetch(`${API_BASE}/jobs/${job_id}`);
-        } catch (fetchErr) {
-          throw new Error(`Cannot reach server at ${API_BASE} — check CORS or network`);
-        }
-        if (!statusResp.ok) throw new Error(`Server error ${statusResp.status} on job poll`);
-        const job = await statusResp.json();
-
-        if (job.status === 'error') throw new Error(job.error || 'Generation failed');
-
+      const applyProgress = (job: JobStatus) => {
         setProgress(job.progress);
         if (job.total > 0) {
           const casePct = Math.round((job.completed / job.total) * 75);
@@ -157,17 +154,54 @@ export default function TacticalScenarioPage() {
         if (job.progress.includes('documents')) setProgressPct(82);
         if (job.progress.includes('Road to War')) setProgressPct(88);
         if (job.progress.includes('Assembling')) setProgressPct(93);
+      };
+
+      // Server-sent events push each progress change; if the stream can't be
+      // opened (or drops before the job finishes) fall back to polling.
+      const streamJob = () => new Promise<JobStatus | null>((resolve, reject) => {
+        if (typeof EventSource === 'undefined') return resolve(null);
+        const es = new EventSource(`${API_BASE}/jobs/${job_id}/events`);
+        const onEvent = (e: MessageEvent) => {
+          const job: JobStatus = JSON.parse(e.data);
+          if (job.status === 'error') { es.close(); reject(new Error(job.error || 'Generation failed')); return; }
+          applyProgress(job);
+          if (job.status === 'complete') { es.close(); resolve(job); }
+        };
+        es.addEventListener('progress', onEvent as EventListener);
+        es.addEventListener('complete', onEvent as EventListener);
+        es.addEventListener('error', (e: Event) => {
+          if (e instanceof MessageEvent && e.data) return onEvent(e);
+          es.close();
+          resolve(null);
+        });
+      });
 
-        if (job.status === 'complete') {
-          setProgressPct(100);
-          const dlResp = await fetch(`${API_BASE}/download/${job.token}`);
-          const blob = await dlResp.blob();
-          const url = window.URL.createObjectURL(blob);
-          setDownloadUrl(url);
-          setDownloadName(job.filename);
-          break;
+      const pollJob = async (): Promise<JobStatus> => {
+        while (true) {
+          await new Promise(r => setTimeout(r, 2000));
+
+          let statusResp: Response;
+          try {
+            statusResp = await fetch(`${API_BASE}/jobs/${job_id}`);
+          } catch (fetchErr) {
+            throw new Error(`Cannot reach server at ${API_BASE} — check CORS or network`);
+          }
+          if (!statusResp.ok) throw new Error(`Server error ${statusResp.status} on job poll`);
+          const job: JobStatus = await statusResp.json();
+
+          if (job.status === 'error') throw new Error(job.error || 'Generation failed');
+          applyProgress(job);
+          if (job.status === 'complete') return job;
         }
-      }
+      };
+
+      const job = (await streamJob()) ?? (await pollJob());
+      setProgressPct(100);
+      const dlResp = await fetch(`${API_BASE}/download/${job.token}`);
+      const blob = await dlResp.blob();
+      const url = window.URL.createObjectURL(blob);
+      setDownloadUrl(url);
+      setDownloadName(job.filename || '');
     } catch (err) {
       setError(err instanceof Error ? err.message : 'An error occurred');
       setProgress('');